@@ -45,11 +45,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'base.metrics.MetricsMiddleware',  # mais externo: mede a requisição inteira
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'base.profiling.ProfilingMiddleware',  # precisa de request.user (perfil só para staff)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -155,6 +157,21 @@ REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/1"
 
+# Cache compartilhado (base/price_cache.py) no mesmo Redis, db separado
+CACHES = {
+    "default": {
+        "BACKEND": "base.metrics.InstrumentedRedisCache",  # RedisCache + hits/misses por view
+        "LOCATION": os.getenv("CACHE_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/3"),
+        "KEY_PREFIX": "arb",
+    }
+}
+
+# Estado compartilhado da aplicação (rate limit, locks...) no mesmo Redis do broker
+REDIS_URL = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/2")
+# benchmark (manage.py benchmark): Redis e cache em dbs próprios, longe do estado da aplicação
+BENCHMARK_REDIS_URL = os.getenv("BENCHMARK_REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/4")
+BENCHMARK_CACHE_URL = os.getenv("BENCHMARK_CACHE_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/5")
+
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
@@ -173,8 +190,139 @@ MESSAGE_TAGS = {
 
 # Configuração do Celery Beat
 CELERY_BEAT_SCHEDULE = {
-    "atualizar_precos_todos": {
-        "task": "base.tasks.atualizar_precos_todos",  # caminho da task
+    # refresh adaptativo: só os itens vencidos que cabem no orçamento do minuto
+    "atualizar_precos_agendados": {
+        "task": "base.tasks.atualizar_precos_agendados",  # caminho da task
         "schedule": crontab(minute="*/1")
     },
-}
\ No newline at end of file
+    # catálogo inteiro pela busca do mercado (100 itens/req), semeia o cache de preços
+    "atualizar_precos_steam_search": {
+        "task": "base.tasks.atualizar_precos_steam_search",
+        "schedule": crontab(minute=30)
+    },
+    # valor em carteira / volatilidade -> intervalo de cada item
+    "recalcular_agenda": {
+        "task": "base.tasks.recalcular_agenda_task",
+        "schedule": crontab(minute="*/15")
+    },
+    # histórico de preços: bruto antigo -> velas 1h -> velas 1d
+    "compactar_precos": {
+        "task": "base.tasks.compactar_precos_task",
+        "schedule": crontab(minute=5)
+    },
+}
+
+# Ingestão de preços em lote (base/ingest.py)
+PRICE_INGEST_BATCH_SIZE = int(os.getenv("PRICE_INGEST_BATCH_SIZE", "500"))
+PRICE_INGEST_COPY_MIN_ROWS = int(os.getenv("PRICE_INGEST_COPY_MIN_ROWS", "200"))  # COPY só no PostgreSQL
+STEAM_PRICE_ONLY_CHANGES = os.getenv("STEAM_PRICE_ONLY_CHANGES", "1") == "1"  # não repete preço igual no histórico
+
+# Motor assíncrono do Steam (base/steam_async.py)
+STEAM_REQUESTS_PER_SECOND = float(os.getenv("STEAM_REQUESTS_PER_SECOND", "0.5"))  # orçamento global
+STEAM_MAX_IN_FLIGHT = int(os.getenv("STEAM_MAX_IN_FLIGHT", "4"))  # conexões keep-alive simultâneas
+
+# Rate limit distribuído por host (base/ratelimit.py): rate = req/s, burst = rajada máxima
+RATE_LIMITS = {
+    "steamcommunity.com": {"rate": STEAM_REQUESTS_PER_SECOND, "burst": 2},
+    "cs.money": {"rate": float(os.getenv("CSMONEY_REQUESTS_PER_SECOND", "1.0")), "burst": 2},
+    "default": {"rate": 1.0, "burst": 1},
+}
+RATE_LIMIT_DISTRIBUTED = os.getenv("RATE_LIMIT_DISTRIBUTED", "1") == "1"
+
+# Cache de preços (base/price_cache.py)
+PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL", "300"))  # segundos até o preço ficar velho
+PRICE_CACHE_NEGATIVE_TTL = int(os.getenv("PRICE_CACHE_NEGATIVE_TTL", "60"))  # success=false etc.
+PRICE_CACHE_LOCK_TTL = int(os.getenv("PRICE_CACHE_LOCK_TTL", "180"))  # lease do single-flight
+PRICE_CACHE_FETCH_CHUNK = int(os.getenv("PRICE_CACHE_FETCH_CHUNK", "50"))
+
+# Lease do lock por conta em atualizar_precos_steam_task (renovado enquanto a tarefa roda)
+STEAM_TASK_LOCK_TTL = int(os.getenv("STEAM_TASK_LOCK_TTL", "900"))
+
+# Tamanho dos chunks do refresh global (atualizar_precos_global)
+STEAM_CHUNK_SIZE = int(os.getenv("STEAM_CHUNK_SIZE", "50"))
+
+# Agendador adaptativo (base/scheduler.py)
+REFRESH_MIN_INTERVAL = int(os.getenv("REFRESH_MIN_INTERVAL", "300"))    # posições grandes: ~5 min
+REFRESH_MAX_INTERVAL = int(os.getenv("REFRESH_MAX_INTERVAL", "3600"))   # cauda longa: 1 h
+REFRESH_VALUE_REF = float(os.getenv("REFRESH_VALUE_REF", "10"))         # US$ em carteira que vale 1x de urgência
+REFRESH_VOL_WEIGHT = float(os.getenv("REFRESH_VOL_WEIGHT", "50"))
+REFRESH_VOL_WINDOW_HOURS = int(os.getenv("REFRESH_VOL_WINDOW_HOURS", "24"))
+REFRESH_TICK_SECONDS = 60                                                # período do beat
+REFRESH_BUDGET_SHARE = float(os.getenv("REFRESH_BUDGET_SHARE", "0.9"))  # fração do req/s para o agendador
+REFRESH_CANDIDATE_FACTOR = 4                                             # vencidos lidos por vaga no tick
+
+# Busca do mercado Steam (base/steam_search.py)
+STEAM_SEARCH_PAGE_SIZE = int(os.getenv("STEAM_SEARCH_PAGE_SIZE", "100"))
+
+# Crawler do cs.money (base/csmoney_crawler.py)
+CSMONEY_CONCURRENCY = int(os.getenv("CSMONEY_CONCURRENCY", "4"))  # offsets em voo ao mesmo tempo
+CSMONEY_CHECKPOINT_TTL = int(os.getenv("CSMONEY_CHECKPOINT_TTL", "86400"))  # checkpoint órfão some em 1 dia
+CSMONEY_TASK_LOCK_TTL = int(os.getenv("CSMONEY_TASK_LOCK_TTL", "300"))
+CSMONEY_FLUSH_PAGES = int(os.getenv("CSMONEY_FLUSH_PAGES", "10"))  # páginas entre gravações no banco
+CSMONEY_ARCHIVE_DIR = os.getenv("CSMONEY_ARCHIVE_DIR", "")  # vazio = não arquiva os sell-orders brutos
+
+# Sincronização do inventário Steam (importar_inventario)
+INVENTORY_MIN_RESYNC_SECONDS = int(os.getenv("INVENTORY_MIN_RESYNC_SECONDS", "300"))  # intervalo mínimo por conta
+
+# Snapshots de valuation por conta (base/portfolio.py)
+PORTFOLIO_SNAPSHOT_INTERVAL = int(os.getenv("PORTFOLIO_SNAPSHOT_INTERVAL", "900"))  # resolução da série histórica (s)
+
+# Dashboard (base/views.py): fragmentos cacheados por versão da conta
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "600"))
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "60"))  # cards por lote do scroll infinito
+
+# Retenção do histórico de preços (base/history.py)
+# Price bruto -> velas de 1h após PRICE_RAW_RETENTION_HOURS; velas de 1h -> 1d após PRICE_HOURLY_RETENTION_DAYS.
+# Manter PRICE_RAW_RETENTION_HOURS >= REFRESH_VOL_WINDOW_HOURS (a volatilidade do agendador lê o bruto).
+PRICE_RAW_RETENTION_HOURS = int(os.getenv("PRICE_RAW_RETENTION_HOURS", "48"))
+PRICE_HOURLY_RETENTION_DAYS = int(os.getenv("PRICE_HOURLY_RETENTION_DAYS", "90"))
+PRICE_COMPACT_BATCH = int(os.getenv("PRICE_COMPACT_BATCH", "5000"))  # linhas de origem por transação da compactação
+
+# Particionamento mensal de Price no PostgreSQL (base/partitions.py, opt-in via price_partitions --converter)
+PRICE_PARTITION_MONTHS_AHEAD = int(os.getenv("PRICE_PARTITION_MONTHS_AHEAD", "2"))  # partições criadas adiante
+PRICE_PARTITION_RETENTION_DAYS = int(os.getenv("PRICE_PARTITION_RETENTION_DAYS", "35"))  # bruto particionado mantido
+
+# Taxas por site (fração do preço): "compra" soma ao custo, "venda" sai do valor recebido.
+# A taxa de venda da Steam também é a usada no price_usd líquido (base/tasks.py).
+SITE_FEES = {
+    "Steam Market": {"compra": 0.0, "venda": float(os.getenv("FEE_STEAM_VENDA", "0.15"))},
+    "CS.MONEY": {"compra": 0.0, "venda": float(os.getenv("FEE_CSMONEY_VENDA", "0.05"))},
+    "CSFloat": {"compra": float(os.getenv("FEE_CSFLOAT_COMPRA", "0.028")), "venda": float(os.getenv("FEE_CSFLOAT_VENDA", "0.02"))},
+    "default": {"compra": 0.0, "venda": 0.0},
+}
+
+# Motor de arbitragem entre sites (base/arbitrage.py)
+ARBITRAGE_TOP_N = int(os.getenv("ARBITRAGE_TOP_N", "500"))  # oportunidades gravadas por rodada
+ARBITRAGE_MIN_SPREAD = float(os.getenv("ARBITRAGE_MIN_SPREAD", "0.10"))  # USD líquido mínimo
+ARBITRAGE_MIN_ROI = float(os.getenv("ARBITRAGE_MIN_ROI", "0.02"))
+ARBITRAGE_MAX_AGE_HOURS = int(os.getenv("ARBITRAGE_MAX_AGE_HOURS", "24"))  # ignora LatestPrice mais velho
+ARBITRAGE_VOLUME_REF = float(os.getenv("ARBITRAGE_VOLUME_REF", "10"))  # volume com peso 0.5 na liquidez
+ARBITRAGE_PESO_SEM_VOLUME = float(os.getenv("ARBITRAGE_PESO_SEM_VOLUME", "0.3"))  # site não informa volume
+
+# Alertas de preço alvo (base/alerts.py)
+ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "0.02"))  # fração além do alvo para rearmar
+ALERT_CHANNEL = os.getenv("ALERT_CHANNEL", "arb:alertas")  # canal pub/sub do Redis
+
+# URLs base dos sites (aponte para o stub_server em testes de carga offline)
+STEAM_BASE_URL = os.getenv("STEAM_BASE_URL", "https://steamcommunity.com").rstrip("/")
+CSMONEY_BASE_URL = os.getenv("CSMONEY_BASE_URL", "https://cs.money").rstrip("/")
+CSFLOAT_BASE_URL = os.getenv("CSFLOAT_BASE_URL", "https://csfloat.com").rstrip("/")
+
+# Transporte HTTP dos conectores (base/transport.py): live | record | replay
+HTTP_TRANSPORT_MODE = os.getenv("HTTP_TRANSPORT_MODE", "live")
+HTTP_CASSETTE_DIR = os.getenv("HTTP_CASSETTE_DIR", os.path.join(BASE_DIR, "cassettes"))
+HTTP_REPLAY_IGNORE_PARAMS = ["_"]  # parâmetros anti-cache fora da chave da gravação
+
+# Métricas Prometheus em /metrics/ (base/metrics.py), agregadas entre processos no Redis
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # segundos entre flushes por processo
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "10"))  # mesma SQL N+ vezes numa requisição
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # exige "Authorization: Bearer <token>"; vazio: só staff (ou DEBUG)
+
+# Profiling sob demanda (base/profiling.py): tasks por nome, views via "X-Profile" (staff)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"  # opt-in; desligado: uma checagem de flag
+PROFILING_MODE = os.getenv("PROFILING_MODE", "amostragem")  # modo padrão: cprofile | amostragem
+PROFILING_TASKS = [t for t in os.getenv("PROFILING_TASKS", "").split(",") if t]  # tasks sempre perfiladas
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))  # período do amostrador
+PROFILING_REFRESH_SEC = float(os.getenv("PROFILING_REFRESH_SEC", "15"))  # releitura das tasks ligadas no Redis
+PROFILING_MAX_RECORDS = int(os.getenv("PROFILING_MAX_RECORDS", "200"))  # perfis guardados (os mais antigos saem)
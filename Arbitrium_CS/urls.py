@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path
+from base.metrics import metrics_view
 from base.views import (
+    arbitragem_view,
     atualizar_inventario,    
     atualizar_precos_view,
     dashboard,
+    dashboard_itens,
     cadastrar_inventory,
     preco_alvo_view,
     definir_preco_alvo_view,
@@ -13,6 +16,7 @@ from base.views import (
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", dashboard, name="dashboard"),
+    path("dashboard/<int:conta_id>/itens/", dashboard_itens, name="dashboard_itens"),
     path("cadastrar/", cadastrar_inventory, name="cadastrar_inventory"),
     path("atualizar/<int:conta_id>/", atualizar_inventario, name="atualizar_inventario"),
     path("atualizar-precos/<int:conta_id>/", atualizar_precos_view, name="atualizar_precos"),
@@ -20,6 +24,8 @@ urlpatterns = [
     # >>> Novas rotas:
     path("precos/", preco_alvo_view, name="preco_alvo"),
     path("precos/definir/", definir_preco_alvo_view, name="definir_preco_alvo"),        
+    path("arbitragem/", arbitragem_view, name="arbitragem"),
+    path("metrics/", metrics_view, name="metrics"),
     
 
 ]
\ No newline at end of file
@@ -2,7 +2,11 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Inventory, InventoryItem, Item, Site, Price
+from django.http import Http404, HttpResponse
+from django.urls import path, reverse
+from django.utils.html import format_html_join
+from django.utils.text import slugify
+from .models import Alert, ArbitrageOpportunity, Inventory, InventoryItem, Item, LatestPrice, PortfolioSnapshot, PriceCandle, ProfileRecord, RefreshSchedule, Site, Price
 
 admin.site.register(Item)
 admin.site.register(Site)
@@ -14,4 +18,94 @@ admin.site.register(InventoryItem)
 class PriceAdmin(admin.ModelAdmin):
     list_display = ("item", "site", "price", "timestamp")  # mostra na lista
     fields = ("item", "site", "price", "timestamp")  # mostra no form
-    readonly_fields = ("timestamp",)  # impede edição manual
\ No newline at end of file
+    readonly_fields = ("timestamp",)  # impede edição manual
+
+
+@admin.register(LatestPrice)
+class LatestPriceAdmin(admin.ModelAdmin):
+    list_display = ("item", "site", "price", "timestamp")
+    list_select_related = ("item", "site")
+
+
+@admin.register(RefreshSchedule)
+class RefreshScheduleAdmin(admin.ModelAdmin):
+    list_display = ("item", "interval_sec", "held_value", "volatility", "next_refresh_at", "last_refreshed_at")
+    list_select_related = ("item",)
+    ordering = ("next_refresh_at",)
+
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("inventory", "as_of", "valor_bruto", "valor_liquido", "itens_total", "top_item")
+    list_select_related = ("inventory", "top_item")
+    list_filter = ("inventory",)
+    ordering = ("-as_of",)
+
+
+@admin.register(PriceCandle)
+class PriceCandleAdmin(admin.ModelAdmin):
+    list_display = ("item", "site", "granularidade", "inicio", "open", "high", "low", "close", "amostras")
+    list_select_related = ("item", "site")
+    list_filter = ("granularidade", "site")
+    ordering = ("-inicio",)
+
+
+@admin.register(ArbitrageOpportunity)
+class ArbitrageOpportunityAdmin(admin.ModelAdmin):
+    list_display = ("item", "site_compra", "site_venda", "custo", "liquido", "spread", "roi", "volume", "score", "calculado_em")
+    list_select_related = ("item", "site_compra", "site_venda")
+    list_filter = ("site_compra", "site_venda")
+    ordering = ("-score",)
+
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    list_display = ("item", "inventory", "site", "direcao", "preco", "preco_alvo", "criado_em", "lido")
+    list_select_related = ("item", "inventory", "site")
+    list_filter = ("direcao", "lido", "inventory")
+    ordering = ("-criado_em",)
+
+
+@admin.register(ProfileRecord)
+class ProfileRecordAdmin(admin.ModelAdmin):
+    list_display = ("criado_em", "tipo", "alvo", "modo", "duracao", "amostras", "downloads")
+    list_filter = ("tipo", "modo", "alvo")
+    search_fields = ("alvo", "chave")
+    exclude = ("pstats", "collapsed")
+    readonly_fields = ("tipo", "alvo", "chave", "modo", "duracao", "amostras", "criado_em", "downloads")
+    ordering = ("-criado_em",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("pstats", "collapsed")
+
+    def get_urls(self):
+        return [
+            path("<int:pk>/download/<str:formato>/", self.admin_site.admin_view(self.download),
+                 name="base_profilerecord_download"),
+        ] + super().get_urls()
+
+    @admin.display(description="Downloads")
+    def downloads(self, obj):
+        links = [("collapsed", "collapsed")]
+        if obj.modo == "cprofile":
+            links.insert(0, ("pstats", "pstats"))
+        return format_html_join(" | ", '<a href="{}">{}</a>', (
+            (reverse("admin:base_profilerecord_download", args=[obj.pk, formato]), rotulo)
+            for formato, rotulo in links
+        ))
+
+    def download(self, request, pk, formato):
+        if not self.has_view_permission(request):
+            raise Http404
+        obj = ProfileRecord.objects.filter(pk=pk).first()
+        if obj is None or formato not in ("pstats", "collapsed") or (formato == "pstats" and obj.pstats is None):
+            raise Http404
+        if formato == "pstats":
+            response = HttpResponse(bytes(obj.pstats), content_type="application/octet-stream")
+        else:
+            response = HttpResponse(obj.collapsed, content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{slugify(obj.alvo)}-{obj.chave}.{formato}"'
+        return response
@@ -0,0 +1,214 @@
+# base/alerts.py
+"""
+Motor de alertas de preço alvo (PriceAlvo), disparado pela ingestão.
+
+- Índice no Redis por item: arb:alvos:item:{item_id} (hash alvo_id -> alvo,
+  direção, site, disparado). A cada lote gravado pelo PriceIngestBuffer só os
+  itens observados no lote são consultados (um pipeline), então o custo cresce
+  com o tamanho do lote e não com o total de alvos.
+- Cruzamento com histerese: um alvo "acima" dispara quando preço >= alvo e só
+  rearma quando o preço volta abaixo de alvo * (1 - ALERT_HYSTERESIS) ("abaixo"
+  é o espelho). O estado fica em PriceAlvo.disparado; o UPDATE condicional
+  garante um único alerta por cruzamento mesmo com workers concorrentes.
+- Cada disparo vira uma linha em Alert e uma mensagem JSON no canal
+  ALERT_CHANNEL (pub/sub do Redis), depois do commit da ingestão.
+
+O índice é reconstruído do banco quando não existe (Redis reiniciado) e
+mantido pelos sinais de PriceAlvo. Com o Redis fora, os alvos são lidos do
+banco (filtro por item) e nada é publicado.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Alert, PriceAlvo
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+_PRONTO_KEY = "arb:alvos:pronto"
+
+
+def _item_key(item_id: int) -> str:
+    return f"arb:alvos:item:{item_id}"
+
+
+def _entrada(alvo: PriceAlvo) -> str:
+    return json.dumps({
+        "inv": alvo.inventory_id,
+        "alvo": float(alvo.preco_alvo),
+        "dir": alvo.direcao,
+        "site": alvo.site_id,
+        "disp": alvo.disparado,
+    })
+
+
+def reconstruir_indice() -> int:
+    """Recria o índice inteiro a partir do banco (O(alvos), só quando falta)."""
+    r = get_redis()
+    antigas = list(r.scan_iter(match=_item_key("*"), count=1000))
+    pipe = r.pipeline(transaction=False)
+    if antigas:
+        pipe.delete(*antigas)
+    n = 0
+    for alvo in PriceAlvo.objects.all().iterator(chunk_size=2000):
+        pipe.hset(_item_key(alvo.item_id), alvo.id, _entrada(alvo))
+        n += 1
+    pipe.set(_PRONTO_KEY, 1)
+    pipe.execute()
+    log.warning("[ALERTA] índice de alvos reconstruído | alvos=%d", n)
+    return n
+
+
+def _alvos_do_indice(item_ids: List[int]) -> Dict[int, Dict[int, dict]]:
+    r = get_redis()
+    if not r.exists(_PRONTO_KEY):
+        reconstruir_indice()
+    pipe = r.pipeline(transaction=False)
+    for item_id in item_ids:
+        pipe.hgetall(_item_key(item_id))
+    out: Dict[int, Dict[int, dict]] = {}
+    for item_id, campos in zip(item_ids, pipe.execute()):
+        if campos:
+            out[item_id] = {int(k): json.loads(v) for k, v in campos.items()}
+    return out
+
+
+def _alvos_do_banco(item_ids: List[int]) -> Dict[int, Dict[int, dict]]:
+    out: Dict[int, Dict[int, dict]] = defaultdict(dict)
+    for alvo in PriceAlvo.objects.filter(item_id__in=item_ids):
+        out[alvo.item_id][alvo.id] = json.loads(_entrada(alvo))
+    return out
+
+
+def _transicao(entrada: dict, preco: float) -> Optional[bool]:
+    """True = dispara, False = rearma, None = nada muda."""
+    alvo, h = entrada["alvo"], settings.ALERT_HYSTERESIS
+    if entrada["dir"] == PriceAlvo.ABAIXO:
+        cruzou, voltou = preco <= alvo, preco > alvo * (1 + h)
+    else:
+        cruzou, voltou = preco >= alvo, preco < alvo * (1 - h)
+    if not entrada["disp"] and cruzou:
+        return True
+    if entrada["disp"] and voltou:
+        return False
+    return None
+
+
+def avaliar(site_id: int, precos: Dict[int, float], now=None) -> int:
+    """
+    Avalia os alvos dos itens em `precos` (item_id -> preço observado no
+    site). Reavaliar o mesmo preço não gera alerta repetido. Devolve quantos
+    alertas foram criados.
+    """
+    if not precos:
+        return 0
+    now = now or timezone.now()
+    item_ids = list(precos)
+    try:
+        alvos = _alvos_do_indice(item_ids)
+        usar_redis = True
+    except redis.exceptions.RedisError as e:
+        log.warning("[ALERTA] índice indisponível, lendo alvos do banco: %s", e)
+        alvos = _alvos_do_banco(item_ids)
+        usar_redis = False
+    if not alvos:
+        return 0
+
+    disparos: List[tuple] = []
+    rearmes: List[tuple] = []
+    for item_id, entradas in alvos.items():
+        preco = precos[item_id]
+        for alvo_id, entrada in entradas.items():
+            if entrada["site"] and entrada["site"] != site_id:
+                continue
+            mudou = _transicao(entrada, preco)
+            if mudou is True:
+                disparos.append((alvo_id, item_id, entrada, preco))
+            elif mudou is False:
+                rearmes.append((alvo_id, item_id, entrada))
+
+    criados: List[Alert] = []
+    with transaction.atomic():
+        for alvo_id, item_id, entrada, preco in disparos:
+            # condicional: outro worker pode ter disparado o mesmo alvo
+            if not PriceAlvo.objects.filter(pk=alvo_id, disparado=False).update(disparado=True, disparado_em=now):
+                continue
+            criados.append(Alert(
+                alvo_id=alvo_id, item_id=item_id, inventory_id=entrada["inv"], site_id=site_id,
+                direcao=entrada["dir"], preco=preco, preco_alvo=entrada["alvo"], criado_em=now,
+            ))
+        if rearmes:
+            PriceAlvo.objects.filter(pk__in=[a[0] for a in rearmes]).update(disparado=False)
+        Alert.objects.bulk_create(criados)
+
+    if usar_redis:
+        _atualizar_estado(
+            [(alvo_id, item_id, entrada, True) for alvo_id, item_id, entrada, _p in disparos]
+            + [(alvo_id, item_id, entrada, False) for alvo_id, item_id, entrada in rearmes]
+        )
+        _publicar(criados)
+    if criados:
+        log.warning("[ALERTA] site=%s | itens=%d | disparos=%d | rearmes=%d",
+                    site_id, len(precos), len(criados), len(rearmes))
+    return len(criados)
+
+
+def _atualizar_estado(mudancas: Iterable[tuple]) -> None:
+    pipe = get_redis().pipeline(transaction=False)
+    for alvo_id, item_id, entrada, disparado in mudancas:
+        pipe.hset(_item_key(item_id), alvo_id, json.dumps({**entrada, "disp": disparado}))
+    try:
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        log.warning("[ALERTA] Falha ao atualizar o índice: %s", e)
+
+
+def _publicar(alertas: List[Alert]) -> None:
+    if not alertas:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for a in alertas:
+        pipe.publish(settings.ALERT_CHANNEL, json.dumps({
+            "id": a.pk,
+            "alvo": a.alvo_id,
+            "item": a.item_id,
+            "conta": a.inventory_id,
+            "site": a.site_id,
+            "direcao": a.direcao,
+            "preco": a.preco,
+            "preco_alvo": float(a.preco_alvo),
+            "criado_em": a.criado_em.isoformat(),
+        }))
+    try:
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        log.warning("[ALERTA] Falha ao publicar %d alerta(s): %s", len(alertas), e)
+
+
+# ---- manutenção do índice ----
+
+@receiver(post_save, sender=PriceAlvo)
+def _indexar_alvo(sender, instance: PriceAlvo, **kwargs) -> None:
+    try:
+        get_redis().hset(_item_key(instance.item_id), instance.id, _entrada(instance))
+    except redis.exceptions.RedisError:
+        pass  # o índice é refeito do banco quando o Redis volta vazio
+
+
+@receiver(post_delete, sender=PriceAlvo)
+def _desindexar_alvo(sender, instance: PriceAlvo, **kwargs) -> None:
+    try:
+        get_redis().hdel(_item_key(instance.item_id), instance.id)
+    except redis.exceptions.RedisError:
+        pass
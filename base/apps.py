@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self):
+        from . import alerts  # noqa: F401  (sinais que mantêm o índice de alvos)
+        from . import metrics  # noqa: F401  (sinais do Celery)
+        from . import profiling  # noqa: F401  (sinais do Celery)
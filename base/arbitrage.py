@@ -0,0 +1,172 @@
+# base/arbitrage.py
+"""
+Motor de arbitragem entre sites (Steam Market, CS.MONEY, CSFloat, ...).
+
+Uma rodada:
+1. lê o LatestPrice (item, site, preço, volume) mais novo que
+   ARBITRAGE_MAX_AGE_HOURS numa matriz itens x sites (NumPy);
+2. aplica as taxas de SITE_FEES: custo = preço * (1 + taxa de compra) no site
+   de compra, líquido = preço * (1 - taxa de venda) no site de venda;
+3. calcula spread/ROI de todos os pares (compra, venda) do catálogo de uma vez
+   (tensor itens x sites x sites) e um score = ROI ponderado pela liquidez do
+   lado da venda: volume / (volume + ARBITRAGE_VOLUME_REF), ou
+   ARBITRAGE_PESO_SEM_VOLUME quando o site não informa volume;
+4. regrava ArbitrageOpportunity com as ARBITRAGE_TOP_N melhores.
+
+O custo é dominado pela leitura do LatestPrice; o cálculo vetorizado fica na
+casa de milissegundos para 50k itens x poucos sites, então pode rodar depois
+de cada crawl (tasks.enfileirar_arbitragem).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArbitrageOpportunity, LatestPrice, Site
+
+log = logging.getLogger(__name__)
+
+
+def _taxas(site_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    nomes = dict(Site.objects.filter(id__in=site_ids.tolist()).values_list("id", "name"))
+    padrao = settings.SITE_FEES["default"]
+    fees = [settings.SITE_FEES.get(nomes.get(int(s)), padrao) for s in site_ids]
+    return (
+        np.array([f["compra"] for f in fees], dtype=np.float64),
+        np.array([f["venda"] for f in fees], dtype=np.float64),
+    )
+
+
+def carregar_matriz(agora=None) -> Dict[str, np.ndarray]:
+    """
+    LatestPrice recente em matrizes densas: preco[i, s] e volume[i, s]
+    (NaN onde o item não tem preço/volume no site).
+    """
+    agora = agora or timezone.now()
+    desde = agora - timedelta(hours=settings.ARBITRAGE_MAX_AGE_HOURS)
+    qs = (
+        LatestPrice.objects
+        .filter(timestamp__gte=desde)
+        .values_list("item_id", "site_id", "price", "volume")
+    )
+    # cursor direto: evita montar 100k+ tuplas pelo ORM; NULL de volume vira NaN no float
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        dados = np.array(cur.fetchall(), dtype=np.float64)
+    if not len(dados):
+        vazio = np.empty(0, dtype=np.int64)
+        return {"itens": vazio, "sites": vazio, "preco": np.empty((0, 0)), "volume": np.empty((0, 0))}
+
+    itens, linha = np.unique(dados[:, 0].astype(np.int64), return_inverse=True)
+    sites, coluna = np.unique(dados[:, 1].astype(np.int64), return_inverse=True)
+    preco = np.full((len(itens), len(sites)), np.nan)
+    preco[linha, coluna] = dados[:, 2]
+    volume = np.full((len(itens), len(sites)), np.nan)
+    volume[linha, coluna] = dados[:, 3]
+    return {"itens": itens, "sites": sites, "preco": preco, "volume": volume}
+
+
+def calcular(matriz: Dict[str, np.ndarray], top_n: int | None = None) -> Dict[str, np.ndarray]:
+    """
+    Passo vetorizado: devolve as top_n oportunidades como arrays paralelos
+    (item, compra, venda, preco_compra, ..., score), ordenadas por score.
+    """
+    top_n = top_n or settings.ARBITRAGE_TOP_N
+    preco, volume, sites = matriz["preco"], matriz["volume"], matriz["sites"]
+    n, s = preco.shape
+    if n == 0 or s < 2:
+        return {"i": np.empty(0, dtype=np.int64)}
+
+    taxa_compra, taxa_venda = _taxas(sites)
+    custo = preco * (1.0 + taxa_compra)           # [i, compra]
+    liquido = preco * (1.0 - taxa_venda)          # [i, venda]
+    peso = np.where(
+        np.isnan(volume),
+        settings.ARBITRAGE_PESO_SEM_VOLUME,
+        volume / (volume + settings.ARBITRAGE_VOLUME_REF),
+    )                                             # [i, venda]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        spread = liquido[:, None, :] - custo[:, :, None]      # [i, compra, venda]
+        roi = spread / custo[:, :, None]
+        score = roi * peso[:, None, :]
+        valido = (
+            (spread >= settings.ARBITRAGE_MIN_SPREAD)          # NaN (sem preço) nunca passa
+            & (roi >= settings.ARBITRAGE_MIN_ROI)
+            & ~np.eye(s, dtype=bool)[None, :, :]
+        )
+
+    plano = np.where(valido, score, -np.inf).ravel()
+    k = min(top_n, int(valido.sum()))
+    if k == 0:
+        return {"i": np.empty(0, dtype=np.int64)}
+    melhores = np.argpartition(-plano, k - 1)[:k]
+    melhores = melhores[np.argsort(-plano[melhores], kind="stable")]
+    i, a, b = np.unravel_index(melhores, valido.shape)
+    return {
+        "i": i, "compra": a, "venda": b,
+        "preco_compra": preco[i, a], "preco_venda": preco[i, b],
+        "custo": custo[i, a], "liquido": liquido[i, b],
+        "spread": spread[i, a, b], "roi": roi[i, a, b],
+        "volume": volume[i, b], "score": score[i, a, b],
+    }
+
+
+def _gravar(matriz: Dict[str, np.ndarray], top: Dict[str, np.ndarray], agora) -> int:
+    itens, sites = matriz["itens"], matriz["sites"]
+    objs: List[ArbitrageOpportunity] = [
+        ArbitrageOpportunity(
+            item_id=int(itens[top["i"][k]]),
+            site_compra_id=int(sites[top["compra"][k]]),
+            site_venda_id=int(sites[top["venda"][k]]),
+            preco_compra=float(top["preco_compra"][k]),
+            preco_venda=float(top["preco_venda"][k]),
+            custo=float(top["custo"][k]),
+            liquido=float(top["liquido"][k]),
+            spread=float(top["spread"][k]),
+            roi=float(top["roi"][k]),
+            volume=None if np.isnan(top["volume"][k]) else int(top["volume"][k]),
+            score=float(top["score"][k]),
+            calculado_em=agora,
+        )
+        for k in range(len(top["i"]))
+    ]
+    with transaction.atomic():
+        ArbitrageOpportunity.objects.all().delete()
+        ArbitrageOpportunity.objects.bulk_create(objs, batch_size=500)
+    return len(objs)
+
+
+def calcular_arbitragem(agora=None, top_n: int | None = None) -> Dict[str, float]:
+    """Rodada completa: carrega, calcula e regrava o top-N."""
+    agora = agora or timezone.now()
+    t0 = time.perf_counter()
+    matriz = carregar_matriz(agora)
+    t1 = time.perf_counter()
+    top = calcular(matriz, top_n)
+    t2 = time.perf_counter()
+    gravadas = _gravar(matriz, top, agora)
+    t3 = time.perf_counter()
+
+    n, s = matriz["preco"].shape
+    res = {
+        "itens": n,
+        "sites": s,
+        "oportunidades": gravadas,
+        "carga_ms": round((t1 - t0) * 1000, 1),
+        "calculo_ms": round((t2 - t1) * 1000, 1),
+        "gravacao_ms": round((t3 - t2) * 1000, 1),
+    }
+    log.warning(
+        "[ARB] itens=%d | sites=%d | oportunidades=%d | carga=%.1fms | calculo=%.1fms | gravacao=%.1fms",
+        n, s, gravadas, res["carga_ms"], res["calculo_ms"], res["gravacao_ms"],
+    )
+    return res
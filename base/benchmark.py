@@ -0,0 +1,322 @@
+# base/benchmark.py
+"""
+Benchmark ponta a ponta (manage.py benchmark).
+
+Roda num banco próprio (o de teste do Django: test_<NAME> no PostgreSQL,
+arquivo bench_<nome>.sqlite3 no SQLite), com Redis e cache em dbs próprios
+(BENCHMARK_REDIS_URL / BENCHMARK_CACHE_URL) e catálogo sintético
+(base/synthetic.py) e os conectores apontados para o stub local
+(base/stubs.py), e mede cada cenário:
+
+- importar_inventario       primeira importação e re-sync sem mudanças
+- ingestao_steam            crawl do search + gravação (PriceIngestBuffer)
+- ingestao_csmoney          crawl dos sell-orders + menores preços
+- valuation                 calcular_valor_total_bruto/liquido das contas
+- dashboard / dashboard_itens / preco_alvo   renderização pelo test Client
+
+Por cenário: tempo de parede, nº e tempo de queries (conexão principal; as
+threads de I/O dos crawlers não entram na contagem) e pico de memória Python
+(tracemalloc). O relatório é JSON e pode ser comparado com um baseline salvo.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from . import ratelimit, synthetic
+from .locks import limpar_na_fila, marcar_na_fila
+from .models import Inventory, Item
+from .stubs import Fixtures, StubConfig, StubServer
+
+log = logging.getLogger(__name__)
+
+ESCALAS = {
+    "pequena": {"itens": 2_000, "contas": 20, "precos": 200_000},
+    "media": {"itens": 10_000, "contas": 100, "precos": 1_000_000},
+    "grande": {"itens": 50_000, "contas": 500, "precos": 10_000_000},
+}
+CENARIOS = [
+    "importar_inventario",
+    "ingestao_steam",
+    "ingestao_csmoney",
+    "valuation",
+    "dashboard",
+    "dashboard_itens",
+    "preco_alvo",
+]
+# métricas comparadas com o baseline (as demais são informativas)
+METRICAS = ("wall_ms", "queries", "pico_mem_kb")
+
+
+class Medicao:
+    """Mede um bloco: tempo de parede, queries da conexão principal e pico de memória."""
+
+    def __init__(self, memoria: bool = True):
+        self.memoria = memoria
+
+    @contextmanager
+    def __call__(self):
+        resultado: Dict[str, float] = {}
+        gc.collect()
+        if self.memoria:
+            tracemalloc.start()
+        ctx = CaptureQueriesContext(connection)
+        t0 = time.perf_counter()
+        try:
+            with ctx:
+                yield resultado
+        finally:
+            wall = time.perf_counter() - t0
+            pico = tracemalloc.get_traced_memory()[1] if self.memoria else 0
+            if self.memoria:
+                tracemalloc.stop()
+            resultado.update({
+                "wall_ms": round(wall * 1000, 1),
+                "queries": len(ctx.captured_queries),
+                "query_ms": round(sum(float(q["time"]) for q in ctx.captured_queries) * 1000, 1),
+                "pico_mem_kb": round(pico / 1024),
+            })
+
+
+def _amostra_contas(n: int) -> List[Inventory]:
+    return list(Inventory.objects.order_by("id")[:n])
+
+
+# ---- cenários ----
+
+def _importar_inventario(contas: List[Inventory], medir: Medicao) -> Dict:
+    from .utils import importar_inventario
+    out = {}
+    with medir() as r:
+        for conta in contas:
+            importar_inventario(conta.steam_id, conta, force=True)
+        r["contas"] = len(contas)
+    out["frio"] = r
+    with medir() as r2:
+        for conta in contas:
+            importar_inventario(conta.steam_id, conta)
+        r2["contas"] = len(contas)
+    out["sem_mudanca"] = r2
+    return out
+
+
+def _ingestao_steam(contas, medir) -> Dict:
+    from .tasks import _atualizar_precos_steam_search
+    with medir() as r:
+        r.update(_atualizar_precos_steam_search(fallback=False))
+    return r
+
+
+def _ingestao_csmoney(contas, medir) -> Dict:
+    from .utils import atualizar_precos_csmoney_minimos
+    with medir() as r:
+        res = atualizar_precos_csmoney_minimos(run_id="benchmark", resume=False, cooldown_wait_sec=1)
+        r.update({k: res[k] for k in ("pages_ok", "distintos", "salvos") if k in res})
+    return r
+
+
+def _valuation(contas, medir) -> Dict:
+    from .utils import calcular_valor_total_bruto, calcular_valor_total_liquido
+    with medir() as r:
+        for conta in contas:
+            calcular_valor_total_bruto(conta)
+            calcular_valor_total_liquido(conta)
+        r["contas"] = len(contas)
+    return r
+
+
+def _paginas(url: str, contas, medir) -> Dict:
+    client = Client()
+    out = {}
+    for fase in ("frio", "quente"):
+        if fase == "frio":
+            cache.clear()
+        with medir() as r:
+            status = [client.get(url.format(id=conta.id)).status_code for conta in contas]
+            r["contas"] = len(contas)
+            r["erros"] = sum(1 for s in status if s != 200)
+        out[fase] = r
+    return out
+
+
+def _dashboard(contas, medir) -> Dict:
+    return _paginas("/?conta={id}", contas, medir)
+
+
+def _dashboard_itens(contas, medir) -> Dict:
+    return _paginas("/dashboard/{id}/itens/", contas, medir)
+
+
+def _preco_alvo(contas, medir) -> Dict:
+    return _paginas("/precos/?conta={id}", contas, medir)
+
+
+_FUNCOES = {
+    "importar_inventario": _importar_inventario,
+    "ingestao_steam": _ingestao_steam,
+    "ingestao_csmoney": _ingestao_csmoney,
+    "valuation": _valuation,
+    "dashboard": _dashboard,
+    "dashboard_itens": _dashboard_itens,
+    "preco_alvo": _preco_alvo,
+}
+
+
+@contextmanager
+def isolado(keepdb: bool = False):
+    """
+    Banco, Redis e cache só do benchmark: nada do estado da aplicação é lido
+    ou apagado (o dashboard limpa o cache; a ingestão mexe em locks e índices).
+    """
+    from . import redis_client
+
+    setup_test_environment()
+    creation = connection.creation
+    if connection.vendor == "sqlite":
+        nome = os.path.splitext(os.path.basename(str(connection.settings_dict["NAME"])))[0]
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(
+            os.path.dirname(str(connection.settings_dict["NAME"])), f"bench_{nome}.sqlite3"
+        )
+    nome_original = creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb, serialize=False)
+    cliente_original = redis_client._client
+    redis_client._client = None
+    cache_bench = {**settings.CACHES["default"], "LOCATION": settings.BENCHMARK_CACHE_URL}
+    try:
+        with override_settings(REDIS_URL=settings.BENCHMARK_REDIS_URL, CACHES={"default": cache_bench}):
+            if not keepdb:
+                redis_client.get_redis().flushdb()
+            yield
+    finally:
+        redis_client._client = cliente_original
+        creation.destroy_test_db(nome_original, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def _ambiente(stub: StubServer):
+    """Conectores no stub, sem limite de taxa e sem disparar a arbitragem no broker."""
+    sem_limite = {host: {"rate": 1e6, "burst": 1e6} for host in settings.RATE_LIMITS}
+    with override_settings(
+        STEAM_BASE_URL=stub.url,
+        CSMONEY_BASE_URL=stub.url,
+        CSFLOAT_BASE_URL=stub.url,
+        HTTP_TRANSPORT_MODE="live",
+        RATE_LIMITS=sem_limite,
+        STEAM_REQUESTS_PER_SECOND=1e6,
+        ALLOWED_HOSTS=["*"],
+    ):
+        ratelimit._buckets.clear()
+        marcar_na_fila("arbitragem", 3600)  # enfileirar_arbitragem coalesce: a rodada não entra na medição
+        try:
+            yield
+        finally:
+            limpar_na_fila("arbitragem")
+            ratelimit._buckets.clear()
+
+
+def rodar(
+    cenarios: Optional[List[str]] = None,
+    *,
+    amostra: int = 10,
+    stub_config: Optional[StubConfig] = None,
+    memoria: bool = True,
+) -> Dict:
+    """Roda os cenários no banco atual (já populado) e devolve o relatório."""
+    cenarios = cenarios or CENARIOS
+    contas = _amostra_contas(amostra)
+    nomes = list(Item.objects.order_by("id").values_list("market_hash_name", flat=True))
+    medir = Medicao(memoria)
+    resultados: Dict[str, Dict] = {}
+
+    with StubServer(stub_config or StubConfig(), fixtures=Fixtures(extras=nomes)) as stub, _ambiente(stub):
+        for nome in cenarios:
+            t0 = time.perf_counter()
+            resultados[nome] = _FUNCOES[nome](contas, medir)
+            log.warning("[BENCH] %s | %.1fs", nome, time.perf_counter() - t0)
+        chamadas = stub.stats
+
+    return {
+        "gerado_em": timezone.now().isoformat(),
+        "banco": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "memoria": memoria,
+        "amostra_contas": len(contas),
+        "cenarios": resultados,
+        "stub": chamadas,
+    }
+
+
+def _planos(cenarios: Dict, prefixo: str = "") -> Dict[str, Dict]:
+    """{"dashboard.frio": {...}, "valuation": {...}}: achata as fases dos cenários."""
+    out = {}
+    for nome, valor in cenarios.items():
+        if isinstance(valor, dict) and "wall_ms" in valor:
+            out[prefixo + nome] = valor
+        elif isinstance(valor, dict):
+            out.update(_planos(valor, f"{prefixo}{nome}."))
+    return out
+
+
+def comparar(atual: Dict, baseline: Dict, tolerancia: float = 0.2) -> List[Dict]:
+    """
+    Diferença relativa de cada métrica contra o baseline; `regressao` quando
+    piora mais que `tolerancia` (queries: qualquer aumento). Baseline zero não
+    tem diferença relativa: `delta` None e regressão se o atual não for 0.
+    """
+    linhas = []
+    base = _planos(baseline.get("cenarios", {}))
+    for chave, medida in _planos(atual["cenarios"]).items():
+        ref = base.get(chave)
+        if ref is None:
+            continue
+        for metrica in METRICAS:
+            if metrica == "pico_mem_kb" and not (atual.get("memoria") and baseline.get("memoria")):
+                continue
+            a, b = medida.get(metrica, 0), ref.get(metrica, 0)
+            limite = 0.0 if metrica == "queries" else tolerancia
+            if b:
+                delta = round((a - b) / b, 3)
+                regressao = delta > limite
+            else:  # sem base relativa (ex.: 0 -> 3 queries): qualquer valor é regressão
+                delta = None if a else 0.0
+                regressao = a > 0
+            linhas.append({
+                "cenario": chave,
+                "metrica": metrica,
+                "baseline": b,
+                "atual": a,
+                "delta": delta,
+                "regressao": regressao,
+            })
+    return linhas
+
+
+def salvar(relatorio: Dict, caminho: str) -> None:
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+
+def carregar(caminho: str) -> Dict:
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def gerar_dados(escala: Dict[str, int], seed: int, progresso: Callable[[str], None]) -> Dict[str, int]:
+    return synthetic.gerar(escala["itens"], escala["contas"], escala["precos"], seed=seed, prefixo="bench",
+                           progresso=progresso)
@@ -1,16 +1,26 @@
 import cloudscraper
+import gzip
 import json
 import time
+from django.conf import settings
 
 scraper = cloudscraper.create_scraper(browser={'custom': 'firefox'})
 headers = {"User-Agent": "Mozilla/5.0"}
 
+def _sessao():
+    """Dentro do Django: transporte (record/replay) e URL base do settings; como script: site real."""
+    if settings.configured:
+        from base import transport
+        return transport.montar(scraper), settings.CSMONEY_BASE_URL
+    return scraper, "https://cs.money"
+
 def fetch_all_csmoney(limit=60, max_pages=200):
-    all_items = []
+    """Gera os sell-orders página a página (nada fica acumulado em memória)."""
+    http, base_url = _sessao()
     for page in range(max_pages):
         offset = page * limit
-        url = f"https://cs.money/1.0/market/sell-orders?limit={limit}&offset={offset}"
-        resp = scraper.get(url, headers=headers, timeout=60)
+        url = f"{base_url}/1.0/market/sell-orders?limit={limit}&offset={offset}"
+        resp = http.get(url, headers=headers, timeout=60)
 
         try:
             data = resp.json()
@@ -22,16 +32,15 @@ def fetch_all_csmoney(limit=60, max_pages=200):
         items = data.get("items", [])
         if not items:
             break  # acabou os resultados
-        all_items.extend(items)
         print(f"✅ Página {page} → {len(items)} itens")
+        yield from items
         time.sleep(1)  # pausa p/ não ser bloqueado
 
-    return all_items
-
 if __name__ == "__main__":
-    items = fetch_all_csmoney(limit=60, max_pages=200)
-    print(f"Total coletado: {len(items)} itens")
-
-    # salvar localmente
-    with open("csmoney_all.json", "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    # salvar localmente, uma linha por sell-order (NDJSON comprimido)
+    total = 0
+    with gzip.open("csmoney_all.ndjson.gz", "wt", encoding="utf-8") as f:
+        for item in fetch_all_csmoney(limit=60, max_pages=200):
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            total += 1
+    print(f"Total coletado: {total} itens")
@@ -0,0 +1,323 @@
+# base/csmoney_crawler.py
+"""
+Crawler concorrente e retomável dos sell-orders do cs.money.
+
+- Até CSMONEY_CONCURRENCY offsets em voo ao mesmo tempo; o ritmo global
+  continua limitado pelo token bucket "cs.money" (base/ratelimit.py), então
+  vários workers/processos dividem o mesmo orçamento.
+- Após cada página, o checkpoint vai para o Redis:
+    arb:csmoney:{run}:estado -> JSON com offsets pendentes, fila de espera
+                                (retries/cooldowns), tentativas e contadores;
+    arb:csmoney:{run}:min    -> hash classid -> menor preço visto até agora
+                                (só os classids que melhoraram são regravados);
+    arb:csmoney:{run}:sujos  -> mínimos (com nome/tipo/ícone) ainda sem flush.
+- Um worker que reinicia chama carregar() e continua de onde parou; os
+  offsets que estavam em voo voltam como pendentes.
+
+Streaming: cada página é projetada na própria thread de download para as
+poucas colunas que interessam (classid, preço, nome, tipo, ícone) e o JSON
+bruto é descartado ali mesmo (ou vai para um arquivo NDJSON.gz, se pedido).
+O processo guarda só {classid: menor preço} mais os mínimos que mudaram desde
+o último flush; a cada 'flush_every' páginas esses vão para o banco. Memória
+de pico: as páginas em voo + o agregado de preços.
+
+Uso:
+    crawler = CsmoneyCrawler("default")
+    crawler.carregar()
+    crawler.executar(flush=lambda minimos: ..., arquivo="csmoney.ndjson.gz")
+    crawler.descartar()
+"""
+from __future__ import annotations
+
+import gzip
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import cloudscraper
+import redis
+from django.conf import settings
+
+from . import transport
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+_CODIGOS_RETRY_CURTO = (429, 500, 502, 503, 504, -1)
+
+Minimo = Tuple[float, str, Any, Any]  # (preço, nome, tipo, icon_url)
+Linha = Tuple[str, float, str, Any, Any]  # (classid, preço, nome, tipo, icon_url)
+
+
+def projetar_pagina(items: List[Dict[str, Any]]) -> List[Linha]:
+    """Reduz os sell-orders brutos às colunas usadas na agregação (descarta inválidos)."""
+    from .utils import _extract_fields
+
+    linhas: List[Linha] = []
+    for it in items:
+        classid, name, type_, icon_url, price = _extract_fields(it)
+        if classid is None or price is None:
+            continue
+        try:
+            p = float(price)
+        except Exception:
+            continue
+        if p > 0:
+            linhas.append((classid, p, name, type_, icon_url))
+    return linhas
+
+
+class CsmoneyCrawler:
+    def __init__(
+        self,
+        run_id: str = "default",
+        *,
+        limit: int = 60,
+        max_pages: int = 200,
+        concurrency: int | None = None,
+        retries: int = 3,
+        cooldown_retries: int = 3,
+        cooldown_wait_sec: int = 120,
+        epsilon: float = 1e-9,
+    ):
+        self.run_id = run_id
+        self.limit = limit
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency or settings.CSMONEY_CONCURRENCY)
+        self.retries = retries
+        self.cooldown_retries = cooldown_retries
+        self.cooldown_wait_sec = cooldown_wait_sec
+        self.epsilon = epsilon
+
+        self._key_estado = f"arb:csmoney:{run_id}:estado"
+        self._key_min = f"arb:csmoney:{run_id}:min"
+        self._key_sujos = f"arb:csmoney:{run_id}:sujos"
+        self._local = threading.local()
+        self._arquivo = None
+        self._arquivo_lock = threading.Lock()
+
+        self.minimos: Dict[str, float] = {}   # classid -> menor preço visto
+        self.sujos: Dict[str, Minimo] = {}    # mínimos ainda não enviados ao flush
+        self._paginas_desde_flush = 0
+        self.pending: deque[int] = deque(i * limit for i in range(max_pages))
+        self.aguardando: List[Tuple[float, int]] = []  # heap (timestamp_para_reinserir, offset)
+        self.short_attempts: Dict[int, int] = {}
+        self.cool_attempts: Dict[int, int] = {}
+        self.fim: int | None = None  # offset da última página (veio com menos de 'limit' itens)
+        self.itens_lidos = 0
+        self.pages_ok = 0
+
+    # ---------- checkpoint ----------
+
+    def carregar(self) -> bool:
+        """Retoma o checkpoint do Redis, se houver. True se retomou."""
+        try:
+            r = get_redis()
+            bruto = r.get(self._key_estado)
+            if not bruto:
+                return False
+            minimos = r.hgetall(self._key_min)
+            sujos = r.hgetall(self._key_sujos)
+        except redis.exceptions.RedisError as e:
+            log.warning("[CSMONEY] Checkpoint indisponível (%s); começando do zero", e)
+            return False
+
+        estado = json.loads(bruto)
+        if estado.get("limit") != self.limit:
+            log.warning("[CSMONEY] Checkpoint com limit=%s ignorado (atual=%s)", estado.get("limit"), self.limit)
+            return False
+        self.pending = deque(estado["pending"])
+        self.aguardando = [(float(when), int(off)) for when, off in estado["aguardando"]]
+        heapq.heapify(self.aguardando)
+        self.short_attempts = {int(k): v for k, v in estado["short"].items()}
+        self.cool_attempts = {int(k): v for k, v in estado["cool"].items()}
+        self.fim = estado.get("fim")
+        self.itens_lidos = estado.get("itens_lidos", 0)
+        self.pages_ok = estado.get("pages_ok", 0)
+        self.minimos = {k: float(v) for k, v in minimos.items()}
+        self.sujos = {k: tuple(json.loads(v)) for k, v in sujos.items()}
+        log.warning(
+            "[CSMONEY] Retomando %s | pendentes=%d | aguardando=%d | agregados=%d | sem_flush=%d | pages_ok=%d",
+            self.run_id, len(self.pending), len(self.aguardando), len(self.minimos), len(self.sujos), self.pages_ok,
+        )
+        return True
+
+    def _salvar(self, alterados: Dict[str, Minimo], em_voo: Iterable[int], flushed: bool = False) -> None:
+        estado = {
+            "limit": self.limit,
+            # o que estava em voo volta como pendente se o worker cair
+            "pending": list(em_voo) + list(self.pending),
+            "aguardando": self.aguardando,
+            "short": self.short_attempts,
+            "cool": self.cool_attempts,
+            "fim": self.fim,
+            "itens_lidos": self.itens_lidos,
+            "pages_ok": self.pages_ok,
+        }
+        ttl = settings.CSMONEY_CHECKPOINT_TTL
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            if flushed:
+                pipe.delete(self._key_sujos)
+            if alterados:
+                pipe.hset(self._key_min, mapping={k: v[0] for k, v in alterados.items()})
+                pipe.expire(self._key_min, ttl)
+            sujos = {k: json.dumps(v) for k, v in alterados.items() if k in self.sujos}
+            if sujos:
+                pipe.hset(self._key_sujos, mapping=sujos)
+                pipe.expire(self._key_sujos, ttl)
+            pipe.set(self._key_estado, json.dumps(estado), ex=ttl)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            log.warning("[CSMONEY] Falha ao gravar checkpoint: %s", e)
+
+    def descartar(self) -> None:
+        try:
+            get_redis().delete(self._key_estado, self._key_min, self._key_sujos)
+        except redis.exceptions.RedisError:
+            pass
+
+    # ---------- crawl ----------
+
+    def _fetch(self, offset: int) -> Tuple[int, int, List[Linha]]:
+        """Baixa e projeta a página na thread do pool: o JSON bruto não sai daqui."""
+        from .utils import _fetch_page_raw
+
+        # cloudscraper guarda cookies/desafio na sessão: uma por thread
+        scraper = getattr(self._local, "scraper", None)
+        if scraper is None:
+            scraper = self._local.scraper = transport.montar(cloudscraper.create_scraper(browser={"custom": "firefox"}))
+        code, items = _fetch_page_raw(offset, self.limit, scraper=scraper)
+        if self._arquivo is not None and items:
+            linhas = "".join(json.dumps(it, ensure_ascii=False) + "\n" for it in items)
+            with self._arquivo_lock:
+                self._arquivo.write(linhas)
+        return code, len(items), projetar_pagina(items)
+
+    def _adiar(self, offset: int, segundos: float) -> None:
+        heapq.heappush(self.aguardando, (time.time() + segundos, offset))
+
+    def _liberar_aguardando(self) -> None:
+        agora = time.time()
+        while self.aguardando and self.aguardando[0][0] <= agora:
+            self.pending.append(heapq.heappop(self.aguardando)[1])
+
+    def _marcar_fim(self, offset: int) -> None:
+        """Descarta offsets além da última página (evita cooldowns de 400 inúteis)."""
+        if self.fim is not None and self.fim <= offset:
+            return
+        self.fim = offset
+        self.pending = deque(o for o in self.pending if o <= offset)
+        self.aguardando = [(w, o) for w, o in self.aguardando if o <= offset]
+        heapq.heapify(self.aguardando)
+
+    def _processar(self, offset: int, code: int, n_items: int, linhas: List[Linha]) -> Dict[str, Minimo]:
+        """Aplica o resultado de uma página; devolve os classids cujo mínimo mudou."""
+        alterados: Dict[str, Minimo] = {}
+
+        if code == 200:
+            self.pages_ok += 1
+            self._paginas_desde_flush += 1
+            for classid, p, name, type_, icon_url in linhas:
+                atual = self.minimos.get(classid)
+                if (atual is None) or (p < atual - self.epsilon):
+                    self.minimos[classid] = p
+                    self.sujos[classid] = alterados[classid] = (p, name, type_, icon_url)
+            self.itens_lidos += len(linhas)
+            if n_items < self.limit:
+                self._marcar_fim(offset)
+            log.warning(f"[CSMONEY] offset={offset}: itens={n_items} | agregados={len(self.minimos)}")
+            return alterados
+
+        # 429/5xx: re-tentativa curta com backoff linear
+        if code in _CODIGOS_RETRY_CURTO:
+            n = self.short_attempts.get(offset, 0) + 1
+            self.short_attempts[offset] = n
+            if n <= self.retries:
+                log.warning(f"[CSMONEY] {code} em offset={offset} (tentativa {n}/{self.retries}) – retry em {1.5 * n:.1f}s")
+                self._adiar(offset, 1.5 * n)
+            else:
+                log.warning(f"[CSMONEY] DROP offset={offset} após {self.retries} tentativas curtas")
+            return alterados
+
+        # 400: pode ser fim de dados OU bloqueio; entra em cooldown
+        if code == 400:
+            if self.fim is not None and offset > self.fim:
+                return alterados
+            c = self.cool_attempts.get(offset, 0) + 1
+            self.cool_attempts[offset] = c
+            if c <= self.cooldown_retries:
+                self._adiar(offset, self.cooldown_wait_sec)
+                log.warning(f"[CSMONEY] 400 em offset={offset} → cooldown {c}/{self.cooldown_retries} (+{self.cooldown_wait_sec}s)")
+            else:
+                log.warning(f"[CSMONEY] DROP offset={offset} após {self.cooldown_retries} cooldowns")
+            return alterados
+
+        log.warning(f"[CSMONEY] Código {code} inesperado em offset={offset} – descartando")
+        return alterados
+
+    def _flush(self, flush: Callable[[Dict[str, Minimo]], Any]) -> bool:
+        if not self.sujos:
+            return False
+        flush(self.sujos)
+        self.sujos = {}
+        self._paginas_desde_flush = 0
+        return True
+
+    def executar(
+        self,
+        flush: Callable[[Dict[str, Minimo]], Any],
+        *,
+        flush_every: Optional[int] = None,
+        arquivo: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Roda até não sobrar offset pendente nem em espera. 'flush' recebe os
+        mínimos que mudaram, a cada 'flush_every' páginas e no fim; 'arquivo'
+        (opcional) recebe os sell-orders brutos em NDJSON gzip (append, então
+        uma retomada continua o mesmo arquivo).
+        """
+        flush_every = flush_every or settings.CSMONEY_FLUSH_PAGES
+        em_voo: Dict[Any, int] = {}
+        if arquivo:
+            self._arquivo = gzip.open(arquivo, "at", encoding="utf-8")
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="csmoney") as pool:
+                while self.pending or self.aguardando or em_voo:
+                    self._liberar_aguardando()
+                    while self.pending and len(em_voo) < self.concurrency:
+                        offset = self.pending.popleft()
+                        em_voo[pool.submit(self._fetch, offset)] = offset
+
+                    prazo = max(0.0, self.aguardando[0][0] - time.time()) + 0.1 if self.aguardando else None
+                    if not em_voo:
+                        # só há cooldowns: espera o próximo vencer
+                        time.sleep(prazo)
+                        continue
+
+                    prontos, _ = wait(em_voo, timeout=prazo, return_when=FIRST_COMPLETED)
+                    for fut in prontos:
+                        offset = em_voo.pop(fut)
+                        code, n_items, linhas = fut.result()
+                        alterados = self._processar(offset, code, n_items, linhas)
+                        flushed = self._paginas_desde_flush >= flush_every and self._flush(flush)
+                        self._salvar(alterados, em_voo.values(), flushed=flushed)
+            if self._flush(flush):
+                self._salvar({}, (), flushed=True)
+        finally:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+        return self.resumo()
+
+    def resumo(self) -> Dict[str, int]:
+        return {
+            "itens_lidos": self.itens_lidos,
+            "distintos": len(self.minimos),
+            "pages_ok": self.pages_ok,
+        }
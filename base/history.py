@@ -0,0 +1,257 @@
+# base/history.py
+"""
+Retenção do histórico de preços em velas OHLC.
+
+Compactação (compactar_precos, rodada pelo beat):
+- Price bruto mais velho que PRICE_RAW_RETENTION_HOURS vira velas de 1 hora
+  (open/high/low/close + amostras) por (item, site) e as linhas brutas são
+  apagadas;
+- velas de 1 hora mais velhas que PRICE_HOURLY_RETENTION_DAYS viram velas de
+  1 dia e também são apagadas.
+Cada lote de PRICE_COMPACT_BATCH linhas de origem é uma transação (velas
+gravadas + origem apagada juntas): os locks duram um lote e uma execução
+interrompida não conta amostras duas vezes. Só horas/dias completos são
+compactados.
+
+Com Price particionada (base/partitions.py) o bruto não é apagado aqui: a
+compactação parte da última vela de 1h do bloco e a retenção do bruto vira o
+DROP da partição mensal.
+
+Consulta (historico_precos): escolhe a granularidade pelo tamanho do intervalo
+e lê bruto, velas de 1h e de 1d, reagrupando o que for mais fino que o pedido.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import partitions
+from .models import Item, Price, PriceCandle
+
+log = logging.getLogger(__name__)
+
+BRUTO = "raw"
+_PASSO = {PriceCandle.HORA: timedelta(hours=1), PriceCandle.DIA: timedelta(days=1)}
+_ITENS_POR_BLOCO = 200
+
+# (item_id, site_id, inicio) -> [open, high, low, close, amostras]
+Chave = Tuple[int, int, datetime]
+
+
+def _inicio_hora(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _inicio_dia(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+_BUCKET = {PriceCandle.HORA: _inicio_hora, PriceCandle.DIA: _inicio_dia}
+
+
+def _juntar(velas: Dict[Chave, list], chave: Chave, o: float, h: float, l: float, c: float, n: int) -> None:
+    """Soma uma amostra/vela à vela da chave (entradas chegam em ordem de tempo)."""
+    atual = velas.get(chave)
+    if atual is None:
+        velas[chave] = [o, h, l, c, n]
+        return
+    atual[1] = max(atual[1], h)
+    atual[2] = min(atual[2], l)
+    atual[3] = c
+    atual[4] += n
+
+
+def _gravar_velas(granularidade: str, item_ids: List[int], velas: Dict[Chave, list]) -> int:
+    """Upsert das velas; se já existir vela na mesma chave (linha atrasada), mescla."""
+    if not velas:
+        return 0
+    inicios = {k[2] for k in velas}
+    existentes = {
+        (v.item_id, v.site_id, v.inicio): v
+        for v in PriceCandle.objects.filter(
+            granularidade=granularidade, item_id__in=item_ids,
+            inicio__gte=min(inicios), inicio__lte=max(inicios),
+        )
+    }
+    objs = []
+    for (item_id, site_id, inicio), (o, h, l, c, n) in velas.items():
+        velha = existentes.get((item_id, site_id, inicio))
+        if velha is not None:
+            # a vela existente é de uma compactação anterior: veio antes
+            o, h, l, n = velha.open, max(h, velha.high), min(l, velha.low), n + velha.amostras
+        objs.append(PriceCandle(
+            item_id=item_id, site_id=site_id, granularidade=granularidade, inicio=inicio,
+            open=o, high=h, low=l, close=c, amostras=n,
+        ))
+    PriceCandle.objects.bulk_create(
+        objs,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["item", "site", "granularidade", "inicio"],
+        update_fields=["open", "high", "low", "close", "amostras"],
+    )
+    return len(objs)
+
+
+def _compactar_em_lotes(origem, ordem: Tuple[str, ...], campos: Tuple[str, ...], granularidade: str,
+                        item_ids: List[int], converter) -> Tuple[int, int]:
+    """
+    Compacta `origem` em transações de até PRICE_COMPACT_BATCH linhas: cada uma
+    lê o próximo lote (em ordem de tempo por item/site), grava as velas e apaga
+    as linhas lidas, então nenhuma transação segura mais que um lote de locks.
+    Vela dividida entre dois lotes é mesclada pelo _gravar_velas; uma execução
+    interrompida retoma do que ainda não foi apagado.
+    """
+    gravadas = apagadas = 0
+    lote = settings.PRICE_COMPACT_BATCH
+    while True:
+        with transaction.atomic():
+            rows = list(origem.order_by(*ordem).values_list("id", *campos)[:lote])
+            velas: Dict[Chave, list] = {}
+            for _id, *valores in rows:
+                _juntar(velas, *converter(*valores))
+            gravadas += _gravar_velas(granularidade, item_ids, velas)
+            if rows:
+                apagadas += origem.model.objects.filter(id__in=[r[0] for r in rows]).delete()[0]
+        if len(rows) < lote:
+            return gravadas, apagadas
+
+
+def _amostra_bruta(item_id, site_id, ts, p):
+    return (item_id, site_id, _inicio_hora(ts)), p, p, p, p, 1
+
+
+def _vela_horaria(item_id, site_id, inicio, o, h, l, c, n):
+    return (item_id, site_id, _inicio_dia(inicio)), o, h, l, c, n
+
+
+def _blocos_de_itens() -> Iterator[List[int]]:
+    ids = list(Item.objects.order_by("id").values_list("id", flat=True))
+    for i in range(0, len(ids), _ITENS_POR_BLOCO):
+        yield ids[i:i + _ITENS_POR_BLOCO]
+
+
+def _fronteira(**filtros) -> Optional[datetime]:
+    """Fim da última vela de 1h gravada: antes dela o bruto já foi compactado."""
+    ultima = (
+        PriceCandle.objects.filter(granularidade=PriceCandle.HORA, **filtros)
+        .aggregate(m=Max("inicio"))["m"]
+    )
+    return ultima + _PASSO[PriceCandle.HORA] if ultima else None
+
+
+def _compactar_bruto(item_ids: List[int], corte: datetime) -> Tuple[int, int]:
+    origem = Price.objects.filter(item_id__in=item_ids, timestamp__lt=corte)
+    if not partitions.particionado():
+        return _compactar_em_lotes(
+            origem, ("item_id", "site_id", "timestamp", "id"), ("item_id", "site_id", "timestamp", "price"),
+            PriceCandle.HORA, item_ids, _amostra_bruta,
+        )
+    # o bruto só sai no DROP da partição: lê só as horas depois da última vela do
+    # bloco e grava sem apagar nada (a fronteira exige o bloco inteiro de uma vez)
+    fronteira = _fronteira(item_id__in=item_ids)
+    if fronteira is not None:
+        origem = origem.filter(timestamp__gte=fronteira)
+    velas: Dict[Chave, list] = {}
+    rows = origem.order_by("item_id", "site_id", "timestamp", "id").values_list("item_id", "site_id", "timestamp", "price")
+    for row in rows.iterator(chunk_size=settings.PRICE_COMPACT_BATCH):
+        _juntar(velas, *_amostra_bruta(*row))
+    return _gravar_velas(PriceCandle.HORA, item_ids, velas), 0
+
+
+def _compactar_horas(item_ids: List[int], corte: datetime) -> Tuple[int, int]:
+    origem = PriceCandle.objects.filter(granularidade=PriceCandle.HORA, item_id__in=item_ids, inicio__lt=corte)
+    return _compactar_em_lotes(
+        origem, ("item_id", "site_id", "inicio"),
+        ("item_id", "site_id", "inicio", "open", "high", "low", "close", "amostras"),
+        PriceCandle.DIA, item_ids, _vela_horaria,
+    )
+
+
+def compactar_precos(agora: Optional[datetime] = None) -> Dict[str, int]:
+    agora = agora or timezone.now()
+    corte_bruto = _inicio_hora(agora - timedelta(hours=settings.PRICE_RAW_RETENTION_HOURS))
+    corte_horas = _inicio_dia(agora - timedelta(days=settings.PRICE_HOURLY_RETENTION_DAYS))
+
+    res = {"velas_1h": 0, "brutos_apagados": 0, "velas_1d": 0, "velas_1h_apagadas": 0}
+    for bloco in _blocos_de_itens():
+        g, a = _compactar_bruto(bloco, corte_bruto)
+        res["velas_1h"] += g
+        res["brutos_apagados"] += a
+        g, a = _compactar_horas(bloco, corte_horas)
+        res["velas_1d"] += g
+        res["velas_1h_apagadas"] += a
+    log.warning(
+        "[HIST] compactação | velas_1h=%d | brutos_apagados=%d | velas_1d=%d | velas_1h_apagadas=%d",
+        res["velas_1h"], res["brutos_apagados"], res["velas_1d"], res["velas_1h_apagadas"],
+    )
+    return res
+
+
+def _granularidade_para(inicio: datetime, fim: datetime, max_pontos: int) -> str:
+    """A mais fina cujo número de pontos cabe em max_pontos (bruto ~ 1 ponto/minuto)."""
+    span = fim - inicio
+    if span <= timedelta(minutes=max_pontos):
+        return BRUTO
+    if span <= timedelta(hours=max_pontos):
+        return PriceCandle.HORA
+    return PriceCandle.DIA
+
+
+def historico_precos(
+    item_id: int,
+    site_id: int,
+    inicio: datetime,
+    fim: Optional[datetime] = None,
+    *,
+    max_pontos: int = 500,
+    granularidade: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    Série de preços de (item, site) em [inicio, fim), na granularidade
+    pedida ou na escolhida automaticamente. Retorna
+    {"granularidade": "raw" | "1h" | "1d", "pontos": [{"t", "open", "high", "low", "close", "amostras"}]}.
+    Trechos já compactados voltam com a granularidade em que estão guardados
+    quando ela é mais grossa que a pedida.
+    """
+    fim = fim or timezone.now()
+    gran = granularidade or _granularidade_para(inicio, fim, max_pontos)
+
+    fontes: List[Tuple[str, datetime, float, float, float, float, int]] = []
+    for g in (PriceCandle.DIA, PriceCandle.HORA):
+        # vela que começou antes de 'inicio' mas cobre parte do intervalo também entra
+        velas = PriceCandle.objects.filter(
+            item_id=item_id, site_id=site_id, granularidade=g,
+            inicio__gt=inicio - _PASSO[g], inicio__lt=fim,
+        ).order_by("inicio").values_list("inicio", "open", "high", "low", "close", "amostras")
+        fontes.extend((g, *v) for v in velas)
+    desde = inicio
+    if partitions.particionado():
+        # bruto já compactado continua nas partições até expirarem: não contar duas vezes
+        desde = max(inicio, _fronteira(item_id=item_id, site_id=site_id) or inicio)
+    brutos = Price.objects.filter(
+        item_id=item_id, site_id=site_id, timestamp__gte=desde, timestamp__lt=fim,
+    ).order_by("timestamp").values_list("timestamp", "price")
+    fontes.extend((BRUTO, ts, p, p, p, p, 1) for ts, p in brutos)
+    fontes.sort(key=lambda f: f[1])
+
+    ordem = [BRUTO, PriceCandle.HORA, PriceCandle.DIA]
+    velas: Dict[Chave, list] = {}
+    for g, t, o, h, l, c, n in fontes:
+        # mais fino que o pedido: reagrupa; igual ou mais grosso: mantém
+        chave_t = _BUCKET[gran](t) if ordem.index(g) < ordem.index(gran) else t
+        _juntar(velas, (item_id, site_id, chave_t), o, h, l, c, n)
+
+    return {
+        "granularidade": gran,
+        "pontos": [
+            {"t": t, "open": o, "high": h, "low": l, "close": c, "amostras": n}
+            for (_i, _s, t), (o, h, l, c, n) in sorted(velas.items(), key=lambda kv: kv[0][2])
+        ],
+    }
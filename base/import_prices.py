@@ -1,13 +1,24 @@
 import requests
 import cloudscraper
+from django.conf import settings
 
 headers = {"User-Agent": "Mozilla/5.0"}
 
+def _http(session=None):
+    """Dentro do Django passa pela camada de transporte (record/replay); como script, requests direto."""
+    if settings.configured:
+        from base import transport
+        return transport.montar(session or requests.Session())
+    return session or requests
+
+def _base(nome, padrao):
+    return getattr(settings, nome) if settings.configured else padrao
+
 # ===== Steam =====
 def get_steam_price(item_name, currency=1):
-    url = "https://steamcommunity.com/market/priceoverview/"
+    url = f"{_base('STEAM_BASE_URL', 'https://steamcommunity.com')}/market/priceoverview/"
     params = {"currency": currency, "appid": 730, "market_hash_name": item_name}
-    r = requests.get(url, params=params, headers=headers).json()
+    r = _http().get(url, params=params, headers=headers).json()
     if r.get("success"):
         return {
             "steam_lowest": r.get("lowest_price"),
@@ -18,13 +29,13 @@ def get_steam_price(item_name, currency=1):
 
 # ===== CS.MONEY =====
 def get_cs_money(limit=60, offset=0):
-    url = f"https://cs.money/1.0/market/sell-orders?limit={limit}&offset={offset}"
-    scraper = cloudscraper.create_scraper()
+    url = f"{_base('CSMONEY_BASE_URL', 'https://cs.money')}/1.0/market/sell-orders?limit={limit}&offset={offset}"
+    scraper = _http(cloudscraper.create_scraper())
     r = scraper.get(url, headers=headers).json()
     return r.get("items", [])
 
 def get_csfloat(item_name, limit=5):
-    url = "https://csfloat.com/api/v1/listings"
+    url = f"{_base('CSFLOAT_BASE_URL', 'https://csfloat.com')}/api/v1/listings"
     params = {
         "market_hash_name": item_name,
         "type": "sell",
@@ -32,11 +43,10 @@ def get_csfloat(item_name, limit=5):
         "limit": limit
     }
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=15)
+        resp = _http().get(url, params=params, headers=headers, timeout=15)
         print("CSFloat URL:", resp.url)       # 👈 mostra URL real consultada
         print("Resposta bruta:", resp.text)   # 👈 vê o que voltou
-        data = resp.json()
-        r = requests.get(url, params=params, headers=headers, timeout=15).json()
+        r = resp.json()
         listings = r.get("listings", [])
         return [
             {
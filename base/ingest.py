@@ -0,0 +1,188 @@
+# base/ingest.py
+"""
+Caminho de escrita em lote para a ingestão de preços.
+
+Os crawlers acumulam resultados num PriceIngestBuffer, que grava em lotes:
+- Price (histórico) via bulk_create, ou COPY quando o banco é PostgreSQL;
+- LatestPrice via upsert (INSERT ... ON CONFLICT DO UPDATE), com o volume
+  (liquidez) quando o crawler o informa;
+- InventoryItem.price_usd via bulk_update;
+- InventoryItem.preco_atual das linhas afetadas e, depois do commit, o
+  PortfolioSnapshot das contas que as possuem (base/portfolio.py);
+- depois do commit, os alvos (PriceAlvo) dos itens observados no lote são
+  avaliados pelo motor de alertas (base/alerts.py).
+"""
+from __future__ import annotations
+
+import logging
+from functools import partial
+from typing import Dict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import alerts, portfolio
+from .models import InventoryItem, LatestPrice, Price, Site
+
+log = logging.getLogger(__name__)
+
+# Políticas de gravação do histórico
+POLITICA_SEMPRE = "sempre"  # grava toda observação
+POLITICA_MUDOU = "mudou"    # só grava se diferente do último preço conhecido
+POLITICA_CAIU = "caiu"      # histórico só com quedas (cs.money); o LatestPrice segue toda observação
+
+
+class PriceIngestBuffer:
+    """
+    Acumula preços por item e grava tudo de uma vez a cada `batch_size` itens.
+
+    Uso:
+        with PriceIngestBuffer(site, politica=POLITICA_MUDOU) as buf:
+            buf.add(item.id, 12.34, volume=87)  # volume é opcional
+            buf.add_inventory_price(inv_item, Decimal("10.49"))
+        buf.stats  # {"salvos": ..., "ignorados": ..., "inventario_atualizados": ...}
+    """
+
+    def __init__(
+        self,
+        site: Site,
+        *,
+        politica: str = POLITICA_SEMPRE,
+        batch_size: int | None = None,
+        epsilon: float = 1e-9,
+    ):
+        self.site = site
+        self.politica = politica
+        self.batch_size = batch_size or settings.PRICE_INGEST_BATCH_SIZE
+        self.epsilon = epsilon
+        self._precos: Dict[int, float] = {}                # item_id -> preço (o último vence)
+        self._volumes: Dict[int, int] = {}                 # item_id -> volume informado
+        self._inv_items: Dict[int, InventoryItem] = {}     # pk -> InventoryItem com price_usd novo
+        self.stats = {"salvos": 0, "ignorados": 0, "inventario_atualizados": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def add(self, item_id: int, price: float, volume: int | None = None) -> None:
+        self._precos[item_id] = float(price)
+        if volume is not None:
+            self._volumes[item_id] = int(volume)
+        if len(self._precos) >= self.batch_size:
+            self.flush()
+
+    def add_inventory_price(self, inv_item: InventoryItem, price_usd) -> None:
+        inv_item.price_usd = price_usd
+        self._inv_items[inv_item.pk] = inv_item
+        if len(self._inv_items) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._precos and not self._inv_items:
+            return
+        precos, self._precos = self._precos, {}
+        volumes, self._volumes = self._volumes, {}
+        inv_items, self._inv_items = list(self._inv_items.values()), {}
+
+        contas = {ii.inventory_id for ii in inv_items}
+        with transaction.atomic():
+            novos, observados = self._aplicar_politica(precos)
+            now = timezone.now()
+            if novos:
+                self._gravar_historico(novos, now)
+            if observados:
+                self._upsert_latest(observados, now, volumes)
+                contas |= portfolio.aplicar_precos(observados, now)
+            if inv_items:
+                InventoryItem.objects.bulk_update(inv_items, ["price_usd"], batch_size=self.batch_size)
+        if contas:
+            # depois do commit externo, se houver (ex.: _persistir_minimos_csmoney): o
+            # snapshot não pode ler linhas que ainda podem sofrer rollback
+            transaction.on_commit(partial(portfolio.atualizar_snapshots, contas), robust=True)
+        if observados:
+            # todo preço visto, não só o que entrou no histórico: na política "caiu" as
+            # subidas também cruzam alvos "acima" e rearmam os "abaixo"; o UPDATE
+            # condicional do motor torna a reavaliação idempotente. Roda depois do
+            # commit externo, se houver
+            transaction.on_commit(partial(alerts.avaliar, self.site.id, observados, now), robust=True)
+
+        self.stats["salvos"] += len(novos)
+        self.stats["ignorados"] += len(precos) - len(novos)
+        self.stats["inventario_atualizados"] += len(inv_items)
+
+    # ---- internos ----
+
+    def _aplicar_politica(self, precos: Dict[int, float]):
+        """
+        Retorna (novos, observados):
+        - novos: preços que entram no histórico (Price), conforme a política
+        - observados: todos os preços vistos; atualizam o LatestPrice
+        """
+        if self.politica == POLITICA_SEMPRE:
+            return precos, precos
+
+        ultimos = dict(
+            LatestPrice.objects
+            .filter(site=self.site, item_id__in=list(precos))
+            .values_list("item_id", "price")
+        )
+        novos = {}
+        observados = {}
+        for item_id, p in precos.items():
+            last = ultimos.get(item_id)
+            if self.politica == POLITICA_CAIU:
+                if last is None or p < last - self.epsilon:
+                    novos[item_id] = p
+            elif last is None or abs(p - last) > self.epsilon:  # POLITICA_MUDOU
+                novos[item_id] = p
+            # o LatestPrice sempre segue a observação (subidas e timestamp inclusive):
+            # a arbitragem lê dele o preço corrente e descarta o que está velho
+            observados[item_id] = p
+        return novos, observados
+
+    def _gravar_historico(self, precos: Dict[int, float], now) -> None:
+        if connection.vendor == "postgresql" and len(precos) >= settings.PRICE_INGEST_COPY_MIN_ROWS:
+            self._copy_historico(precos, now)
+            return
+        Price.objects.bulk_create(
+            [Price(item_id=item_id, site=self.site, price=p, timestamp=now) for item_id, p in precos.items()],
+            batch_size=self.batch_size,
+        )
+
+    def _copy_historico(self, precos: Dict[int, float], now) -> None:
+        """Fast path do PostgreSQL: COPY ... FROM STDIN (psycopg 3)."""
+        opts = Price._meta
+        cols = ", ".join(
+            opts.get_field(f).column for f in ("item", "site", "price", "timestamp")
+        )
+        sql = f"COPY {opts.db_table} ({cols}) FROM STDIN"
+        with connection.cursor() as c:
+            with c.cursor.copy(sql) as copy:
+                for item_id, p in precos.items():
+                    copy.write_row((item_id, self.site.id, p, now))
+
+    def _upsert_latest(self, precos: Dict[int, float], now, volumes: Dict[int, int]) -> None:
+        """Sem volume informado (ex.: busca da Steam), o volume já gravado é mantido."""
+        com_volume = [i for i in precos if i in volumes]
+        sem_volume = [i for i in precos if i not in volumes]
+        for item_ids, campos in (
+            (com_volume, ["price", "timestamp", "volume"]),
+            (sem_volume, ["price", "timestamp"]),
+        ):
+            if not item_ids:
+                continue
+            LatestPrice.objects.bulk_create(
+                [
+                    LatestPrice(item_id=i, site=self.site, price=precos[i], timestamp=now, volume=volumes.get(i))
+                    for i in item_ids
+                ],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["item", "site"],
+                update_fields=campos,
+            )
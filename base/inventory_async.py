@@ -0,0 +1,183 @@
+# base/inventory_async.py
+"""
+Importação de inventários Steam de várias contas em paralelo.
+
+- Uma única aiohttp.ClientSession (keep-alive) para todas as contas;
+  até STEAM_MAX_IN_FLIGHT contas baixando ao mesmo tempo.
+- Cada página passa pelo mesmo orçamento de req/s do steam_async
+  (token bucket do Redis com RATE_LIMIT_DISTRIBUTED); 429 pausa o orçamento.
+- A gravação reaproveita a sincronização incremental de base/utils.py
+  (recente / 1ª página inalterada / diff) via sync_to_async.
+
+Uso síncrono (Celery/commands):
+    resultados = importar_inventarios([1, 2, 3], ao_concluir=lambda conta_id, res: ...)
+    # {1: {"itens_total": ..., "itens_distintos": ..., "removidos": ..., "status": ...}, ...}
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Callable, Dict, Iterable, Optional
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import transport
+from .locks import LeaseLock
+from .models import Inventory
+from .ratelimit import limiter_for
+from .steam_async import STEAM_HEADERS, AsyncRateLimiter, DistributedRateLimiter, _retry_after, run_sync
+from .utils import (
+    _aplicar_inventario,
+    _marcar_inalterado,
+    _primeira_pagina_inalterada,
+    _resumo_inventario,
+    _sync_recente,
+)
+
+log = logging.getLogger(__name__)
+
+INVENTORY_PATH = "/inventory/{steam_id}/730/2"  # sob settings.STEAM_BASE_URL
+
+AoConcluir = Callable[[int, dict], None]
+
+
+def lock_inventario(conta_id: int) -> LeaseLock:
+    return LeaseLock(f"inventario:conta:{conta_id}", ttl=settings.STEAM_TASK_LOCK_TTL)
+
+
+class InventoryImporter:
+    """
+    async with InventoryImporter() as imp:
+        resultados = await imp.importar_muitas(contas)
+    """
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int | None = None,
+        force: bool = False,
+        count: int = 1000,
+        retries: int = 3,
+        delay: float = 2.0,
+    ):
+        self.max_in_flight = max_in_flight or settings.STEAM_MAX_IN_FLIGHT
+        self.force = force
+        self.count = count
+        self.retries = retries
+        self.delay = delay
+        self.limiter: AsyncRateLimiter | DistributedRateLimiter | None = None
+        self.session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self):
+        if settings.RATE_LIMIT_DISTRIBUTED:
+            self.limiter = DistributedRateLimiter(limiter_for("steamcommunity.com"))
+        else:
+            self.limiter = AsyncRateLimiter(settings.STEAM_REQUESTS_PER_SECOND)
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        self.session = transport.sessao_async(
+            connector=connector,
+            headers=STEAM_HEADERS,
+            timeout=aiohttp.ClientTimeout(connect=4, sock_read=20),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def _get_page(self, steam_id: str, params: dict) -> dict:
+        url = settings.STEAM_BASE_URL + INVENTORY_PATH.format(steam_id=steam_id)
+        for attempt in range(self.retries):
+            await self.limiter.acquire()
+            try:
+                async with self.session.get(url, params=params) as resp:
+                    if resp.status == 429:
+                        wait = min(_retry_after(resp, self.delay * (2 ** attempt)), 60)
+                        log.warning("[RATE] 429 no inventário %s (tentativa %s/%s). Pausando %.1fs",
+                                    steam_id, attempt + 1, self.retries, wait)
+                        self.limiter.pause(wait)
+                        continue
+                    resp.raise_for_status()  # 403 = inventário privado: não adianta repetir
+                    return await resp.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                wait = min(self.delay * (2 ** attempt) + random.uniform(0.5, 2.0), 45)
+                log.warning("[ERRO] Falha no inventário %s (tentativa %s/%s): %s | aguardando %.1fs",
+                            steam_id, attempt + 1, self.retries, e, wait)
+                await asyncio.sleep(wait)
+        raise RuntimeError(f"inventário {steam_id} indisponível após {self.retries} tentativas")
+
+    async def _pages(self, steam_id: str):
+        params = {"l": "english", "count": str(self.count)}
+        while True:
+            data = await self._get_page(steam_id, params)
+            yield data
+            if data.get("more_items") and data.get("last_assetid"):
+                params["start_assetid"] = data["last_assetid"]
+            else:
+                break
+
+    async def importar(self, conta: Inventory) -> dict:
+        """Mesmo fluxo de utils.importar_inventario, com o download assíncrono."""
+        if _sync_recente(conta, self.force):
+            return await sync_to_async(_resumo_inventario)(conta, "recente")
+
+        paginas = self._pages(conta.steam_id)
+        primeira = await anext(paginas)
+        if _primeira_pagina_inalterada(conta, primeira, self.force):
+            await paginas.aclose()
+            return await sync_to_async(_marcar_inalterado)(conta)
+
+        resto = [p async for p in paginas]
+        return await sync_to_async(_aplicar_inventario)(conta, [primeira, *resto], self.force)
+
+    async def _importar_com_lock(self, conta: Inventory) -> dict:
+        lock = lock_inventario(conta.id)
+        if not lock.acquire():
+            return {"status": "skipped"}
+        try:
+            return await self.importar(conta)
+        except Exception as e:  # uma conta com erro não derruba o lote
+            log.error("[ERRO] Importação do inventário da conta %s falhou: %s", conta.id, e)
+            return {"status": "erro", "erro": str(e)}
+        finally:
+            lock.release()
+
+    async def importar_muitas(self, contas: Iterable[Inventory], ao_concluir: Optional[AoConcluir] = None) -> Dict[int, dict]:
+        sem = asyncio.Semaphore(self.max_in_flight)
+        resultados: Dict[int, dict] = {}
+
+        async def _uma(conta):
+            async with sem:
+                res = await self._importar_com_lock(conta)
+            resultados[conta.id] = res
+            if ao_concluir:
+                ao_concluir(conta.id, res)
+
+        await asyncio.gather(*(_uma(c) for c in contas))
+        return resultados
+
+
+def importar_inventarios(
+    conta_ids: Iterable[int] | None = None,
+    *,
+    force: bool = False,
+    max_in_flight: int | None = None,
+    ao_concluir: Optional[AoConcluir] = None,
+) -> Dict[int, dict]:
+    """API síncrona: importa as contas informadas (ou todas) e devolve {conta_id: stats}."""
+    qs = Inventory.objects.all()
+    if conta_ids is not None:
+        qs = qs.filter(id__in=list(conta_ids))
+    contas = list(qs)
+
+    async def _run():
+        async with InventoryImporter(max_in_flight=max_in_flight, force=force) as imp:
+            return await imp.importar_muitas(contas, ao_concluir)
+
+    return run_sync(_run())
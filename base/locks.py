@@ -0,0 +1,123 @@
+# base/locks.py
+"""
+Locks distribuídos com lease (Redis) e marcadores de "já na fila".
+
+- LeaseLock: SET NX com expiração; só quem tem o token libera/renova.
+  Com auto-renovação, o lease acompanha tarefas longas e expira sozinho
+  se o worker morrer.
+- marcar_na_fila/limpar_na_fila: coalescem enfileiramentos repetidos da
+  mesma tarefa enquanto a anterior ainda não começou.
+- contar/contadores: totais de skipped/coalesced/enfileirados no Redis.
+
+Sem Redis, os locks ficam abertos (fail-open) para não travar a aplicação.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+import redis
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_STATS_KEY = "arb:stats:fila"
+
+
+class LeaseLock:
+    def __init__(self, name: str, ttl: int):
+        self.key = f"arb:lock:{name}"
+        self.ttl = int(ttl)
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        try:
+            return bool(get_redis().set(self.key, self.token, nx=True, ex=self.ttl))
+        except redis.exceptions.RedisError as e:
+            log.warning("[LOCK] Redis indisponível (%s); seguindo sem lock %s", e, self.key)
+            return True
+
+    def renew(self) -> bool:
+        try:
+            return bool(get_redis().eval(_RENEW_LUA, 1, self.key, self.token, self.ttl))
+        except redis.exceptions.RedisError:
+            return False
+
+    def release(self) -> None:
+        try:
+            get_redis().eval(_RELEASE_LUA, 1, self.key, self.token)
+        except redis.exceptions.RedisError:
+            pass
+
+    def is_locked(self) -> bool:
+        try:
+            return bool(get_redis().exists(self.key))
+        except redis.exceptions.RedisError:
+            return False
+
+    @contextmanager
+    def keepalive(self):
+        """Renova o lease a cada ttl/3 enquanto o bloco roda."""
+        stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(self.ttl / 3):
+                if not self.renew():
+                    log.warning("[LOCK] Lease perdido: %s", self.key)
+                    return
+
+        t = threading.Thread(target=_loop, daemon=True)
+        t.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            t.join()
+
+
+def marcar_na_fila(name: str, ttl: int) -> bool:
+    """True se marcou agora (pode enfileirar); False se já havia uma na fila."""
+    try:
+        return bool(get_redis().set(f"arb:fila:{name}", 1, nx=True, ex=int(ttl)))
+    except redis.exceptions.RedisError:
+        return True
+
+
+def limpar_na_fila(name: str) -> None:
+    try:
+        get_redis().delete(f"arb:fila:{name}")
+    except redis.exceptions.RedisError:
+        pass
+
+
+def contar(campo: str, n: int = 1) -> None:
+    if n <= 0:
+        return
+    try:
+        get_redis().hincrby(_STATS_KEY, campo, n)
+    except redis.exceptions.RedisError:
+        pass
+
+
+def contadores() -> dict:
+    try:
+        return {k: int(v) for k, v in get_redis().hgetall(_STATS_KEY).items()}
+    except redis.exceptions.RedisError:
+        return {}
@@ -0,0 +1,68 @@
+# base/management/commands/benchmark.py
+from __future__ import annotations
+import json
+from django.core.management.base import BaseCommand, CommandError
+from base import benchmark
+from base.stubs import StubConfig
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ponta a ponta (importação, ingestão Steam/cs.money, valuation e páginas) "
+        "num banco/Redis próprios com dados sintéticos e stubs locais. Relatório em JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", choices=sorted(benchmark.ESCALAS), default="pequena")
+        parser.add_argument("--itens", type=int, help="sobrescreve o nº de Items da escala")
+        parser.add_argument("--contas", type=int, help="sobrescreve o nº de contas da escala")
+        parser.add_argument("--precos", type=int, help="sobrescreve o nº de linhas de Price da escala")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--cenarios", nargs="+", choices=benchmark.CENARIOS, help="padrão: todos")
+        parser.add_argument("--amostra", type=int, default=10, help="contas medidas por cenário")
+        parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência do stub")
+        parser.add_argument("--sem-memoria", action="store_true", help="desliga o tracemalloc (tempos sem overhead)")
+        parser.add_argument("--keepdb", action="store_true", help="reusa o banco do benchmark (não regera os dados)")
+        parser.add_argument("--saida", help="grava o relatório neste arquivo")
+        parser.add_argument("--baseline", help="relatório anterior para comparar")
+        parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita (0.2 = 20%%)")
+        parser.add_argument("--falhar-em-regressao", action="store_true", help="sai com erro se houver regressão")
+
+    def handle(self, *args, **opts):
+        escala = dict(benchmark.ESCALAS[opts["escala"]])
+        for campo in ("itens", "contas", "precos"):
+            if opts[campo] is not None:
+                escala[campo] = opts[campo]
+        baseline = benchmark.carregar(opts["baseline"]) if opts["baseline"] else None
+
+        with benchmark.isolado(keepdb=opts["keepdb"]):
+            from base.models import Item
+            if opts["keepdb"] and Item.objects.count() >= escala["itens"]:
+                self.stderr.write("[BENCH] reusando dados do banco do benchmark")
+            else:
+                gerados = benchmark.gerar_dados(escala, opts["seed"], lambda m: self.stderr.write(f"[BENCH] {m}"))
+                self.stderr.write(f"[BENCH] dados | {gerados}")
+            relatorio = benchmark.rodar(
+                opts["cenarios"],
+                amostra=opts["amostra"],
+                stub_config=StubConfig(latencia_ms=opts["latencia_ms"], seed=opts["seed"]),
+                memoria=not opts["sem_memoria"],
+            )
+        relatorio.update({"escala": escala, "seed": opts["seed"]})
+
+        if opts["saida"]:
+            benchmark.salvar(relatorio, opts["saida"])
+        self.stdout.write(json.dumps(relatorio, ensure_ascii=False, indent=2))
+
+        if baseline is None:
+            return
+        if baseline.get("escala") != escala or baseline.get("banco") != relatorio["banco"]:
+            self.stderr.write(self.style.WARNING("[BENCH] baseline com escala/banco diferentes: comparação só indicativa"))
+        diffs = benchmark.comparar(relatorio, baseline, opts["tolerancia"])
+        regressoes = [d for d in diffs if d["regressao"]]
+        for d in diffs:
+            delta = "novo" if d["delta"] is None else f"{d['delta']:+.1%}"
+            linha = f"{d['cenario']:<32} {d['metrica']:<12} {d['baseline']:>12} -> {d['atual']:>12} ({delta})"
+            self.stderr.write(self.style.ERROR(linha) if d["regressao"] else linha)
+        if regressoes and opts["falhar_em_regressao"]:
+            raise CommandError(f"{len(regressoes)} regressão(ões) acima da tolerância")
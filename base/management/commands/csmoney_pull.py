@@ -3,6 +3,7 @@ from __future__ import annotations
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from base.models import Inventory
+from base.ratelimit import limiter_for
 from base.utils_csmoney import fetch_sell_order_by_id, extract_price
 
 class Command(BaseCommand):
@@ -23,8 +24,12 @@ class Command(BaseCommand):
               .exclude(csmoney_id__isnull=True)
               .exclude(csmoney_id=0))
 
+        # mesmo balde (por proxy) usado pelos workers do Celery
+        bucket = limiter_for("cs.money", proxy)
+
         ok = miss = 0
         for inv in qs.iterator():
+            bucket.acquire()
             order = fetch_sell_order_by_id(inv.csmoney_id, proxy=proxy)
             price = extract_price(order) if order else None
             self.stdout.write(f"[{inv.id}] {getattr(inv, 'item', inv)} -> {price}")
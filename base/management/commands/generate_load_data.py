@@ -0,0 +1,47 @@
+# base/management/commands/generate_load_data.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand, CommandError
+from base import synthetic
+from base.models import Inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos no formato dos de produção (itens populares compartilhados, inventários de "
+        "cauda pesada, anos de histórico de Price por site, PriceAlvo) no banco configurado. "
+        "Determinístico pela --seed. Use um banco descartável."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--itens", type=int, default=50_000)
+        parser.add_argument("--contas", type=int, default=500)
+        parser.add_argument("--precos", type=int, default=10_000_000, help="orçamento de linhas de Price")
+        parser.add_argument("--anos", type=float, default=2.0, help="extensão do histórico")
+        parser.add_argument("--passo-min", type=int, default=1, help="resolução máxima das séries (minutos)")
+        parser.add_argument("--zipf", type=float, default=0.9, help="concentração da popularidade dos itens")
+        parser.add_argument("--inventario-mediano", type=int, default=60, help="itens distintos na conta mediana")
+        parser.add_argument("--pareto", type=float, default=1.3, help="cauda dos tamanhos (menor = mais pesada)")
+        parser.add_argument("--inventario-max", type=int, default=5000)
+        parser.add_argument("--alvos", type=float, default=0.05, help="fração dos itens em carteira com PriceAlvo")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefixo", default="sint", help="prefixo do nome das contas geradas")
+
+    def handle(self, *args, **opts):
+        marca = f"{opts['prefixo']}-{opts['seed']}-"
+        if Inventory.objects.filter(name__startswith=marca).exists():
+            raise CommandError(f"Já existem contas '{marca}*' neste banco: use outra --seed/--prefixo ou um banco limpo.")
+
+        res = synthetic.gerar(
+            opts["itens"], opts["contas"], opts["precos"],
+            seed=opts["seed"],
+            anos=opts["anos"],
+            passo_min=opts["passo_min"],
+            zipf=opts["zipf"],
+            inventario_mediano=opts["inventario_mediano"],
+            pareto=opts["pareto"],
+            inventario_max=opts["inventario_max"],
+            alvos=opts["alvos"],
+            prefixo=opts["prefixo"],
+            progresso=lambda m: self.stdout.write(f"[CARGA] {m}"),
+        )
+        self.stdout.write(self.style.SUCCESS(" | ".join(f"{k}={v}" for k, v in res.items())))
@@ -0,0 +1,43 @@
+# base/management/commands/importar_inventarios.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from base.inventory_async import importar_inventarios
+from base.tasks import importar_inventarios_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa os inventários Steam de várias contas em paralelo (todas, se nenhum id for informado), "
+        "respeitando o orçamento global de requisições da Steam."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("conta_ids", nargs="*", type=int, help="ids de Inventory")
+        parser.add_argument("--force", action="store_true", help="ignora intervalo mínimo e fingerprints")
+        parser.add_argument("--max-in-flight", type=int, default=None, help="contas baixando ao mesmo tempo")
+        parser.add_argument("--enfileirar", action="store_true", help="envia para o Celery em vez de rodar aqui")
+
+    def handle(self, *args, **opts):
+        conta_ids = opts["conta_ids"] or None
+
+        if opts["enfileirar"]:
+            res = importar_inventarios_task.delay(conta_ids, force=opts["force"])
+            self.stdout.write(self.style.SUCCESS(f"Tarefa enfileirada: {res.id}"))
+            return
+
+        def _progresso(conta_id: int, res: dict) -> None:
+            if res.get("status") == "erro":
+                self.stdout.write(self.style.ERROR(f"conta {conta_id}: erro: {res['erro']}"))
+                return
+            self.stdout.write(
+                f"conta {conta_id}: {res.get('status')} | itens_total={res.get('itens_total', 0)} "
+                f"| itens_distintos={res.get('itens_distintos', 0)} | removidos={res.get('removidos', 0)}"
+            )
+
+        resultados = importar_inventarios(
+            conta_ids,
+            force=opts["force"],
+            max_in_flight=opts["max_in_flight"],
+            ao_concluir=_progresso,
+        )
+        self.stdout.write(self.style.SUCCESS(f"{len(resultados)} conta(s) processada(s)."))
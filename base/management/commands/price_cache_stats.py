@@ -0,0 +1,29 @@
+# base/management/commands/price_cache_stats.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+from base.locks import contadores
+from base.price_cache import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra os contadores do cache compartilhado de preços (hits, misses, coalescidos...) "
+        "e do fan-out de tarefas (enfileiradas, em execução, coalescidas)."
+    )
+
+    def handle(self, *args, **opts):
+        s = stats()
+        consultas = s["hits"] + s["negative_hits"] + s["misses"]
+        for k, v in s.items():
+            self.stdout.write(f"{k:>14}: {v}")
+        if consultas:
+            evitadas = consultas - s["fetched"]
+            self.stdout.write(self.style.SUCCESS(
+                f"Chamadas ao upstream evitadas: {evitadas}/{consultas} ({evitadas / consultas:.1%})"
+            ))
+
+        fila = contadores()
+        if fila:
+            self.stdout.write("fila de tarefas:")
+            for k, v in sorted(fila.items()):
+                self.stdout.write(f"{k:>14}: {v}")
@@ -0,0 +1,35 @@
+# base/management/commands/price_partitions.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand, CommandError
+from base import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Partições mensais de Price no PostgreSQL: cria as dos próximos meses e remove as expiradas. "
+        "--converter faz a conversão única da tabela (rodar com os workers parados). Sem efeito no SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--converter", action="store_true", help="converte base_price para o layout particionado")
+        parser.add_argument("--meses", type=int, default=None, help="meses criados adiante (PRICE_PARTITION_MONTHS_AHEAD)")
+        parser.add_argument("--sem-expirar", action="store_true", help="não remove partições expiradas")
+        parser.add_argument("--dry-run", action="store_true", help="só lista as partições que seriam removidas")
+
+    def handle(self, *args, **opts):
+        if not partitions.suportado():
+            self.stdout.write(self.style.WARNING("Banco não é PostgreSQL: Price segue sem particionamento."))
+            return
+
+        if opts["converter"]:
+            criadas = partitions.converter(meses_a_frente=opts["meses"])
+            self.stdout.write(self.style.SUCCESS(f"Price convertida | {len(criadas)} partição(ões) criada(s)"))
+        elif not partitions.particionado():
+            raise CommandError("Price não está particionada; rode com --converter primeiro.")
+
+        for nome in partitions.garantir_particoes(meses_a_frente=opts["meses"]):
+            self.stdout.write(f"criada: {nome}")
+
+        if not opts["sem_expirar"]:
+            for nome in partitions.expirar_particoes(dry_run=opts["dry_run"]):
+                self.stdout.write(f"{'expiraria' if opts['dry_run'] else 'removida'}: {nome}")
@@ -0,0 +1,34 @@
+# base/management/commands/profiling.py
+from __future__ import annotations
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from base.profiling import MODOS, ativar_task, desativar_task, tarefas_ativas
+
+
+class Command(BaseCommand):
+    help = (
+        "Liga/desliga o profiling de tasks Celery pelo nome, sem reiniciar os workers "
+        "(os perfis aparecem no admin em Profile records)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("acao", choices=["ativar", "desativar", "listar"])
+        parser.add_argument("task", nargs="?", help="nome da task, ex.: base.tasks.atualizar_precos_csmoney")
+        parser.add_argument("--modo", choices=MODOS, default="", help="padrão: PROFILING_MODE")
+        parser.add_argument("--vezes", type=int, default=1, help="próximas N execuções (0 = até desativar)")
+
+    def handle(self, *args, **opts):
+        acao, task = opts["acao"], opts["task"]
+        if acao != "listar" and not task:
+            raise CommandError(f"'{acao}' precisa do nome da task.")
+        if acao == "ativar":
+            ativar_task(task, opts["modo"], opts["vezes"])
+            if not settings.PROFILING_ENABLED:
+                self.stderr.write(self.style.WARNING(
+                    "[PROFILING] PROFILING_ENABLED=0 aqui: os workers só perfilam se subirem com PROFILING_ENABLED=1"
+                ))
+        elif acao == "desativar":
+            desativar_task(task)
+        for nome, info in sorted(tarefas_ativas().items()):
+            restantes = "sempre" if info["restantes"] is None else f"{info['restantes']}x"
+            self.stdout.write(f"[PROFILING] {nome} | {info['modo']} | {restantes} | {info['origem']}")
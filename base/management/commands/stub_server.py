@@ -0,0 +1,34 @@
+# base/management/commands/stub_server.py
+from __future__ import annotations
+from aiohttp import web
+from django.core.management.base import BaseCommand
+from base.stubs import StubConfig, criar_app
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe o servidor local que imita Steam/cs.money/CSFloat a partir das fixtures "
+        "(aponte STEAM_BASE_URL/CSMONEY_BASE_URL/CSFLOAT_BASE_URL para ele)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--porta", type=int, default=8765)
+        parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência média por requisição")
+        parser.add_argument("--jitter", type=float, default=0.5, help="variação relativa da latência (0.5 = ±50%%)")
+        parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de respostas 429")
+        parser.add_argument("--taxa-400", type=float, default=0.0, help="fração de respostas 400 nas rotas do cs.money")
+        parser.add_argument("--retry-after", type=float, default=1.0, help="segundos no Retry-After dos 429")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        config = StubConfig(
+            latencia_ms=opts["latencia_ms"],
+            jitter=opts["jitter"],
+            taxa_429=opts["taxa_429"],
+            taxa_400=opts["taxa_400"],
+            retry_after=opts["retry_after"],
+            seed=opts["seed"],
+        )
+        self.stdout.write(f"[STUB] http://{opts['host']}:{opts['porta']} | {config}")
+        web.run_app(criar_app(config), host=opts["host"], port=opts["porta"], print=None, access_log=None)
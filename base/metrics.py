@@ -0,0 +1,339 @@
+# base/metrics.py
+"""
+Métricas de latência/queries (views, tasks Celery e HTTP de saída) no
+formato texto do Prometheus, em /metrics/.
+
+- Registro em processo: cada thread acumula num dict próprio (contadores e
+  baldes de histograma), do qual é a única escritora; os valores só crescem.
+  O flush não troca nem zera esse dict (um incremento em curso na thread
+  dona se perderia): copia-o (dict.copy, atômico sob o GIL), envia a
+  diferença para o último envio e guarda a cópia. As diferenças vão para um
+  hash do Redis (HINCRBYFLOAT em pipeline), onde os workers web e Celery se
+  agregam. Flush a cada METRICS_FLUSH_INTERVAL segundos no
+  fim de uma requisição e ao fim de cada task. Com o Redis fora, o lote é
+  descartado (métrica nunca derruba a aplicação).
+- MetricsMiddleware: latência por view (nome da rota), nº e tempo de
+  queries (connection.execute_wrapper), hits/misses do cache e N+1: a mesma
+  SQL repetida METRICS_N_PLUS_ONE_THRESHOLD+ vezes na requisição.
+- Sinais do Celery: duração e estado por task.
+- HTTP de saída (base/transport.py): latência e status por host, 429s.
+
+Acesso a /metrics/: "Authorization: Bearer <METRICS_TOKEN>" quando o token
+está definido (scraper do Prometheus); sem token, só usuário staff, ou
+qualquer um com DEBUG.
+
+Cardinalidade: rótulos só com nome de rota/task, host e classe de status.
+"""
+from __future__ import annotations
+
+import hmac
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import redis
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+_HASH = "arb:metrics"
+_SEP = "\t"
+
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+QUANTIDADES = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# nome -> (tipo, ajuda, baldes)
+METRICAS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "arb_http_request_duration_seconds": ("histogram", "Latência das views", SEGUNDOS),
+    "arb_http_db_queries": ("histogram", "Queries por requisição", QUANTIDADES),
+    "arb_http_db_seconds_total": ("counter", "Tempo em queries nas views", ()),
+    "arb_http_cache_total": ("counter", "Leituras do cache nas views (resultado=hit|miss)", ()),
+    "arb_http_n_plus_one_total": ("counter", "Requisições com a mesma SQL repetida (suspeita de N+1)", ()),
+    "arb_task_duration_seconds": ("histogram", "Duração das tasks Celery", SEGUNDOS),
+    "arb_upstream_request_duration_seconds": ("histogram", "Latência das chamadas aos sites", SEGUNDOS),
+    "arb_upstream_requests_total": ("counter", "Chamadas aos sites por host e classe de status", ()),
+    "arb_upstream_429_total": ("counter", "Respostas 429 dos sites", ()),
+}
+
+
+# ---- registro em processo ----
+
+class _Buffer:
+    __slots__ = ("dados", "enviado", "thread")
+
+    def __init__(self):
+        self.dados: Dict[str, float] = {}    # acumulado; só a thread dona escreve
+        self.enviado: Dict[str, float] = {}  # cópia do último flush; só o flush escreve
+        self.thread = threading.current_thread()
+
+
+_local = threading.local()
+_buffers: List[_Buffer] = []   # list.append é atômico: o flush enxerga os buffers de todas as threads
+_ultimo_flush = time.monotonic()
+_flush_lock = threading.Lock()
+
+
+def _buffer() -> _Buffer:
+    buf = getattr(_local, "buffer", None)
+    if buf is None:
+        buf = _local.buffer = _Buffer()
+        _buffers.append(buf)
+    return buf
+
+
+def _rotulos(labels: Dict[str, object]) -> str:
+    def _esc(v) -> str:
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{_esc(v)}"' for k, v in sorted(labels.items()))
+
+
+def _somar(campo: str, valor: float) -> None:
+    d = _buffer().dados
+    d[campo] = d.get(campo, 0) + valor
+
+
+def contar(nome: str, valor: float = 1, **labels) -> None:
+    if settings.METRICS_ENABLED:
+        _somar(f"{nome}{_SEP}{_rotulos(labels)}{_SEP}", valor)
+
+
+def observar(nome: str, valor: float, **labels) -> None:
+    """Histograma: um balde (não cumulativo; acumulado na exposição) + _sum + _count."""
+    if not settings.METRICS_ENABLED:
+        return
+    rot = _rotulos(labels)
+    baldes = METRICAS[nome][2]
+    le = next((b for b in baldes if valor <= b), "+Inf")
+    _somar(f"{nome}{_SEP}{rot}{_SEP}{le}", 1)
+    _somar(f"{nome}_sum{_SEP}{rot}{_SEP}", valor)
+    _somar(f"{nome}_count{_SEP}{rot}{_SEP}", 1)
+
+
+def flush(forcar: bool = False) -> None:
+    global _ultimo_flush
+    if not forcar and time.monotonic() - _ultimo_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    total: Counter = Counter()
+    # uma thread por vez lê os buffers (senão duas enviariam a mesma diferença e
+    # removeriam o mesmo buffer morto); o lock só é pego uma vez por intervalo
+    with _flush_lock:
+        agora = time.monotonic()
+        if not forcar and agora - _ultimo_flush < settings.METRICS_FLUSH_INTERVAL:
+            return  # outra thread acabou de fazer o flush
+        _ultimo_flush = agora
+        for buf in list(_buffers):
+            viva = buf.thread.is_alive()  # antes da cópia: morta, a cópia é a final
+            copia = buf.dados.copy()
+            for campo, valor in copia.items():
+                delta = valor - buf.enviado.get(campo, 0)
+                if delta:
+                    total[campo] += delta
+            buf.enviado = copia
+            if not viva:
+                _buffers.remove(buf)
+    if not total:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for campo, valor in total.items():
+            pipe.hincrbyfloat(_HASH, campo, valor)
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        log.warning("[METRICAS] flush descartado (%d séries): %s", len(total), e)
+
+
+# ---- exposição ----
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def exposicao() -> str:
+    flush(forcar=True)
+    brutos = get_redis().hgetall(_HASH)
+    series: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for campo, valor in brutos.items():
+        nome, rot, le = campo.split(_SEP)
+        series.setdefault(nome, {}).setdefault(rot, {})[le] = float(valor)
+
+    linhas: List[str] = []
+    for nome, (tipo, ajuda, baldes) in METRICAS.items():
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+        if tipo == "counter":
+            for rot, v in sorted(series.get(nome, {}).items()):
+                linhas.append(f"{nome}{{{rot}}} {_fmt(v[''])}" if rot else f"{nome} {_fmt(v[''])}")
+            continue
+        for rot, por_balde in sorted(series.get(nome, {}).items()):
+            acumulado = 0.0
+            sep = "," if rot else ""
+            for b in baldes:
+                acumulado += por_balde.get(str(b), 0)
+                linhas.append(f'{nome}_bucket{{{rot}{sep}le="{b}"}} {_fmt(acumulado)}')
+            acumulado += por_balde.get("+Inf", 0)
+            linhas.append(f'{nome}_bucket{{{rot}{sep}le="+Inf"}} {_fmt(acumulado)}')
+            linhas.append(f"{nome}_sum{{{rot}}} {_fmt(series.get(nome + '_sum', {}).get(rot, {}).get('', 0))}")
+            linhas.append(f"{nome}_count{{{rot}}} {_fmt(series.get(nome + '_count', {}).get(rot, {}).get('', 0))}")
+    return "\n".join(linhas) + "\n"
+
+
+def _autorizado(request) -> bool:
+    """Com METRICS_TOKEN, só o Bearer; sem ele, só staff logado (ou DEBUG)."""
+    token = settings.METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    user = getattr(request, "user", None)
+    return settings.DEBUG or bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    if not _autorizado(request):
+        return HttpResponseForbidden()
+    try:
+        corpo = exposicao()
+    except redis.exceptions.RedisError as e:
+        return HttpResponse(f"# redis indisponível: {e}\n", status=503, content_type="text/plain")
+    return HttpResponse(corpo, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ---- views ----
+
+class _Requisicao:
+    __slots__ = ("queries", "segundos", "sqls", "hits", "misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.segundos = 0.0
+        self.sqls: Counter = Counter()
+        self.hits = self.misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - t0
+            self.queries += 1
+            self.sqls[sql] += 1
+
+
+_n_mais_um_avisados: set = set()
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED or request.path == "/metrics/":
+            return self.get_response(request)
+        req = _local.requisicao = _Requisicao()
+        t0 = time.perf_counter()
+        try:
+            with connection.execute_wrapper(req):
+                response = self.get_response(request)
+        finally:
+            _local.requisicao = None
+        duracao = time.perf_counter() - t0
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "nao_resolvida"
+        observar("arb_http_request_duration_seconds", duracao,
+                 view=view, method=request.method, status=f"{response.status_code // 100}xx")
+        observar("arb_http_db_queries", req.queries, view=view)
+        contar("arb_http_db_seconds_total", req.segundos, view=view)
+        if req.hits:
+            contar("arb_http_cache_total", req.hits, view=view, resultado="hit")
+        if req.misses:
+            contar("arb_http_cache_total", req.misses, view=view, resultado="miss")
+        if req.sqls:
+            sql, vezes = req.sqls.most_common(1)[0]
+            if vezes >= settings.METRICS_N_PLUS_ONE_THRESHOLD:
+                contar("arb_http_n_plus_one_total", view=view)
+                if view not in _n_mais_um_avisados:  # um aviso por view e processo
+                    _n_mais_um_avisados.add(view)
+                    log.warning("[METRICAS] possível N+1 em %s: %dx %s", view, vezes, sql[:200])
+        flush()
+        return response
+
+
+class InstrumentedRedisCache(RedisCache):
+    """RedisCache que conta hits/misses da requisição corrente (get/get_or_set/get_many)."""
+
+    def get(self, key, default=None, version=None):
+        valor = super().get(key, default, version)
+        req = getattr(_local, "requisicao", None)
+        if req is not None:
+            if valor is default:
+                req.misses += 1
+            else:
+                req.hits += 1
+        return valor
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        valores = super().get_many(keys, version)
+        req = getattr(_local, "requisicao", None)
+        if req is not None:
+            req.hits += len(valores)
+            req.misses += len(keys) - len(valores)
+        return valores
+
+
+# ---- HTTP de saída ----
+
+def registrar_upstream(url: str, status: int, segundos: float) -> None:
+    host = urlsplit(str(url)).hostname or "desconhecido"
+    observar("arb_upstream_request_duration_seconds", segundos, host=host, status=f"{status // 100}xx")
+    contar("arb_upstream_requests_total", host=host, status=f"{status // 100}xx")
+    if status == 429:
+        contar("arb_upstream_429_total", host=host)
+
+
+def hook_requests(resp, *args, **kwargs):
+    """Hook "response" de requests/cloudscraper."""
+    registrar_upstream(resp.url, resp.status_code, resp.elapsed.total_seconds())
+    return resp
+
+
+def trace_aiohttp():
+    """TraceConfig do aiohttp com o mesmo registro (latência até os cabeçalhos)."""
+    import aiohttp
+
+    async def _inicio(session, ctx, params):
+        ctx.t0 = time.perf_counter()
+
+    async def _fim(session, ctx, params):
+        registrar_upstream(params.url, params.response.status, time.perf_counter() - ctx.t0)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_inicio)
+    trace.on_request_end.append(_fim)
+    return trace
+
+
+# ---- Celery ----
+
+_inicio_tasks: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def _task_inicio(task_id=None, **kwargs) -> None:
+    _inicio_tasks[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_fim(task_id=None, task=None, state=None, **kwargs) -> None:
+    t0: Optional[float] = _inicio_tasks.pop(task_id, None)
+    if t0 is None or task is None:
+        return
+    observar("arb_task_duration_seconds", time.perf_counter() - t0, task=task.name, state=state or "desconhecido")
+    flush(forcar=True)
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_latest_prices(apps, schema_editor):
+    """Popula LatestPrice com o registro mais recente de cada (item, site)."""
+    Price = apps.get_model("base", "Price")
+    LatestPrice = apps.get_model("base", "LatestPrice")
+
+    batch = []
+    ultimo_par = None
+    rows = (
+        Price.objects
+        .order_by("item_id", "site_id", "-timestamp", "-id")
+        .values_list("item_id", "site_id", "price", "timestamp")
+        .iterator(chunk_size=5000)
+    )
+    for item_id, site_id, price, ts in rows:
+        if (item_id, site_id) == ultimo_par:
+            continue
+        ultimo_par = (item_id, site_id)
+        batch.append(LatestPrice(item_id=item_id, site_id=site_id, price=price, timestamp=ts))
+        if len(batch) >= 1000:
+            LatestPrice.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        LatestPrice.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_alter_item_icon_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.FloatField()),
+                ('timestamp', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['item', 'site', '-timestamp'], name='price_item_site_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='latestprice',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_prices', to='base.item'),
+        ),
+        migrations.AddField(
+            model_name='latestprice',
+            name='site',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.site'),
+        ),
+        migrations.AddIndex(
+            model_name='latestprice',
+            index=models.Index(fields=['item', '-timestamp'], name='latestprice_item_ts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='latestprice',
+            constraint=models.UniqueConstraint(fields=('item', 'site'), name='latestprice_item_site_uniq'),
+        ),
+        migrations.RunPython(preencher_latest_prices, migrations.RunPython.noop),
+    ]
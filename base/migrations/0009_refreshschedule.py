@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_latestprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshSchedule',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='refresh_schedule', serialize=False, to='base.item')),
+                ('next_refresh_at', models.DateTimeField()),
+                ('last_refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('interval_sec', models.PositiveIntegerField(default=3600)),
+                ('held_value', models.FloatField(default=0)),
+                ('volatility', models.FloatField(default=0)),
+                ('urgency', models.FloatField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['next_refresh_at'], name='refresh_next_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:12
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def juntar_duplicados(apps, schema_editor):
+    """Linhas antigas (uma por asset) viram uma por (conta, item), somando quantity."""
+    InventoryItem = apps.get_model("base", "InventoryItem")
+    duplicados = (
+        InventoryItem.objects
+        .values("inventory_id", "item_id")
+        .annotate(n=Count("id"), manter=Min("id"), total=Sum("quantity"))
+        .filter(n__gt=1)
+    )
+    for d in duplicados:
+        InventoryItem.objects.filter(id=d["manter"]).update(quantity=d["total"])
+        (
+            InventoryItem.objects
+            .filter(inventory_id=d["inventory_id"], item_id=d["item_id"])
+            .exclude(id=d["manter"])
+            .delete()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_refreshschedule'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventoryitem',
+            constraint=models.UniqueConstraint(fields=('inventory', 'item'), name='inventoryitem_inventory_item_uniq'),
+        ),
+    ]
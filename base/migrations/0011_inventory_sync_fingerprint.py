@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_inventoryitem_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='first_page_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='inventory_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='last_assetid',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
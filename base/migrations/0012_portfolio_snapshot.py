@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_preco_atual(apps, schema_editor):
+    """preco_atual = último LatestPrice do item (qualquer site), como no dashboard."""
+    InventoryItem = apps.get_model("base", "InventoryItem")
+    LatestPrice = apps.get_model("base", "LatestPrice")
+    ultimo = LatestPrice.objects.filter(item=OuterRef("item")).order_by("-timestamp")
+    InventoryItem.objects.update(
+        preco_atual=Subquery(ultimo.values("price")[:1]),
+        preco_atual_at=Subquery(ultimo.values("timestamp")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_inventory_sync_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField()),
+                ('as_of', models.DateTimeField()),
+                ('valor_bruto', models.FloatField(default=0)),
+                ('valor_liquido', models.FloatField(default=0)),
+                ('itens_total', models.PositiveIntegerField(default=0)),
+                ('itens_distintos', models.PositiveIntegerField(default=0)),
+                ('top_item_preco', models.FloatField(blank=True, null=True)),
+                ('ultimo_preco_em', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='preco_atual',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='preco_atual_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['inventory', '-preco_atual', '-id'], name='invitem_inv_preco_idx'),
+        ),
+        migrations.AddField(
+            model_name='portfoliosnapshot',
+            name='inventory',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='base.inventory'),
+        ),
+        migrations.AddField(
+            model_name='portfoliosnapshot',
+            name='top_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='base.item'),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='snapshot_atual',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='base.portfoliosnapshot'),
+        ),
+        migrations.AddIndex(
+            model_name='portfoliosnapshot',
+            index=models.Index(fields=['inventory', '-as_of'], name='snapshot_inv_asof_idx'),
+        ),
+        migrations.RunPython(preencher_preco_atual, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_portfolio_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidade', models.CharField(choices=[('1h', '1 hora'), ('1d', '1 dia')], max_length=2)),
+                ('inicio', models.DateTimeField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('amostras', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.item')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularidade', 'inicio'], name='pricecandle_gran_inicio_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'site', 'granularidade', 'inicio'), name='pricecandle_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_pricecandle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestprice',
+            name='volume',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArbitrageOpportunity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preco_compra', models.FloatField()),
+                ('preco_venda', models.FloatField()),
+                ('custo', models.FloatField()),
+                ('liquido', models.FloatField()),
+                ('spread', models.FloatField()),
+                ('roi', models.FloatField()),
+                ('volume', models.PositiveIntegerField(blank=True, null=True)),
+                ('score', models.FloatField()),
+                ('calculado_em', models.DateTimeField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.item')),
+                ('site_compra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='base.site')),
+                ('site_venda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='base.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='arbitrage_score_idx')],
+            },
+        ),
+    ]
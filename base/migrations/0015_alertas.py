@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_arbitragem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricealvo',
+            name='direcao',
+            field=models.CharField(choices=[('acima', 'Acima'), ('abaixo', 'Abaixo')], default='acima', max_length=6),
+        ),
+        migrations.AddField(
+            model_name='pricealvo',
+            name='disparado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='pricealvo',
+            name='disparado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pricealvo',
+            name='site',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='base.site'),
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direcao', models.CharField(choices=[('acima', 'Acima'), ('abaixo', 'Abaixo')], max_length=6)),
+                ('preco', models.FloatField()),
+                ('preco_alvo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('criado_em', models.DateTimeField()),
+                ('lido', models.BooleanField(default=False)),
+                ('alvo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='base.pricealvo')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.inventory')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.item')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventory', '-criado_em'], name='alert_inv_criado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_alertas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='price',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
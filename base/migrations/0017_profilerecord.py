@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0016_price_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('task', 'Task'), ('request', 'Requisição')], max_length=8)),
+                ('alvo', models.CharField(max_length=200)),
+                ('chave', models.CharField(max_length=64, unique=True)),
+                ('modo', models.CharField(choices=[('cprofile', 'cProfile'), ('amostragem', 'Amostragem')], max_length=10)),
+                ('duracao', models.FloatField()),
+                ('amostras', models.PositiveIntegerField(default=0)),
+                ('pstats', models.BinaryField(blank=True, null=True)),
+                ('collapsed', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['alvo', '-criado_em'], name='profile_alvo_criado_idx')],
+            },
+        ),
+    ]
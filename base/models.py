@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 from django.db import models
@@ -24,8 +25,97 @@ class Price(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     site = models.ForeignKey(Site, on_delete=models.CASCADE)
     price = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default (e não auto_now_add): a ingestão e o gerador de carga gravam o instante explícito
+    timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # histórico por item/site do mais recente para o mais antigo
+            models.Index(fields=["item", "site", "-timestamp"], name="price_item_site_ts_idx"),
+        ]
+
+
+class PriceCandle(models.Model):
+    """
+    Histórico compactado de Price (base/history.py): OHLC + número de amostras
+    por (item, site) em velas de 1 hora ou 1 dia.
+    """
+    HORA = "1h"
+    DIA = "1d"
+    GRANULARIDADES = [(HORA, "1 hora"), (DIA, "1 dia")]
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+    granularidade = models.CharField(max_length=2, choices=GRANULARIDADES)
+    inicio = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    amostras = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "site", "granularidade", "inicio"], name="pricecandle_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["granularidade", "inicio"], name="pricecandle_gran_inicio_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} @ {self.site} [{self.granularidade} {self.inicio:%Y-%m-%d %H:%M}]"
+
+
+class LatestPrice(models.Model):
+    """
+    Último preço conhecido por (item, site), mantido na ingestão.
+    Evita varrer o histórico de Price para descobrir o preço atual.
+    """
+    item = models.ForeignKey(Item, related_name="latest_prices", on_delete=models.CASCADE)
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+    price = models.FloatField()
+    timestamp = models.DateTimeField()
+    volume = models.PositiveIntegerField(null=True, blank=True)  # liquidez informada pelo site (ofertas/vendas)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["item", "site"], name="latestprice_item_site_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["item", "-timestamp"], name="latestprice_item_ts_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} @ {self.site}: {self.price}"
+
+
+
+class ArbitrageOpportunity(models.Model):
+    """
+    Top-N oportunidades da última rodada do motor de arbitragem
+    (base/arbitrage.py): comprar em site_compra e vender em site_venda,
+    já com as taxas de cada site. A tabela é regravada a cada rodada.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    site_compra = models.ForeignKey(Site, related_name="+", on_delete=models.CASCADE)
+    site_venda = models.ForeignKey(Site, related_name="+", on_delete=models.CASCADE)
+    preco_compra = models.FloatField()
+    preco_venda = models.FloatField()
+    custo = models.FloatField()      # preço de compra + taxa de compra
+    liquido = models.FloatField()    # preço de venda - taxa de venda
+    spread = models.FloatField()     # liquido - custo (USD)
+    roi = models.FloatField()        # spread / custo
+    volume = models.PositiveIntegerField(null=True, blank=True)  # liquidez do lado da venda
+    score = models.FloatField()      # roi ponderado pela liquidez
+    calculado_em = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="arbitrage_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item}: {self.site_compra} -> {self.site_venda} ({self.roi:.1%})"
 
 class Inventory(models.Model):
     name = models.CharField(max_length=100)  # Nome da conta (texto livre)
@@ -35,6 +125,17 @@ class Inventory(models.Model):
     csmoney_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     csmoney_price_at = models.DateTimeField(null=True, blank=True)
 
+    # sincronização incremental do inventário Steam (importar_inventario)
+    inventory_fingerprint = models.CharField(max_length=40, blank=True, default="")  # todos os (assetid, amount) + tradable por classid
+    first_page_fingerprint = models.CharField(max_length=40, blank=True, default="")  # 1ª página + total + last_assetid
+    last_assetid = models.CharField(max_length=50, blank=True, default="")
+    synced_at = models.DateTimeField(null=True, blank=True)  # última consulta bem-sucedida à Steam
+
+    # snapshot de valuation mais recente (base/portfolio.py): o dashboard lê só ele
+    snapshot_atual = models.ForeignKey(
+        "PortfolioSnapshot", null=True, blank=True, related_name="+", on_delete=models.SET_NULL
+    )
+
     def __str__(self):
         return f"{self.name} ({self.steam_id})"
     
@@ -49,19 +150,136 @@ class InventoryItem(models.Model):
     wear_name = models.CharField(max_length=50, blank=True, null=True)
 
     quantity = models.PositiveIntegerField(default=1)
+
+    # preço bruto atual (último LatestPrice de qualquer site), mantido na ingestão
+    preco_atual = models.FloatField(null=True, blank=True)
+    preco_atual_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # 1 linha por (conta, item): alvo do upsert em importar_inventario
+            models.UniqueConstraint(fields=["inventory", "item"], name="inventoryitem_inventory_item_uniq"),
+        ]
+        indexes = [
+            # item mais caro da conta / listagem por preço
+            models.Index(fields=["inventory", "-preco_atual", "-id"], name="invitem_inv_preco_idx"),
+        ]
+
     def __str__(self):
         return f"{self.item.market_hash_name} ({self.asset_id})"
     
 
+class PortfolioSnapshot(models.Model):
+    """
+    Valuation de uma conta num instante (base/portfolio.py).
+    Um registro por janela de PORTFOLIO_SNAPSHOT_INTERVAL forma a série
+    histórica; o mais recente é apontado por Inventory.snapshot_atual.
+    """
+    inventory = models.ForeignKey(Inventory, related_name="snapshots", on_delete=models.CASCADE)
+    criado_em = models.DateTimeField()   # início da janela
+    as_of = models.DateTimeField()       # último recálculo dentro da janela
+    valor_bruto = models.FloatField(default=0)
+    valor_liquido = models.FloatField(default=0)
+    itens_total = models.PositiveIntegerField(default=0)     # soma de quantity
+    itens_distintos = models.PositiveIntegerField(default=0)
+    top_item = models.ForeignKey(Item, null=True, blank=True, related_name="+", on_delete=models.SET_NULL)
+    top_item_preco = models.FloatField(null=True, blank=True)
+    ultimo_preco_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["inventory", "-as_of"], name="snapshot_inv_asof_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory.name} @ {self.as_of:%Y-%m-%d %H:%M}: ${self.valor_bruto:.2f}"
+
+
 class PriceAlvo(models.Model):
+    ACIMA = "acima"    # alerta quando o preço sobe até o alvo (venda)
+    ABAIXO = "abaixo"  # alerta quando o preço cai até o alvo (compra)
+    DIRECOES = [(ACIMA, "Acima"), (ABAIXO, "Abaixo")]
+
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE)
     preco_alvo = models.DecimalField(max_digits=12, decimal_places=2)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
+    # motor de alertas (base/alerts.py)
+    direcao = models.CharField(max_length=6, choices=DIRECOES, default=ACIMA)
+    site = models.ForeignKey(Site, null=True, blank=True, on_delete=models.CASCADE)  # None = qualquer site
+    disparado = models.BooleanField(default=False)  # já alertou; rearma ao voltar além da histerese
+    disparado_em = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ('item', 'inventory')
     
     def __str__(self):
-        return f"{self.item.market_hash_name} - ${self.preco_alvo} ({self.inventory.name})"
\ No newline at end of file
+        return f"{self.item.market_hash_name} - ${self.preco_alvo} ({self.inventory.name})"
+
+
+class Alert(models.Model):
+    """Cruzamento de um PriceAlvo detectado na ingestão (base/alerts.py)."""
+    alvo = models.ForeignKey(PriceAlvo, related_name="alertas", on_delete=models.CASCADE)
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE)
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+    direcao = models.CharField(max_length=6, choices=PriceAlvo.DIRECOES)
+    preco = models.FloatField()
+    preco_alvo = models.DecimalField(max_digits=12, decimal_places=2)
+    criado_em = models.DateTimeField()
+    lido = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["inventory", "-criado_em"], name="alert_inv_criado_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} {self.direcao} ${self.preco_alvo}: {self.preco}"
+
+
+class RefreshSchedule(models.Model):
+    """
+    Agenda de refresh de preço por Item (base/scheduler.py).
+    O intervalo encolhe com o valor em carteira e a volatilidade do item.
+    """
+    item = models.OneToOneField(Item, primary_key=True, related_name="refresh_schedule", on_delete=models.CASCADE)
+    next_refresh_at = models.DateTimeField()
+    last_refreshed_at = models.DateTimeField(null=True, blank=True)
+    interval_sec = models.PositiveIntegerField(default=3600)
+    held_value = models.FloatField(default=0)   # soma de quantity * preço atual em todas as contas
+    volatility = models.FloatField(default=0)   # desvio dos log-retornos por hora na janela
+    urgency = models.FloatField(default=1)      # peso base da prioridade (valor x volatilidade)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_refresh_at"], name="refresh_next_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} a cada {self.interval_sec}s"
+
+
+class ProfileRecord(models.Model):
+    """Perfil de uma task Celery ou requisição, gravado sob demanda (base/profiling.py)."""
+    TIPOS = [("task", "Task"), ("request", "Requisição")]
+    MODOS = [("cprofile", "cProfile"), ("amostragem", "Amostragem")]
+
+    tipo = models.CharField(max_length=8, choices=TIPOS)
+    alvo = models.CharField(max_length=200)              # nome da task ou da rota
+    chave = models.CharField(max_length=64, unique=True)  # task id ou id da requisição
+    modo = models.CharField(max_length=10, choices=MODOS)
+    duracao = models.FloatField()                        # segundos
+    amostras = models.PositiveIntegerField(default=0)
+    pstats = models.BinaryField(null=True, blank=True)   # formato de cProfile.dump_stats (só no modo cprofile)
+    collapsed = models.TextField(blank=True)             # pilhas colapsadas (flamegraph.pl / speedscope)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["alvo", "-criado_em"], name="profile_alvo_criado_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.alvo} [{self.chave}] {self.duracao:.2f}s"
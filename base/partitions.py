@@ -0,0 +1,221 @@
+# base/partitions.py
+"""
+Particionamento mensal de Price no PostgreSQL (opt-in).
+
+- `python manage.py price_partitions --converter` transforma base_price numa
+  tabela particionada por RANGE(timestamp), uma partição por mês
+  (base_price_pAAAA_MM) + uma DEFAULT de segurança. Os índices ficam no pai e
+  são criados em cada partição: BRIN em timestamp e o btree
+  price_item_site_ts_idx (item, site, timestamp desc) que o model já declara.
+- garantir_particoes cria as partições dos próximos PRICE_PARTITION_MONTHS_AHEAD
+  meses; expirar_particoes faz DETACH + DROP das partições que terminaram há
+  mais de PRICE_PARTITION_RETENTION_DAYS (retenção em tempo constante, sem
+  DELETE de milhões de linhas nem vacuum).
+- Com a tabela particionada, history.compactar_precos só gera as velas e deixa
+  o bruto para o DROP da partição.
+
+Em SQLite (ou PostgreSQL sem conversão) nada muda: particionado() é False e
+tudo segue no layout atual.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Price
+
+log = logging.getLogger(__name__)
+
+_PREFIXO = "{tabela}_p"
+_NOME_RE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+_particionado: Optional[bool] = None
+
+
+def suportado() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def _tabela() -> str:
+    return Price._meta.db_table
+
+
+def particionado() -> bool:
+    """Price está particionada? (consulta o catálogo uma vez por processo)"""
+    global _particionado
+    if _particionado is None:
+        if not suportado():
+            _particionado = False
+        else:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [_tabela()])
+                _particionado = cur.fetchone() is not None
+    return _particionado
+
+
+def _mes(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _proximo_mes(mes: datetime) -> datetime:
+    return (mes + timedelta(days=32)).replace(day=1)
+
+
+def _nome(mes: datetime) -> str:
+    return f"{_PREFIXO.format(tabela=_tabela())}{mes:%Y_%m}"
+
+
+def _criar_particao(cur, mes: datetime) -> bool:
+    """
+    Cria a partição do mês se não existir. A tabela é criada solta, recebe as
+    linhas do mês que tenham caído na DEFAULT e só então é anexada (ATTACH
+    falharia com linhas do intervalo na DEFAULT).
+    """
+    nome, tabela = _nome(mes), _tabela()
+    cur.execute("SELECT to_regclass(%s)", [nome])
+    if cur.fetchone()[0] is not None:
+        return False
+    de, ate = mes, _proximo_mes(mes)
+    cur.execute(f'CREATE TABLE "{nome}" (LIKE "{tabela}" INCLUDING DEFAULTS)')
+    cur.execute(
+        f'WITH movidas AS (DELETE FROM "{tabela}_default" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        f'INSERT INTO "{nome}" SELECT * FROM movidas',
+        [de, ate],
+    )
+    cur.execute(f'ALTER TABLE "{tabela}" ATTACH PARTITION "{nome}" FOR VALUES FROM (%s) TO (%s)', [de, ate])
+    log.warning("[PART] partição criada | %s | %s -> %s", nome, de.date(), ate.date())
+    return True
+
+
+def _particoes(cur) -> List[Tuple[str, datetime]]:
+    """(nome, primeiro dia do mês) das partições mensais existentes."""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [_tabela()],
+    )
+    out = []
+    for (nome,) in cur.fetchall():
+        m = _NOME_RE.search(nome)
+        if m:
+            out.append((nome, datetime(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(out, key=lambda p: p[1])
+
+
+def garantir_particoes(agora: Optional[datetime] = None, meses_a_frente: Optional[int] = None) -> List[str]:
+    """Cria as partições do mês corrente até `meses_a_frente` meses adiante."""
+    if not particionado():
+        return []
+    agora = agora or timezone.now()
+    meses_a_frente = settings.PRICE_PARTITION_MONTHS_AHEAD if meses_a_frente is None else meses_a_frente
+    criadas = []
+    mes = _mes(agora)
+    with transaction.atomic(), connection.cursor() as cur:
+        for _ in range(meses_a_frente + 1):
+            if _criar_particao(cur, mes):
+                criadas.append(_nome(mes))
+            mes = _proximo_mes(mes)
+        cur.execute(f'SELECT count(*) FROM "{_tabela()}_default"')
+        na_default = cur.fetchone()[0]
+    if na_default:
+        log.warning("[PART] %d linha(s) na partição DEFAULT (fora dos meses criados)", na_default)
+    return criadas
+
+
+def expirar_particoes(agora: Optional[datetime] = None, dry_run: bool = False) -> List[str]:
+    """
+    DETACH + DROP das partições cujo mês terminou antes de
+    agora - PRICE_PARTITION_RETENTION_DAYS. Rodar depois de compactar_precos,
+    para o bruto já estar nas velas.
+    """
+    if not particionado():
+        return []
+    agora = agora or timezone.now()
+    corte = agora - timedelta(days=settings.PRICE_PARTITION_RETENTION_DAYS)
+    removidas = []
+    with connection.cursor() as cur:
+        for nome, mes in _particoes(cur):
+            if _proximo_mes(mes) > corte:
+                break
+            removidas.append(nome)
+            if dry_run:
+                continue
+            with transaction.atomic():
+                cur.execute(f'ALTER TABLE "{_tabela()}" DETACH PARTITION "{nome}"')
+                cur.execute(f'DROP TABLE "{nome}"')
+            log.warning("[PART] partição removida | %s", nome)
+    return removidas
+
+
+def converter(meses_a_frente: Optional[int] = None) -> List[str]:
+    """
+    Conversão única de base_price para o layout particionado. Bloqueia a tabela
+    durante a cópia (rodar com os workers parados). A PK passa a ser
+    (id, timestamp), exigência do PostgreSQL para tabelas particionadas; o id
+    continua vindo de uma sequência e o Django segue usando `id` como pk.
+    """
+    global _particionado
+    if not suportado():
+        raise RuntimeError("particionamento de Price só existe no PostgreSQL")
+    if particionado():
+        return []
+
+    tabela = _tabela()
+    legado = f"{tabela}_legado"
+    seq = f"{tabela}_part_id_seq"
+    idx_item = Price._meta.indexes[0].name  # price_item_site_ts_idx
+    fks = [
+        (f.column, f.related_model._meta.db_table)
+        for f in Price._meta.concrete_fields
+        if f.is_relation
+    ]
+
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute(f'LOCK TABLE "{tabela}" IN ACCESS EXCLUSIVE MODE')
+        cur.execute(f'SELECT min("timestamp") FROM "{tabela}"')
+        mais_antigo = cur.fetchone()[0]
+
+        cur.execute(f'ALTER TABLE "{tabela}" RENAME TO "{legado}"')
+        # a PK e o índice herdam o nome da tabela antiga: liberam os nomes para a nova
+        cur.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [legado])
+        for (pk,) in cur.fetchall():
+            cur.execute(f'ALTER TABLE "{legado}" RENAME CONSTRAINT "{pk}" TO "{pk}_legado"')
+        cur.execute(f'ALTER INDEX IF EXISTS "{idx_item}" RENAME TO "{idx_item}_legado"')
+        cur.execute(
+            f'CREATE TABLE "{tabela}" (LIKE "{legado}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cur.execute(f'CREATE SEQUENCE "{seq}" OWNED BY "{tabela}".id')
+        cur.execute(f"SELECT setval(%s, COALESCE((SELECT max(id) FROM \"{legado}\"), 0) + 1, false)", [seq])
+        cur.execute(f'ALTER TABLE "{tabela}" ALTER COLUMN id SET DEFAULT nextval(%s)', [seq])
+        cur.execute(f'ALTER TABLE "{tabela}" ADD PRIMARY KEY (id, "timestamp")')
+        for coluna, alvo in fks:
+            cur.execute(
+                f'ALTER TABLE "{tabela}" ADD CONSTRAINT "{tabela}_{coluna}_fk" '
+                f'FOREIGN KEY ("{coluna}") REFERENCES "{alvo}" (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+        cur.execute(f'CREATE INDEX "{idx_item}" ON "{tabela}" (item_id, site_id, "timestamp" DESC)')
+        cur.execute(f'CREATE INDEX "price_ts_brin_idx" ON "{tabela}" USING brin ("timestamp")')
+        cur.execute(f'CREATE TABLE "{tabela}_default" PARTITION OF "{tabela}" DEFAULT')
+
+        mes = _mes(mais_antigo or timezone.now())
+        limite = _mes(timezone.now())
+        criadas = []
+        while mes <= limite:
+            if _criar_particao(cur, mes):
+                criadas.append(_nome(mes))
+            mes = _proximo_mes(mes)
+
+        cur.execute(f'INSERT INTO "{tabela}" SELECT * FROM "{legado}"')
+        cur.execute(f'DROP TABLE "{legado}"')
+
+    _particionado = True
+    criadas += garantir_particoes(meses_a_frente=meses_a_frente)
+    log.warning("[PART] %s convertida | %d partição(ões)", tabela, len(criadas))
+    return criadas
@@ -0,0 +1,162 @@
+# base/portfolio.py
+"""
+Valuation pré-calculada por conta.
+
+- InventoryItem.preco_atual guarda o preço bruto atual de cada linha; a
+  ingestão (PriceIngestBuffer) atualiza só as linhas dos itens que mudaram.
+- PortfolioSnapshot guarda bruto/líquido/quantidade/item mais caro da conta.
+  Só as contas afetadas por uma ingestão ou importação são recalculadas.
+- Dentro de uma janela de PORTFOLIO_SNAPSHOT_INTERVAL o snapshot corrente é
+  regravado; ao virar a janela um novo registro entra na série histórica.
+
+O dashboard lê Inventory.snapshot_atual (busca por chave primária) em vez
+de agregar sobre subqueries de preço a cada requisição. Cada recálculo
+incrementa a versão da conta no cache (versao_conta), o que invalida os
+fragmentos do dashboard cacheados com ela.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Inventory, InventoryItem, LatestPrice, PortfolioSnapshot
+
+log = logging.getLogger(__name__)
+
+
+def _versao_key(inventory_id: int) -> str:
+    return f"dash:versao:{inventory_id}"
+
+
+def versao_conta(inventory_id: int) -> Optional[int]:
+    """Versão dos dados da conta para chaves de cache; None se o cache estiver fora."""
+    try:
+        cache.add(_versao_key(inventory_id), 1, timeout=None)
+        return cache.get(_versao_key(inventory_id))
+    except Exception as e:
+        log.warning("[CACHE] Versão da conta %s indisponível: %s", inventory_id, e)
+        return None
+
+
+def _invalidar(inventory_id: int) -> None:
+    try:
+        cache.add(_versao_key(inventory_id), 0, timeout=None)
+        cache.incr(_versao_key(inventory_id))
+    except Exception:  # cache fora: os fragmentos expiram pelo TTL
+        pass
+
+
+def _ultimo_preco(campo: str) -> Subquery:
+    return Subquery(
+        LatestPrice.objects
+        .filter(item=OuterRef("item"))
+        .order_by("-timestamp")
+        .values(campo)[:1]
+    )
+
+
+def aplicar_precos(precos: Dict[int, float], now) -> Set[int]:
+    """
+    Propaga preços recém-ingeridos (item_id -> preço) para InventoryItem.preco_atual.
+    Devolve os ids das contas afetadas.
+    """
+    if not precos:
+        return set()
+    linhas: List[InventoryItem] = list(
+        InventoryItem.objects
+        .filter(item_id__in=list(precos))
+        .only("id", "item_id", "inventory_id")
+    )
+    for ii in linhas:
+        ii.preco_atual = precos[ii.item_id]
+        ii.preco_atual_at = now
+    InventoryItem.objects.bulk_update(linhas, ["preco_atual", "preco_atual_at"], batch_size=1000)
+    return {ii.inventory_id for ii in linhas}
+
+
+def preencher_precos_faltantes(inventory_id: int) -> int:
+    """Linhas novas (importação) recebem o preço atual já conhecido: 1 UPDATE."""
+    return (
+        InventoryItem.objects
+        .filter(inventory_id=inventory_id, preco_atual__isnull=True)
+        .update(preco_atual=_ultimo_preco("price"), preco_atual_at=_ultimo_preco("timestamp"))
+    )
+
+
+def calcular_snapshot(inventory_id: int, now=None) -> PortfolioSnapshot:
+    """Recalcula o snapshot da conta e o grava (novo registro se a janela virou)."""
+    now = now or timezone.now()
+    itens = InventoryItem.objects.filter(inventory_id=inventory_id)
+    agg = itens.aggregate(
+        bruto=Sum(ExpressionWrapper(F("preco_atual") * F("quantity"), output_field=FloatField())),
+        liquido=Sum(ExpressionWrapper(F("price_usd") * F("quantity"), output_field=FloatField())),
+        total=Sum("quantity"),
+        distintos=Count("id"),
+        ultimo=Max("preco_atual_at"),
+    )
+    top = (
+        itens.filter(preco_atual__isnull=False)
+        .order_by("-preco_atual", "-id")
+        .values_list("item_id", "preco_atual")
+        .first()
+    )
+    valores = {
+        "as_of": now,
+        "valor_bruto": agg["bruto"] or 0.0,
+        "valor_liquido": agg["liquido"] or 0.0,
+        "itens_total": agg["total"] or 0,
+        "itens_distintos": agg["distintos"],
+        "top_item_id": top[0] if top else None,
+        "top_item_preco": top[1] if top else None,
+        "ultimo_preco_em": agg["ultimo"],
+    }
+
+    atual_id = Inventory.objects.filter(pk=inventory_id).values_list("snapshot_atual_id", flat=True).first()
+    janela = timedelta(seconds=settings.PORTFOLIO_SNAPSHOT_INTERVAL)
+    snap = PortfolioSnapshot.objects.filter(pk=atual_id).first() if atual_id else None
+    if snap is not None and now - snap.criado_em < janela:
+        for campo, valor in valores.items():
+            setattr(snap, campo, valor)
+        snap.save()
+    else:
+        snap = PortfolioSnapshot.objects.create(inventory_id=inventory_id, criado_em=now, **valores)
+        Inventory.objects.filter(pk=inventory_id).update(snapshot_atual=snap)
+    _invalidar(inventory_id)
+    return snap
+
+
+def atualizar_snapshots(inventory_ids: Iterable[int]) -> int:
+    now = timezone.now()
+    n = 0
+    for inventory_id in sorted(set(inventory_ids)):
+        calcular_snapshot(inventory_id, now)
+        n += 1
+    return n
+
+
+def snapshot_da_conta(conta: Inventory) -> PortfolioSnapshot:
+    """Snapshot corrente (1 busca por PK); calcula na primeira vez."""
+    if conta.snapshot_atual_id:
+        snap = PortfolioSnapshot.objects.select_related("top_item").filter(pk=conta.snapshot_atual_id).first()
+        if snap is not None:
+            return snap
+    preencher_precos_faltantes(conta.id)
+    return calcular_snapshot(conta.id)
+
+
+def serie_historica(conta: Inventory, limite: int = 500) -> List[dict]:
+    """Pontos (as_of, bruto, líquido) em ordem cronológica, para o gráfico."""
+    pontos = list(
+        PortfolioSnapshot.objects
+        .filter(inventory=conta)
+        .order_by("-as_of")
+        .values("as_of", "valor_bruto", "valor_liquido")[:limite]
+    )
+    pontos.reverse()
+    return pontos
@@ -0,0 +1,204 @@
+# base/price_cache.py
+"""
+Cache compartilhado de preços (Django CACHES -> Redis), entre contas e processos.
+
+- Chave: (site, market_hash_name, currency).
+- TTL de frescor (PRICE_CACHE_TTL) e TTL curto para resultados negativos
+  (PRICE_CACHE_NEGATIVE_TTL): só quando o fetcher devolve SEM_PRECO (o site
+  respondeu que não há preço, ex.: Steam success=false). None é falha de
+  transporte (429/rede esgotaram as tentativas) e não é cacheado: o próximo
+  pedido tenta de novo.
+- Single-flight: quem pega o lock de um nome busca; os demais esperam o
+  valor aparecer no cache em vez de repetir a consulta.
+- Contadores de hit/miss em cache para medir quantas chamadas foram evitadas.
+
+Uso:
+    resultados = get_steam_prices(nomes, currency=1)
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+SEM_PRECO = "__negativo__"  # fetcher/cache: consultado, mas sem preço
+_STATS_KEYS = ("hits", "negative_hits", "misses", "coalesced", "fetched")
+
+# nome -> resultado | SEM_PRECO | None (falha, não cacheia)
+Fetcher = Callable[[List[str]], Dict[str, object]]
+
+
+def _key(site: str, name: str, currency: int) -> str:
+    h = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return f"preco:{site}:{currency}:{h}"
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _incr(counter: str, n: int = 1) -> None:
+    if n <= 0:
+        return
+    k = f"preco:stats:{counter}"
+    try:
+        cache.add(k, 0, timeout=None)
+        cache.incr(k, n)
+    except Exception:  # contadores nunca derrubam a ingestão
+        pass
+
+
+def stats() -> Dict[str, int]:
+    """Contadores acumulados (todos os processos)."""
+    valores = cache.get_many([f"preco:stats:{c}" for c in _STATS_KEYS])
+    return {c: int(valores.get(f"preco:stats:{c}") or 0) for c in _STATS_KEYS}
+
+
+def _sem_marcador(resultados: Dict[str, object]) -> Dict[str, Optional[dict]]:
+    return {n: None if r == SEM_PRECO else r for n, r in resultados.items()}
+
+
+def _store(site: str, currency: int, resultados: Dict[str, object]) -> None:
+    positivos = {}
+    negativos = {}
+    for name, res in resultados.items():
+        if res == SEM_PRECO:
+            negativos[_key(site, name, currency)] = SEM_PRECO
+        elif res:
+            positivos[_key(site, name, currency)] = res
+    if positivos:
+        cache.set_many(positivos, timeout=settings.PRICE_CACHE_TTL)
+    if negativos:
+        cache.set_many(negativos, timeout=settings.PRICE_CACHE_NEGATIVE_TTL)
+
+
+def publicar(site: str, currency: int, resultados: Dict[str, Optional[dict]]) -> None:
+    """Semeia o cache com resultados obtidos por outra fonte (ex.: busca do mercado)."""
+    try:
+        _store(site, currency, resultados)
+    except Exception as e:
+        log.warning("[CACHE] Falha ao publicar %d preços: %s", len(resultados), e)
+
+
+def _buscar_e_publicar(site, currency, names, fetcher) -> Dict[str, Optional[dict]]:
+    res = fetcher(names)
+    res = {n: res.get(n) for n in names}
+    _store(site, currency, res)
+    _incr("fetched", len(names))
+    return _sem_marcador(res)
+
+
+def _split_hits(site, currency, names, out) -> List[str]:
+    """Preenche 'out' com o que já está em cache e devolve os nomes que faltam."""
+    keys = {name: _key(site, name, currency) for name in names}
+    cached = cache.get_many(list(keys.values()))
+    faltando = []
+    hits = neg = 0
+    for name, k in keys.items():
+        if k not in cached:
+            faltando.append(name)
+        elif cached[k] == SEM_PRECO:
+            out[name] = None
+            neg += 1
+        else:
+            out[name] = cached[k]
+            hits += 1
+    _incr("hits", hits)
+    _incr("negative_hits", neg)
+    return faltando
+
+
+def get_many_cached(
+    site: str,
+    names: Iterable[str],
+    currency: int,
+    fetcher: Fetcher,
+) -> Dict[str, Optional[dict]]:
+    names = list(dict.fromkeys(names))
+    out: Dict[str, Optional[dict]] = {}
+    try:
+        faltando = _split_hits(site, currency, names, out)
+    except Exception as e:
+        log.warning("[CACHE] Cache indisponível (%s); buscando direto", e)
+        return _sem_marcador(fetcher(names))
+    _incr("misses", len(faltando))
+    if not faltando:
+        return out
+
+    # single-flight: pega o lock dos nomes que ninguém está buscando
+    chunk = settings.PRICE_CACHE_FETCH_CHUNK
+    lock_ttl = settings.PRICE_CACHE_LOCK_TTL
+    meus, de_outros = [], []
+    for name in faltando:
+        # o lease cobre a posição do nome na fila: o bloco k tem (k+1) * lock_ttl
+        ttl = lock_ttl * (1 + len(meus) // chunk)
+        if cache.add(_lock_key(_key(site, name, currency)), 1, timeout=ttl):
+            meus.append(name)
+        else:
+            de_outros.append(name)
+
+    # busca em blocos, publicando cada bloco assim que chega (quem espera não
+    # precisa aguardar o lote inteiro); se um bloco falhar, os locks dos blocos
+    # seguintes também são soltos, senão quem espera fica parado até expirarem
+    feitos = 0
+    try:
+        for i in range(0, len(meus), chunk):
+            bloco = meus[i:i + chunk]
+            try:
+                out.update(_buscar_e_publicar(site, currency, bloco, fetcher))
+            finally:
+                cache.delete_many([_lock_key(_key(site, n, currency)) for n in bloco])
+                feitos = i + len(bloco)
+    finally:
+        if feitos < len(meus):
+            cache.delete_many([_lock_key(_key(site, n, currency)) for n in meus[feitos:]])
+
+    if de_outros:
+        _incr("coalesced", len(de_outros))
+        out.update(_aguardar(site, currency, de_outros, fetcher))
+    return out
+
+
+def _aguardar(site, currency, names, fetcher) -> Dict[str, Optional[dict]]:
+    """
+    Espera outros processos publicarem. O lock expira sozinho (lease), então
+    se o dono morrer o nome vira órfão e é buscado aqui.
+    """
+    out: Dict[str, Optional[dict]] = {}
+    pendentes = list(names)
+    intervalo = 0.5
+    while pendentes:
+        time.sleep(intervalo)
+        intervalo = min(intervalo * 1.5, 5.0)
+        keys = {n: _key(site, n, currency) for n in pendentes}
+        cached = cache.get_many(list(keys.values()))
+        locks = cache.get_many([_lock_key(k) for k in keys.values()])
+        restantes = []
+        orfaos = []
+        for n, k in keys.items():
+            if k in cached:
+                out[n] = None if cached[k] == SEM_PRECO else cached[k]
+            elif _lock_key(k) in locks:
+                restantes.append(n)
+            else:
+                orfaos.append(n)
+        if orfaos:
+            out.update(_buscar_e_publicar(site, currency, orfaos, fetcher))
+        pendentes = restantes
+    return out
+
+
+def get_steam_prices(names: Iterable[str], currency: int = 1, **engine_kwargs) -> Dict[str, Optional[dict]]:
+    """priceoverview via steam_async, passando pelo cache compartilhado."""
+    from .steam_async import fetch_many
+
+    return get_many_cached(
+        "steam", names, currency,
+        lambda ns: fetch_many(ns, currency=currency, **engine_kwargs),
+    )
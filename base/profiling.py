@@ -0,0 +1,270 @@
+# base/profiling.py
+"""
+Profiling sob demanda de tasks Celery e views, gravado em ProfileRecord
+(lista e download no admin).
+
+- Tasks: por nome, em PROFILING_TASKS (settings) ou ligadas em tempo de
+  execução no Redis (manage.py profiling ativar <task> [--vezes N]); o
+  perfil fica sob o task id.
+- Views: cabeçalho "X-Profile: cprofile|amostragem" ou ?_profile=... numa
+  requisição de usuário staff; o id volta no cabeçalho X-Profile-Id.
+
+Modos:
+- cprofile: cProfile (pstats, abre no snakeviz / pstats.Stats) + amostrador.
+- amostragem: só o amostrador (sys._current_frames a cada
+  PROFILING_SAMPLE_INTERVAL_MS), overhead baixo o bastante para produção.
+O amostrador gera as pilhas colapsadas ("a;b;c 12") para flamegraph.pl /
+speedscope. Em task ele amostra todas as threads do processo (os crawlers
+usam pools de I/O), prefixando a pilha com o nome da thread; em view, só a
+thread da requisição.
+
+Opt-in: só com PROFILING_ENABLED=1 nos processos web/worker. Desligado (o
+padrão) custa uma checagem de flag: os sinais retornam na hora e o
+middleware nem entra na pilha (MiddlewareNotUsed).
+"""
+from __future__ import annotations
+
+import cProfile
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import redis
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+ATIVO = settings.PROFILING_ENABLED
+
+MODOS = ("cprofile", "amostragem")
+_TAREFAS = "arb:profiling:tasks"        # hash task -> modo
+_RESTANTES = "arb:profiling:restantes"  # hash task -> execuções que ainda serão perfiladas
+
+
+# ---- amostrador ----
+
+def _rotulo(code) -> str:
+    caminho = code.co_filename.replace(os.sep, "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(caminho[-2:])}:{code.co_firstlineno})"
+
+
+def _pilha(frame) -> str:
+    nomes = []
+    while frame is not None:
+        nomes.append(_rotulo(frame.f_code))
+        frame = frame.f_back
+    nomes.reverse()
+    return ";".join(nomes)
+
+
+class _Amostrador(threading.Thread):
+    def __init__(self, alvo: Optional[int], intervalo: float):
+        super().__init__(name="profiling-amostrador", daemon=True)
+        self.alvo = alvo          # ident da thread; None = todas
+        self.intervalo = intervalo
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+
+    def run(self) -> None:
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            frames = sys._current_frames()
+            if self.alvo is not None:
+                frame = frames.get(self.alvo)
+                if frame is not None:
+                    self.pilhas[_pilha(frame)] += 1
+            else:
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident != proprio:
+                        self.pilhas[f"{nomes.get(ident, ident)};{_pilha(frame)}"] += 1
+            self.amostras += 1
+
+    def parar(self) -> str:
+        self._parar.set()
+        self.join()
+        return "\n".join(f"{pilha} {n}" for pilha, n in self.pilhas.most_common())
+
+
+# ---- perfil ----
+
+class Perfil:
+    """Uma execução perfilada; iniciar()/finalizar() na mesma thread."""
+
+    def __init__(self, tipo: str, alvo: str, chave: str, modo: str, todas_threads: bool = False):
+        self.tipo, self.alvo, self.chave, self.modo = tipo, alvo, chave, modo
+        self.todas_threads = todas_threads
+        self._prof: Optional[cProfile.Profile] = None
+        self._amostrador: Optional[_Amostrador] = None
+        self._t0 = 0.0
+
+    def iniciar(self) -> "Perfil":
+        alvo = None if self.todas_threads else threading.get_ident()
+        self._amostrador = _Amostrador(alvo, settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+        self._amostrador.start()
+        if self.modo == "cprofile":
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        self._t0 = time.perf_counter()
+        return self
+
+    def finalizar(self):
+        from .models import ProfileRecord
+
+        duracao = time.perf_counter() - self._t0
+        pstats = None
+        if self._prof is not None:
+            self._prof.disable()
+            self._prof.create_stats()
+            pstats = marshal.dumps(self._prof.stats)  # mesmo formato de dump_stats
+        collapsed = self._amostrador.parar()
+        try:
+            registro = ProfileRecord.objects.create(
+                tipo=self.tipo, alvo=self.alvo[:200], chave=self.chave, modo=self.modo,
+                duracao=duracao, amostras=self._amostrador.amostras, pstats=pstats, collapsed=collapsed,
+            )
+        except DatabaseError as e:
+            log.warning("[PROFILING] perfil de %s [%s] não gravado: %s", self.alvo, self.chave, e)
+            return None
+        log.warning("[PROFILING] %s %s [%s] | %.2fs | amostras=%d",
+                    self.tipo, self.alvo, self.chave, duracao, self._amostrador.amostras)
+        _podar()
+        return registro
+
+
+def _podar() -> None:
+    """Mantém só os PROFILING_MAX_RECORDS perfis mais recentes."""
+    from .models import ProfileRecord
+
+    antigos = list(ProfileRecord.objects.order_by("-criado_em", "-id")
+                   .values_list("id", flat=True)[settings.PROFILING_MAX_RECORDS:])
+    if antigos:
+        ProfileRecord.objects.filter(id__in=antigos).delete()
+
+
+# ---- seleção das tasks ----
+
+_cache_tarefas: Tuple[float, Dict[str, Tuple[str, bool]]] = (0.0, {})
+
+
+def _tarefas() -> Dict[str, Tuple[str, bool]]:
+    """task -> (modo, limitada), das settings + Redis, relido a cada PROFILING_REFRESH_SEC."""
+    global _cache_tarefas
+    lido_em, tarefas = _cache_tarefas
+    if time.monotonic() - lido_em < settings.PROFILING_REFRESH_SEC:
+        return tarefas
+    tarefas = {nome: (settings.PROFILING_MODE, False) for nome in settings.PROFILING_TASKS}
+    try:
+        r = get_redis()
+        limitadas = set(r.hkeys(_RESTANTES))
+        for nome, modo in r.hgetall(_TAREFAS).items():
+            tarefas[nome] = (modo, nome in limitadas)
+    except redis.exceptions.RedisError as e:
+        log.warning("[PROFILING] tasks ligadas no Redis indisponíveis: %s", e)
+    _cache_tarefas = (time.monotonic(), tarefas)
+    return tarefas
+
+
+def _modo_da_task(nome: str) -> Optional[str]:
+    modo, limitada = _tarefas().get(nome, (None, False))
+    if modo is None or not limitada:
+        return modo
+    try:
+        r = get_redis()
+        restantes = r.hincrby(_RESTANTES, nome, -1)
+        if restantes <= 0:  # última (ou já esgotada por outro worker)
+            r.hdel(_TAREFAS, nome)
+            r.hdel(_RESTANTES, nome)
+    except redis.exceptions.RedisError:
+        return None
+    return modo if restantes >= 0 else None
+
+
+def ativar_task(nome: str, modo: str = "", vezes: int = 0) -> None:
+    """Perfila as próximas `vezes` execuções de `nome` (0 = até desativar)."""
+    r = get_redis()
+    r.hset(_TAREFAS, nome, modo or settings.PROFILING_MODE)
+    if vezes:
+        r.hset(_RESTANTES, nome, vezes)
+    else:
+        r.hdel(_RESTANTES, nome)
+
+
+def desativar_task(nome: str) -> None:
+    r = get_redis()
+    r.hdel(_TAREFAS, nome)
+    r.hdel(_RESTANTES, nome)
+
+
+def tarefas_ativas() -> Dict[str, Dict]:
+    r = get_redis()
+    restantes = r.hgetall(_RESTANTES)
+    out = {nome: {"modo": settings.PROFILING_MODE, "restantes": None, "origem": "settings"}
+           for nome in settings.PROFILING_TASKS}
+    for nome, modo in r.hgetall(_TAREFAS).items():
+        n = restantes.get(nome)
+        out[nome] = {"modo": modo, "restantes": int(n) if n is not None else None, "origem": "redis"}
+    return out
+
+
+# ---- Celery ----
+
+_em_curso: Dict[str, Perfil] = {}
+
+
+@task_prerun.connect
+def _task_inicio(task_id=None, task=None, **kwargs) -> None:
+    if not ATIVO:
+        return
+    modo = _modo_da_task(task.name) if task is not None else None
+    if modo:
+        _em_curso[task_id] = Perfil("task", task.name, task_id, modo, todas_threads=True).iniciar()
+
+
+@task_postrun.connect
+def _task_fim(task_id=None, **kwargs) -> None:
+    if not ATIVO:
+        return
+    perfil = _em_curso.pop(task_id, None)
+    if perfil is not None:
+        perfil.finalizar()
+
+
+# ---- views ----
+
+class ProfilingMiddleware:
+    """Depois do AuthenticationMiddleware: só staff liga o perfil da própria requisição."""
+
+    def __init__(self, get_response):
+        if not ATIVO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pedido = request.headers.get("X-Profile") or request.GET.get("_profile")
+        if not pedido or not getattr(request, "user", None) or not request.user.is_staff:
+            return self.get_response(request)
+        modo = pedido if pedido in MODOS else settings.PROFILING_MODE
+        chave = uuid.uuid4().hex
+        perfil = Perfil("request", request.path, chave, modo).iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            match = getattr(request, "resolver_match", None)
+            if match and match.view_name:
+                perfil.alvo = match.view_name
+            perfil.finalizar()
+        response["X-Profile-Id"] = chave
+        return response
@@ -0,0 +1,195 @@
+# base/ratelimit.py
+"""
+Token bucket distribuído (Redis) por host de origem e proxy.
+
+Todos os workers do Celery e comandos de gerenciamento reservam um token
+antes de cada requisição, então N contas em paralelo dividem o mesmo teto
+em vez de multiplicá-lo.
+
+- rate: tokens por segundo; burst: capacidade do balde.
+- Reserva: o token é descontado na hora e o chamador dorme o tempo
+  devolvido (1 ida ao Redis por requisição, sem polling).
+- Back-off adaptativo: um 429 corta a taxa efetiva pela metade e bloqueia o
+  balde pelo Retry-After; a taxa volta ao teto aos poucos com o tempo.
+
+Sem Redis disponível, cai para um balde local por processo.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+_criacao_lock = threading.Lock()
+
+# KEYS[1] = hash do balde
+# ARGV = rate, burst, min_factor, recover_per_sec
+# Retorna a espera em milissegundos (0 = pode seguir já).
+_RESERVE_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local min_factor = tonumber(ARGV[3])
+local recover = tonumber(ARGV[4])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local s = redis.call('HMGET', key, 'tokens', 'ts', 'factor', 'factor_ts')
+local tokens = tonumber(s[1]) or burst
+local ts = tonumber(s[2]) or now
+local factor = tonumber(s[3]) or 1
+local factor_ts = tonumber(s[4]) or now
+
+-- recuperação aditiva da taxa: volta ao teto aos poucos após um 429
+factor = math.min(1, math.max(min_factor, factor + (now - factor_ts) * recover))
+local eff = rate * factor
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) * eff)
+tokens = tokens - 1
+
+local wait = 0
+if tokens < 0 then
+  wait = -tokens / eff
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now, 'factor', factor, 'factor_ts', now)
+redis.call('EXPIRE', key, 3600)
+return math.floor(wait * 1000)
+"""
+
+# KEYS[1] = hash do balde
+# ARGV = rate, block_seconds, min_factor
+_PENALIZE_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local block = tonumber(ARGV[2])
+local min_factor = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local s = redis.call('HMGET', key, 'tokens', 'factor')
+local tokens = tonumber(s[1]) or 0
+local factor = tonumber(s[2]) or 1
+
+factor = math.max(min_factor, factor / 2)
+-- saldo negativo = ninguém passa antes de 'block' segundos
+tokens = math.min(tokens, 0) - block * rate * factor
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now, 'factor', factor, 'factor_ts', now)
+redis.call('HINCRBY', key, 'hits_429', 1)
+redis.call('EXPIRE', key, 3600)
+return tostring(factor)
+"""
+
+
+class _LocalBucket:
+    """Fallback em memória com a mesma semântica (vale só para este processo)."""
+
+    def __init__(self, rate: float, burst: float, min_factor: float, recover: float):
+        self.rate, self.burst = rate, burst
+        self.min_factor, self.recover = min_factor, recover
+        self.tokens = burst
+        self.factor = 1.0
+        self.ts = self.factor_ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.factor = min(1.0, max(self.min_factor, self.factor + (now - self.factor_ts) * self.recover))
+            self.factor_ts = now
+            eff = self.rate * self.factor
+            self.tokens = min(self.burst, self.tokens + max(0.0, now - self.ts) * eff) - 1
+            self.ts = now
+            return -self.tokens / eff if self.tokens < 0 else 0.0
+
+    def penalize(self, block: float) -> None:
+        with self._lock:
+            self.factor = max(self.min_factor, self.factor / 2)
+            self.tokens = min(self.tokens, 0) - block * self.rate * self.factor
+            self.ts = self.factor_ts = time.monotonic()
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        name: str,
+        *,
+        rate: float,
+        burst: float = 1,
+        min_factor: float = 0.1,
+        recover_per_sec: float = 0.01,
+    ):
+        self.name = name
+        self.key = f"arb:rl:{name}"
+        self.rate = rate
+        self.burst = burst
+        self.min_factor = min_factor
+        self.recover_per_sec = recover_per_sec
+        self._local: _LocalBucket | None = None
+
+    def _fallback(self, e: Exception) -> _LocalBucket:
+        if self._local is None:
+            with _criacao_lock:  # threads dos crawlers: um único balde local por nome
+                if self._local is None:
+                    log.warning("[RATE] Redis indisponível para %s (%s); usando limite local do processo", self.name, e)
+                    self._local = _LocalBucket(self.rate, self.burst, self.min_factor, self.recover_per_sec)
+        return self._local
+
+    def reserve(self) -> float:
+        """Reserva 1 token e devolve quantos segundos esperar antes de usar."""
+        try:
+            ms = get_redis().eval(
+                _RESERVE_LUA, 1, self.key,
+                self.rate, self.burst, self.min_factor, self.recover_per_sec,
+            )
+            return int(ms) / 1000.0
+        except redis.exceptions.RedisError as e:
+            return self._fallback(e).reserve()
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = await asyncio.to_thread(self.reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: float | None = None) -> None:
+        """Registra um 429: corta a taxa e bloqueia o balde por retry_after (ou 1/rate)."""
+        block = retry_after if retry_after is not None else 1.0 / self.rate
+        try:
+            get_redis().eval(_PENALIZE_LUA, 1, self.key, self.rate, block, self.min_factor)
+        except redis.exceptions.RedisError as e:
+            self._fallback(e).penalize(block)
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def limiter_for(host: str, proxy: str | None = None) -> TokenBucket:
+    """Balde compartilhado para (host, proxy). Configuração em settings.RATE_LIMITS."""
+    name = f"{host}|{proxy}" if proxy else host
+    bucket = _buckets.get(name)
+    if bucket is None:
+        # criação serializada: dois baldes locais para o mesmo host dobrariam a taxa no fallback
+        with _criacao_lock:
+            bucket = _buckets.get(name)
+            if bucket is None:
+                conf = settings.RATE_LIMITS.get(host) or settings.RATE_LIMITS["default"]
+                bucket = _buckets[name] = TokenBucket(name, **conf)
+    return bucket
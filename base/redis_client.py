@@ -0,0 +1,21 @@
+# base/redis_client.py
+"""Conexão Redis compartilhada para estado da aplicação (rate limit, locks, checkpoints)."""
+from __future__ import annotations
+
+import redis
+from django.conf import settings
+
+_client: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """Cliente único por processo (o pool de conexões do redis-py é thread-safe)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=5,
+        )
+    return _client
@@ -0,0 +1,150 @@
+# base/scheduler.py
+"""
+Agendador adaptativo de refresh de preços.
+
+Cada Item em carteira ganha um intervalo próprio:
+- valor em carteira alto -> intervalo curto (uma faca de $2.000 fica fresca
+  em minutos; um sticker de $0,03 atualiza de hora em hora);
+- volatilidade recente alta -> intervalo curto;
+- atraso (staleness) aumenta a prioridade de quem já venceu.
+
+A cada tick, só os itens vencidos entram numa fila de prioridade e apenas
+os primeiros que cabem no orçamento de req/s do tick são despachados.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import InventoryItem, LatestPrice, Price, RefreshSchedule, Site
+
+
+def calcular_urgencia(held_value: float, volatility: float) -> float:
+    valor = math.sqrt(max(held_value, 0.0) / settings.REFRESH_VALUE_REF)
+    vol = 1 + volatility * settings.REFRESH_VOL_WEIGHT
+    return max(valor * vol, 1e-6)
+
+
+def calcular_intervalo(urgencia: float) -> int:
+    intervalo = settings.REFRESH_MAX_INTERVAL / urgencia
+    return int(min(settings.REFRESH_MAX_INTERVAL, max(settings.REFRESH_MIN_INTERVAL, intervalo)))
+
+
+def _volatilidades(site: Site, item_ids, desde) -> Dict[int, float]:
+    """
+    Volatilidade realizada por hora: sqrt(soma dos log-retornos² / horas da janela).
+    Funciona com histórico esparso (modo só-mudanças): preço parado não soma nada.
+    """
+    horas = max((timezone.now() - desde).total_seconds() / 3600, 1.0)
+    soma_r2: Dict[int, float] = defaultdict(float)
+    ultimo: Dict[int, float] = {}
+    rows = (
+        Price.objects
+        .filter(site=site, item_id__in=item_ids, timestamp__gte=desde)
+        .order_by("item_id", "timestamp")
+        .values_list("item_id", "price")
+        .iterator(chunk_size=5000)
+    )
+    for item_id, p in rows:
+        anterior = ultimo.get(item_id)
+        if anterior and anterior > 0 and p > 0:
+            soma_r2[item_id] += math.log(p / anterior) ** 2
+        ultimo[item_id] = p
+    return {item_id: math.sqrt(v / horas) for item_id, v in soma_r2.items()}
+
+
+def recalcular_agenda(site: Site) -> Dict[str, int]:
+    """Recalcula valor, volatilidade e intervalo de todos os Items em carteira."""
+    now = timezone.now()
+    quantidades = dict(
+        InventoryItem.objects
+        .values("item_id")
+        .annotate(q=Sum("quantity"))
+        .values_list("item_id", "q")
+    )
+    item_ids = list(quantidades)
+    precos = dict(
+        LatestPrice.objects
+        .filter(site=site, item_id__in=item_ids)
+        .values_list("item_id", "price")
+    )
+    desde = now - timedelta(hours=settings.REFRESH_VOL_WINDOW_HOURS)
+    vols = _volatilidades(site, item_ids, desde)
+    existentes = RefreshSchedule.objects.in_bulk(item_ids)
+
+    novos: List[RefreshSchedule] = []
+    alterados: List[RefreshSchedule] = []
+    for item_id, q in quantidades.items():
+        held = (q or 0) * precos.get(item_id, 0.0)
+        vol = vols.get(item_id, 0.0)
+        urg = calcular_urgencia(held, vol)
+        intervalo = calcular_intervalo(urg)
+
+        sched = existentes.get(item_id)
+        if sched is None:
+            # sem preço ainda: vence agora
+            novos.append(RefreshSchedule(
+                item_id=item_id, next_refresh_at=now, interval_sec=intervalo,
+                held_value=held, volatility=vol, urgency=urg,
+            ))
+            continue
+        sched.held_value, sched.volatility, sched.urgency = held, vol, urg
+        sched.interval_sec = intervalo
+        # intervalo encolheu: antecipa o próximo refresh
+        if sched.last_refreshed_at:
+            sched.next_refresh_at = min(sched.next_refresh_at, sched.last_refreshed_at + timedelta(seconds=intervalo))
+        alterados.append(sched)
+
+    with transaction.atomic():
+        RefreshSchedule.objects.bulk_create(novos, batch_size=1000)
+        RefreshSchedule.objects.bulk_update(
+            alterados,
+            ["held_value", "volatility", "urgency", "interval_sec", "next_refresh_at"],
+            batch_size=1000,
+        )
+        removidos = RefreshSchedule.objects.exclude(item_id__in=item_ids).delete()[0]
+
+    return {"novos": len(novos), "atualizados": len(alterados), "removidos": removidos}
+
+
+def orcamento_do_tick() -> int:
+    """Requisições que cabem num tick do beat dentro do orçamento de req/s."""
+    return max(1, int(
+        settings.STEAM_REQUESTS_PER_SECOND * settings.REFRESH_TICK_SECONDS * settings.REFRESH_BUDGET_SHARE
+    ))
+
+
+def reservar_vencidos(limite: int | None = None) -> List[int]:
+    """
+    Tira da fila os itens vencidos de maior prioridade (até o orçamento) e já
+    marca o próximo refresh deles, para o tick seguinte não pegá-los de novo.
+    """
+    limite = limite or orcamento_do_tick()
+    now = timezone.now()
+
+    with transaction.atomic():
+        # candidatos: os mais urgentes e os mais atrasados entre os vencidos
+        base = RefreshSchedule.objects.select_for_update(skip_locked=True).filter(next_refresh_at__lte=now)
+        n = limite * settings.REFRESH_CANDIDATE_FACTOR
+        vencidos = {s.item_id: s for s in base.order_by("-urgency")[:n]}
+        vencidos.update((s.item_id, s) for s in base.order_by("next_refresh_at")[:n])
+        vencidos = list(vencidos.values())
+
+        def _prioridade(s: RefreshSchedule) -> float:
+            atraso = (now - s.next_refresh_at).total_seconds()
+            return s.urgency * (1 + atraso / max(s.interval_sec, 1))
+
+        escolhidos = heapq.nlargest(limite, vencidos, key=_prioridade)
+        for sched in escolhidos:
+            sched.last_refreshed_at = now
+            sched.next_refresh_at = now + timedelta(seconds=sched.interval_sec)
+        RefreshSchedule.objects.bulk_update(escolhidos, ["last_refreshed_at", "next_refresh_at"])
+    return [sched.item_id for sched in escolhidos]
@@ -0,0 +1,231 @@
+# base/steam_async.py
+"""
+Motor assíncrono de preços do Steam Market (priceoverview).
+
+- Uma única aiohttp.ClientSession com keep-alive para todas as consultas.
+- Um orçamento global de requisições por segundo (STEAM_REQUESTS_PER_SECOND)
+  compartilhado por todas as consultas em andamento; com RATE_LIMIT_DISTRIBUTED
+  o orçamento é o token bucket do Redis, dividido entre todos os processos.
+- 429 respeita Retry-After pausando o orçamento inteiro, não só uma consulta.
+
+Uso síncrono (Celery/views):
+    resultados = fetch_many(["AK-47 | Redline (Field-Tested)", ...])
+    # {"AK-47 | Redline (Field-Tested)": {"steam_lowest": "$12.34", ...} | SEM_PRECO | None}
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+from typing import Dict, Iterable
+
+import aiohttp
+from django.conf import settings
+
+from . import transport
+from .price_cache import SEM_PRECO
+from .ratelimit import TokenBucket, limiter_for
+
+log = logging.getLogger(__name__)
+
+PRICEOVERVIEW_PATH = "/market/priceoverview/"  # sob settings.STEAM_BASE_URL
+
+STEAM_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/127.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json,text/javascript,*/*;q=0.01",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://steamcommunity.com/market/",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+class AsyncRateLimiter:
+    """
+    Distribui requisições em slots de 1/rps segundos.
+    Todas as corrotinas disputam a mesma agenda, então a vazão total fica
+    exatamente no orçamento, independente de quantas estão em andamento.
+    """
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Empurra a agenda inteira para frente (ex.: Retry-After)."""
+        now = asyncio.get_running_loop().time()
+        self._next = max(self._next, now + seconds)
+
+
+class DistributedRateLimiter:
+    """Adapta o TokenBucket (Redis) à interface do AsyncRateLimiter."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+
+    async def acquire(self) -> None:
+        await self.bucket.acquire_async()
+
+    def pause(self, seconds: float) -> None:
+        self.bucket.penalize(seconds)
+
+
+def _retry_after(resp: aiohttp.ClientResponse, default: float) -> float:
+    raw = resp.headers.get("Retry-After")
+    if raw:
+        try:
+            return max(float(raw), 0.0)
+        except ValueError:
+            pass
+    return default
+
+
+class SteamPriceEngine:
+    """
+    async with SteamPriceEngine() as engine:
+        data = await engine.fetch_many_async(names)
+    """
+
+    def __init__(
+        self,
+        *,
+        rps: float | None = None,
+        max_in_flight: int | None = None,
+        currency: int = 1,
+        retries: int = 3,
+        delay: float = 2.0,
+    ):
+        self.rps = rps
+        self.max_in_flight = max_in_flight or settings.STEAM_MAX_IN_FLIGHT
+        self.currency = currency
+        self.retries = retries
+        self.delay = delay
+        self.limiter: AsyncRateLimiter | DistributedRateLimiter | None = None
+        self.session: aiohttp.ClientSession | None = None
+        self.url = settings.STEAM_BASE_URL + PRICEOVERVIEW_PATH
+        self._sem: asyncio.Semaphore | None = None
+
+    async def __aenter__(self):
+        if self.rps is None and settings.RATE_LIMIT_DISTRIBUTED:
+            self.limiter = DistributedRateLimiter(limiter_for("steamcommunity.com"))
+        else:
+            self.limiter = AsyncRateLimiter(self.rps or settings.STEAM_REQUESTS_PER_SECOND)
+        self._sem = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        self.session = transport.sessao_async(
+            connector=connector,
+            headers=STEAM_HEADERS,
+            timeout=aiohttp.ClientTimeout(connect=4, sock_read=12),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def fetch_one(self, market_hash_name: str):
+        """Resultado, SEM_PRECO (Steam respondeu success=false) ou None (falha)."""
+        params = {
+            "currency": str(self.currency),
+            "appid": "730",
+            "market_hash_name": market_hash_name,
+        }
+        for attempt in range(self.retries):
+            try:
+                # ocupa um slot de conexão antes do slot de tempo: o orçamento
+                # não é consumido por quem ainda não consegue enviar
+                async with self._sem:
+                    await self.limiter.acquire()
+                    async with self.session.get(self.url, params=params) as resp:
+                        if resp.status == 429:
+                            wait = min(_retry_after(resp, self.delay * (2 ** attempt)), 60)
+                            log.warning("[RATE] 429 para %s (tentativa %s/%s). Pausando %.1fs",
+                                        market_hash_name, attempt + 1, self.retries, wait)
+                            self.limiter.pause(wait)
+                            continue
+                        resp.raise_for_status()
+                        data = await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                wait = min(self.delay * (2 ** attempt) + random.uniform(0.5, 2.0), 45)
+                log.warning("[ERRO] Falha ao buscar %s (tentativa %s/%s): %s | aguardando %.1fs",
+                            market_hash_name, attempt + 1, self.retries, e, wait)
+                await asyncio.sleep(wait)
+                continue
+
+            if data and data.get("success"):
+                return {
+                    "steam_lowest": data.get("lowest_price"),
+                    "steam_median": data.get("median_price"),
+                    "steam_volume": data.get("volume"),
+                }
+            log.warning("[WARN] Resposta sem sucesso para %s: %s", market_hash_name, data)
+            return SEM_PRECO
+        return None  # tentativas esgotadas (429/rede): falha, não "sem preço"
+
+    async def fetch_many_async(self, names: Iterable[str]) -> Dict[str, object]:
+        unicos = list(dict.fromkeys(names))
+
+        async def _one(name):
+            try:
+                return name, await self.fetch_one(name)
+            except Exception as e:  # uma falha não derruba o lote
+                log.error("[ERRO] Engine falhou em %s: %s", name, e)
+                return name, None
+
+        pares = await asyncio.gather(*(_one(n) for n in unicos))
+        return dict(pares)
+
+
+def run_sync(coro):
+    """Executa a corrotina mesmo se já houver um event loop rodando nesta thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    box = {}
+
+    def _target():
+        try:
+            box["result"] = asyncio.run(coro)
+        except BaseException as e:
+            box["error"] = e
+
+    t = threading.Thread(target=_target)
+    t.start()
+    t.join()
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+def fetch_many(names: Iterable[str], **engine_kwargs) -> Dict[str, object]:
+    """
+    API síncrona: {market_hash_name: resultado, SEM_PRECO ou None} para todos
+    os nomes (ver fetch_one). price_cache.get_steam_prices devolve só resultado ou None.
+    """
+    names = list(names)
+
+    async def _run():
+        async with SteamPriceEngine(**engine_kwargs) as engine:
+            return await engine.fetch_many_async(names)
+
+    return run_sync(_run())
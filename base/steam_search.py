@@ -0,0 +1,109 @@
+# base/steam_search.py
+"""
+Fonte alternativa de preços da Steam: a listagem de busca do mercado
+(market/search/render em modo JSON), 100 itens por página com preço de
+venda e quantidade de anúncios.
+
+Varre o catálogo do app 730 inteiro em algumas centenas de requisições, em
+vez de uma requisição de priceoverview por item.
+"""
+from __future__ import annotations
+
+import logging
+from decimal import Decimal
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+
+from . import transport
+from .ratelimit import limiter_for
+from .steam_async import STEAM_HEADERS
+
+log = logging.getLogger(__name__)
+
+SEARCH_PATH = "/market/search/render/"  # sob settings.STEAM_BASE_URL
+
+
+def _fetch_search_page(session: requests.Session, start: int, count: int, retries: int = 3) -> Optional[dict]:
+    bucket = limiter_for("steamcommunity.com")
+    params = {
+        "appid": 730,
+        "norender": 1,
+        "start": start,
+        "count": count,
+        "search_descriptions": 0,
+        "sort_column": "name",   # ordem estável para paginar
+        "sort_dir": "asc",
+    }
+    for attempt in range(retries):
+        bucket.acquire()
+        try:
+            resp = session.get(settings.STEAM_BASE_URL + SEARCH_PATH, params=params, timeout=(4, 20))
+        except requests.exceptions.RequestException as e:
+            log.warning("[SEARCH] Falha em start=%s (tentativa %s/%s): %s", start, attempt + 1, retries, e)
+            continue
+        if resp.status_code == 429:
+            try:
+                wait = float(resp.headers.get("Retry-After", ""))
+            except ValueError:
+                wait = None
+            log.warning("[SEARCH] 429 em start=%s (tentativa %s/%s)", start, attempt + 1, retries)
+            bucket.penalize(wait)
+            continue
+        if resp.status_code != 200:
+            log.warning("[SEARCH] HTTP %s em start=%s", resp.status_code, start)
+            continue
+        try:
+            data = resp.json()
+        except ValueError as e:  # 200 com HTML (página de erro/interstitial da Steam)
+            log.warning("[SEARCH] Resposta não-JSON em start=%s (tentativa %s/%s): %s",
+                        start, attempt + 1, retries, e)
+            continue
+        if data and data.get("success"):
+            return data
+    return None
+
+
+def crawl_steam_search(*, page_size: int | None = None, max_pages: int | None = None) -> Dict[str, dict]:
+    """
+    Retorna {market_hash_name: {"price": Decimal(USD), "listings": int}}
+    para todos os itens com anúncio à venda.
+    """
+    page_size = page_size or settings.STEAM_SEARCH_PAGE_SIZE
+    precos: Dict[str, dict] = {}
+    start = 0
+    total = None
+    pages = 0
+
+    with transport.sessao() as s:
+        s.headers.update(STEAM_HEADERS)
+        while total is None or start < total:
+            if max_pages is not None and pages >= max_pages:
+                break
+            data = _fetch_search_page(s, start, page_size)
+            pages += 1
+            if data is None:
+                if total is None:
+                    log.warning("[SEARCH] Primeira página indisponível; abortando")
+                    break
+                log.warning("[SEARCH] Página start=%s perdida; seguindo", start)
+                start += page_size
+                continue
+            total = int(data.get("total_count") or 0)
+            results = data.get("results") or []
+            for r in results:
+                name = r.get("hash_name") or (r.get("asset_description") or {}).get("market_hash_name")
+                cents = r.get("sell_price")
+                if not name or not cents or int(cents) <= 0:
+                    continue
+                precos[name] = {
+                    "price": (Decimal(int(cents)) / 100).quantize(Decimal("0.01")),
+                    "listings": int(r.get("sell_listings") or 0),
+                }
+            if not results:
+                break
+            start += len(results)
+
+    log.warning("[SEARCH] FIM | paginas=%d | itens=%d | total_count=%s", pages, len(precos), total)
+    return precos
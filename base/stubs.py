@@ -0,0 +1,303 @@
+# base/stubs.py
+"""
+Servidor local que imita os endpoints de mercado usados pelos conectores,
+servindo dados das fixtures do repositório (csmoney_all.json, inventario.json):
+
+- Steam:    /market/priceoverview/, /market/search/render/,
+            /inventory/{steam_id}/730/2 (paginado por count/start_assetid)
+- cs.money: /1.0/market/sell-orders?limit=&offset=
+- CSFloat:  /api/v1/listings?market_hash_name=&limit=
+- /__stats: contagem de requisições por rota e status (para testes de carga)
+
+Latência configurável (com jitter) e injeção de 429 (com Retry-After) e de
+400 (o bloqueio temporário do cs.money), sorteados com semente fixa. Preços,
+volumes e inventários são derivados das fixtures de forma determinística.
+
+Uso:
+    python manage.py stub_server --porta 8765 --latencia-ms 80 --taxa-429 0.05
+    STEAM_BASE_URL=http://127.0.0.1:8765 CSMONEY_BASE_URL=http://127.0.0.1:8765 ...
+
+    with StubServer(StubConfig(latencia_ms=20)) as stub:   # em thread, porta livre
+        ...  # stub.url
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from aiohttp import web
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+CSMONEY_FIXTURE = os.path.join(_DIR, "csmoney_all.json")
+INVENTARIO_FIXTURE = os.path.join(_DIR, "inventario.json")
+_IMG_BASE = "https://steamcommunity-a.akamaihd.net/economy/image/"
+
+
+@dataclass
+class StubConfig:
+    latencia_ms: float = 0.0
+    jitter: float = 0.5          # latência sorteada em latencia_ms * (1 ± jitter)
+    taxa_429: float = 0.0        # fração das requisições respondidas com 429
+    taxa_400: float = 0.0        # fração das requisições ao cs.money respondidas com 400
+    retry_after: float = 1.0     # segundos no cabeçalho Retry-After dos 429
+    seed: int = 0
+
+
+def _h(*partes) -> int:
+    """Hash estável (não depende do PYTHONHASHSEED)."""
+    return int(hashlib.sha1("|".join(map(str, partes)).encode()).hexdigest()[:12], 16)
+
+
+class Fixtures:
+    def __init__(
+        self,
+        csmoney_path: str = CSMONEY_FIXTURE,
+        inventario_path: str = INVENTARIO_FIXTURE,
+        extras: Iterable[str] = (),
+    ):
+        with open(csmoney_path, encoding="utf-8") as f:
+            self.sell_orders: List[dict] = json.load(f)
+        with open(inventario_path, encoding="utf-8") as f:
+            self.itens_inventario: List[dict] = json.load(f)
+        # as fixtures discordam no classid de alguns nomes (classid da Steam x
+        # identificador do cs.money); o inventário fica só com os coerentes
+        ids_csmoney = {
+            so["asset"]["names"]["full"]: str(so["asset"]["names"].get("identifier"))
+            for so in self.sell_orders if ((so.get("asset") or {}).get("names") or {}).get("full")
+        }
+        self.itens_inventario = [
+            it for it in self.itens_inventario
+            if ids_csmoney.get(it["market_hash_name"], it["classid"]) == it["classid"]
+        ]
+
+        # catálogo Steam: menor sell-order do cs.money * 1.15; itens só do inventário
+        # (ou de `extras`) têm preço sintético
+        self.catalogo: Dict[str, dict] = {}
+        for so in self.sell_orders:
+            nome = ((so.get("asset") or {}).get("names") or {}).get("full")
+            preco = (so.get("pricing") or {}).get("computed") or (so.get("pricing") or {}).get("default")
+            if not nome or not preco:
+                continue
+            atual = self.catalogo.get(nome)
+            if atual is None or preco < atual["base"]:
+                self.catalogo[nome] = {"base": float(preco)}
+        for it in self.itens_inventario:
+            self.catalogo.setdefault(it["market_hash_name"], {"base": 0.03 + (_h(it["market_hash_name"]) % 20000) / 100})
+        for nome in extras:  # ex.: catálogo sintético do benchmark
+            self.catalogo.setdefault(nome, {"base": 0.03 + (_h(nome) % 20000) / 100})
+        for nome, c in self.catalogo.items():
+            c["steam"] = round(c["base"] * 1.15, 2)
+            c["volume"] = _h(nome, "vol") % 2000
+            c["listings"] = 1 + _h(nome, "list") % 500
+        self.nomes = sorted(self.catalogo)
+        self._inventarios: Dict[str, dict] = {}
+
+    def inventario(self, steam_id: str) -> dict:
+        """Inventário determinístico por conta: ~3/4 dos itens da fixture, 1 a 3 cópias cada."""
+        inv = self._inventarios.get(steam_id)
+        if inv is not None:
+            return inv
+        assets, descs = [], []
+        assetid = 10_000_000_000 + _h(steam_id) % 1_000_000_000
+        for it in self.itens_inventario:
+            if _h(steam_id, it["classid"]) % 4 == 0:
+                continue
+            descs.append({
+                "appid": 730,
+                "classid": it["classid"],
+                "instanceid": "0",
+                "market_hash_name": it["market_hash_name"],
+                "type": it.get("type"),
+                "icon_url": (it.get("icon_url") or "").replace(_IMG_BASE, ""),
+                "tradable": 1,
+                "marketable": 1,
+            })
+            for _ in range(1 + _h(steam_id, it["classid"], "q") % 3):
+                assetid += 1
+                assets.append({"appid": 730, "contextid": "2", "assetid": str(assetid),
+                               "classid": it["classid"], "instanceid": "0", "amount": "1"})
+        assets.reverse()  # a Steam devolve os mais novos primeiro
+        inv = self._inventarios[steam_id] = {"assets": assets, "descriptions": descs}
+        return inv
+
+
+def criar_app(config: Optional[StubConfig] = None, fixtures: Optional[Fixtures] = None) -> web.Application:
+    config = config or StubConfig()
+    fixtures = fixtures or Fixtures()
+    rnd = random.Random(config.seed)
+    stats: Counter = Counter()
+
+    @web.middleware
+    async def _falhas(request: web.Request, handler):
+        rota = request.match_info.route.name or request.path
+        if rota == "stats":
+            return await handler(request)
+        if config.latencia_ms > 0:
+            fator = 1 + rnd.uniform(-config.jitter, config.jitter)
+            await asyncio.sleep(max(config.latencia_ms * fator, 0) / 1000)
+        sorteio = rnd.random()
+        if rota == "csmoney" and sorteio < config.taxa_400:
+            resp = web.json_response({"error": "bad request"}, status=400)
+        elif sorteio < config.taxa_400 * (rota == "csmoney") + config.taxa_429:
+            resp = web.json_response({"error": "too many requests"}, status=429,
+                                     headers={"Retry-After": f"{config.retry_after:g}"})
+        else:
+            resp = await handler(request)
+        stats[f"{rota}:{resp.status}"] += 1
+        return resp
+
+    async def priceoverview(request: web.Request):
+        c = fixtures.catalogo.get(request.query.get("market_hash_name", ""))
+        if c is None:
+            return web.json_response({"success": False})
+        return web.json_response({
+            "success": True,
+            "lowest_price": f"${c['steam']:.2f}",
+            "median_price": f"${round(c['steam'] * 0.98, 2):.2f}",
+            "volume": f"{c['volume']:,}",
+        })
+
+    async def search(request: web.Request):
+        start = int(request.query.get("start", 0))
+        count = min(int(request.query.get("count", 100)), 100)
+        results = []
+        for nome in fixtures.nomes[start:start + count]:
+            c = fixtures.catalogo[nome]
+            results.append({
+                "name": nome,
+                "hash_name": nome,
+                "sell_listings": c["listings"],
+                "sell_price": int(round(c["steam"] * 100)),
+                "sell_price_text": f"${c['steam']:.2f}",
+                "asset_description": {"market_hash_name": nome},
+            })
+        return web.json_response({
+            "success": True, "start": start, "pagesize": count,
+            "total_count": len(fixtures.nomes), "results": results,
+        })
+
+    async def inventario(request: web.Request):
+        inv = fixtures.inventario(request.match_info["steam_id"])
+        count = int(request.query.get("count", 1000))
+        inicio = 0
+        if "start_assetid" in request.query:
+            ids = [a["assetid"] for a in inv["assets"]]
+            try:
+                inicio = ids.index(request.query["start_assetid"]) + 1
+            except ValueError:
+                return web.json_response({"success": False}, status=500)
+        pagina = inv["assets"][inicio:inicio + count]
+        classids = {a["classid"] for a in pagina}
+        data = {
+            "assets": pagina,
+            "descriptions": [d for d in inv["descriptions"] if d["classid"] in classids],
+            "total_inventory_count": len(inv["assets"]),
+            "success": 1,
+        }
+        if inicio + count < len(inv["assets"]) and pagina:
+            data["more_items"] = 1
+            data["last_assetid"] = pagina[-1]["assetid"]
+        return web.json_response(data)
+
+    async def sell_orders(request: web.Request):
+        limit = int(request.query.get("limit", 60))
+        offset = int(request.query.get("offset", 0))
+        return web.json_response({"items": fixtures.sell_orders[offset:offset + limit]})
+
+    async def csfloat(request: web.Request):
+        nome = request.query.get("market_hash_name", "")
+        c = fixtures.catalogo.get(nome)
+        if c is None:
+            return web.json_response({"listings": []})
+        limit = int(request.query.get("limit", 5))
+        n = min(limit, 1 + _h(nome, "csf") % 5)
+        listings = [
+            {
+                "id": str(_h(nome, "csf", i)),
+                "price": int(round(c["base"] * (0.97 + 0.01 * i) * 100)),
+                "float_value": (_h(nome, "float", i) % 10_000) / 10_000,
+                "asset": {"market_hash_name": nome, "stickers": []},
+            }
+            for i in range(n)
+        ]
+        return web.json_response({"listings": listings})
+
+    async def stats_view(request: web.Request):
+        return web.json_response(dict(stats))
+
+    app = web.Application(middlewares=[_falhas])
+    app.router.add_get("/market/priceoverview/", priceoverview, name="priceoverview")
+    app.router.add_get("/market/search/render/", search, name="search")
+    app.router.add_get("/inventory/{steam_id}/730/2", inventario, name="inventory")
+    app.router.add_get("/1.0/market/sell-orders", sell_orders, name="csmoney")
+    app.router.add_get("/api/v1/listings", csfloat, name="csfloat")
+    app.router.add_get("/__stats", stats_view, name="stats")
+    app["stats"] = stats
+    return app
+
+
+class StubServer:
+    """Sobe o stub numa thread própria (event loop próprio); porta 0 = livre."""
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0,
+                 fixtures: Optional[Fixtures] = None):
+        self.config = config or StubConfig()
+        self.host, self.port = host, port
+        self.fixtures = fixtures
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app: Optional[web.Application] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self.app["stats"]) if self.app is not None else {}
+
+    def start(self) -> "StubServer":
+        pronto = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def _subir():
+            self.app = criar_app(self.config, self.fixtures)
+            self._runner = web.AppRunner(self.app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, self.host, self.port)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+
+        def _rodar():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(_subir())
+            pronto.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_rodar, name="stub-server", daemon=True)
+        self._thread.start()
+        pronto.wait(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
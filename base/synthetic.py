@@ -0,0 +1,302 @@
+# base/synthetic.py
+"""
+Dados sintéticos com o formato dos de produção (manage.py generate_load_data,
+base/benchmark.py). Tudo sai de uma semente: mesma semente e mesmos
+parâmetros = mesmo banco.
+
+- Items: nomes/ícones reais de csmoney_all.json e inventario.csv, completados
+  com nomes sintéticos; popularidade Zipf (poucos itens em quase todas as
+  contas, cauda longa rara).
+- Contas: tamanho de inventário com cauda pesada (Pareto), itens sorteados
+  pela popularidade, pilhas ocasionais (quantity > 1).
+- Price: uma série por (item, site) cobrindo `anos` até agora, em passeio
+  aleatório log-normal com saltos raros. O orçamento de linhas é repartido
+  pela popularidade: os itens populares chegam à resolução de `passo_min`
+  minutos, a cauda fica com poucos pontos. LatestPrice/preco_atual coincidem
+  com o fim da série.
+- PriceAlvo: uma fração dos itens em carteira, acima e abaixo do preço atual.
+
+O histórico vai por SQL direto em blocos (executemany no SQLite, COPY no
+PostgreSQL) sem passar pelo ORM: 10M linhas levam minutos.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import alerts
+from .models import Inventory, InventoryItem, Item, LatestPrice, Price, PriceAlvo, Site
+
+log = logging.getLogger(__name__)
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SITES = [
+    ("Steam Market", "https://steamcommunity.com/market/"),
+    ("CS.MONEY", "https://cs.money/market/"),
+    ("CSFloat", "https://csfloat.com/"),
+]
+_DESGASTES = ["Factory New", "Minimal Wear", "Field-Tested", "Well-Worn", "Battle-Scarred"]
+_LOTE = 50_000              # linhas por executemany/COPY
+_LINHAS_POR_BLOCO = 1_000_000  # linhas de Price geradas por vez (memória)
+COBERTURA = (1.0, 0.6, 0.4)  # fração dos itens com preço em cada site de SITES
+
+
+def nomes_das_fixtures() -> List[Tuple[str, str, str, str]]:
+    """(classid, market_hash_name, type, icon_url) das fixtures, sem repetir nome nem classid."""
+    vistos_nome, vistos_classid, out = set(), set(), []
+
+    def _add(classid, nome, tipo, icon):
+        if not nome or not classid or nome in vistos_nome or classid in vistos_classid:
+            return
+        vistos_nome.add(nome)
+        vistos_classid.add(classid)
+        out.append((classid, nome, tipo or "", icon or ""))
+
+    # cs.money primeiro: o stub só serve do inventário os itens cujo nome não
+    # aparece no cs.money com outro identificador (base/stubs.py)
+    with open(os.path.join(_DIR, "csmoney_all.json"), encoding="utf-8") as f:
+        for so in json.load(f):
+            asset = so.get("asset") or {}
+            nomes = asset.get("names") or {}
+            _add(str(nomes.get("identifier") or ""), nomes.get("full"), asset.get("type"),
+                 (asset.get("images") or {}).get("steam"))
+    with open(os.path.join(_DIR, "inventario.csv"), encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            _add(row["classid"], row["market_hash_name"], row["type"], row["icon_url"])
+    return out
+
+
+def nomes_sinteticos(n: int) -> List[Tuple[str, str, str, str]]:
+    """Catálogo de n itens: primeiro os das fixtures, depois nomes sintéticos estáveis."""
+    base = nomes_das_fixtures()[:n]
+    for k in range(len(base), n):
+        base.append((
+            str(9_000_000_000 + k),
+            f"Synthetic Item #{k} ({_DESGASTES[k % len(_DESGASTES)]})",
+            "Synthetic Grade Rifle",
+            "",
+        ))
+    return base
+
+
+def _timestamps(agora, minutos_atras: np.ndarray) -> List[str]:
+    """Instantes como texto 'YYYY-MM-DD HH:MM:SS' (o formato que o Django grava no SQLite)."""
+    t = np.datetime64(agora.replace(tzinfo=None), "m") - minutos_atras.astype("timedelta64[m]")
+    txt = np.datetime_as_string(t, unit="s").astype("S19")
+    txt.view("S1").reshape(-1, 19)[:, 10] = b" "
+    return txt.astype("U19").tolist()
+
+
+def _inserir_precos(item_ids: np.ndarray, site_ids: np.ndarray, minutos_atras: np.ndarray,
+                    valores: np.ndarray, agora) -> None:
+    opts = Price._meta
+    cols = ", ".join(opts.get_field(f).column for f in ("item", "site", "price", "timestamp"))
+    linhas = zip(item_ids.tolist(), site_ids.tolist(), valores.tolist(), _timestamps(agora, minutos_atras))
+    with connection.cursor() as c:
+        if connection.vendor == "postgresql":
+            with c.cursor.copy(f"COPY {opts.db_table} ({cols}) FROM STDIN") as copy:
+                copy.write("".join(f"{i}\t{s}\t{p}\t{t}\n" for i, s, p, t in linhas))
+            return
+        sql = f"INSERT INTO {opts.db_table} ({cols}) VALUES (%s, %s, %s, %s)"
+        lista = list(linhas)
+        for ini in range(0, len(lista), _LOTE):
+            c.executemany(sql, lista[ini:ini + _LOTE])
+
+
+def _carga_rapida():
+    """Afrouxa a durabilidade só durante a carga (dados descartáveis)."""
+    with connection.cursor() as c:
+        if connection.vendor == "sqlite":
+            c.execute("PRAGMA synchronous")
+            anterior = c.fetchone()[0]
+            c.execute("PRAGMA synchronous = OFF")
+            return lambda: connection.cursor().execute(f"PRAGMA synchronous = {int(anterior)}")
+        if connection.vendor == "postgresql":
+            c.execute("SET synchronous_commit = off")
+            return lambda: connection.cursor().execute("RESET synchronous_commit")
+    return lambda: None
+
+
+def _series(rng, popularidade: np.ndarray, n_sites: int, precos: int, anos: float, passo_min: int):
+    """
+    Séries (item, site) presentes e quantos pontos/qual passo cada uma tem.
+    Pontos proporcionais à popularidade do item, limitados à resolução máxima.
+    """
+    presente = np.column_stack([rng.random(len(popularidade)) < COBERTURA[s] for s in range(n_sites)])
+    presente[:, 0] = True  # a Steam tem preço de tudo
+    item_idx, site_idx = np.nonzero(presente)
+    span = int(anos * 365 * 24 * 60)
+    peso = popularidade[item_idx]
+    pontos = np.floor(precos * peso / peso.sum()).astype(np.int64)
+    pontos = np.clip(pontos, 1, span // passo_min + 1)
+    passo = np.maximum(span // np.maximum(pontos - 1, 1), passo_min)
+    return item_idx, site_idx, pontos, passo
+
+
+def _gerar_precos(rng, item_idx, site_idx, pontos, passo, fim: np.ndarray, vol_dia: np.ndarray,
+                  item_ids, site_ids, agora, progresso, t0) -> int:
+    """Passeio aleatório de cada série, ancorado no preço final, inserido em blocos."""
+    total, alvo = 0, int(pontos.sum())
+    fronteiras = np.searchsorted(np.cumsum(pontos), np.arange(_LINHAS_POR_BLOCO, alvo, _LINHAS_POR_BLOCO))
+    for bloco in np.split(np.arange(len(pontos)), fronteiras + 1):
+        if not len(bloco):
+            continue
+        n = pontos[bloco]
+        serie = np.repeat(np.arange(len(bloco)), n)
+        inicio = np.repeat(np.cumsum(n) - n, n)
+        j = np.arange(len(serie)) - inicio                    # posição dentro da série
+        minutos_atras = (np.repeat(n, n) - 1 - j) * np.repeat(passo[bloco], n)
+
+        sigma = vol_dia[item_idx[bloco]] * np.sqrt(passo[bloco] / 1440.0)
+        incremento = rng.standard_normal(len(serie)) * np.repeat(sigma, n)
+        saltos = rng.random(len(serie)) < 0.0005
+        incremento[saltos] += rng.normal(0, 0.15, int(saltos.sum()))
+        incremento[j == 0] = 0.0
+        caminho = np.cumsum(incremento)
+        caminho -= np.repeat(caminho[np.cumsum(n) - 1], n)    # termina em 0: último ponto = preço atual
+        valores = np.round(np.repeat(fim[item_idx[bloco], site_idx[bloco]], n) * np.exp(caminho), 2).clip(0.01)
+
+        with transaction.atomic():
+            _inserir_precos(item_ids[item_idx[bloco]][serie], site_ids[site_idx[bloco]][serie],
+                            minutos_atras, valores, agora)
+        total += len(serie)
+        progresso(f"precos={total}/{alvo} | {time.perf_counter() - t0:.1f}s")
+    return total
+
+
+def gerar(
+    itens: int,
+    contas: int,
+    precos: int,
+    *,
+    seed: int = 0,
+    anos: float = 2.0,
+    passo_min: int = 1,
+    zipf: float = 0.9,
+    inventario_mediano: int = 60,
+    pareto: float = 1.3,
+    inventario_max: int = 5000,
+    alvos: float = 0.05,
+    prefixo: str = "sint",
+    progresso: Callable[[str], None] = log.info,
+) -> Dict[str, int]:
+    """
+    Gera o catálogo inteiro no banco atual; `precos` é o orçamento de linhas
+    de Price (pode sobrar quando as séries batem na resolução máxima).
+    Retorna as contagens geradas.
+    """
+    rng = np.random.default_rng(seed)
+    rng_precos = np.random.default_rng([seed, 1])   # fluxos separados: mudar --precos
+    rng_contas = np.random.default_rng([seed, 2])   # não muda as contas e vice-versa
+    agora = timezone.now().replace(second=0, microsecond=0)
+    t0 = time.perf_counter()
+    restaurar = _carga_rapida()
+    try:
+        with transaction.atomic():
+            sites = [Site.objects.get_or_create(name=n, defaults={"url": u})[0] for n, u in SITES]
+            site_ids = np.array([s.id for s in sites], dtype=np.int64)
+
+            catalogo = nomes_sinteticos(itens)
+            Item.objects.bulk_create(
+                [Item(classid=c, market_hash_name=n, type=t or None, icon_url=i or None) for c, n, t, i in catalogo],
+                batch_size=2000, ignore_conflicts=True,
+            )
+            por_nome = dict(Item.objects.filter(market_hash_name__in=[c[1] for c in catalogo])
+                            .values_list("market_hash_name", "id"))
+            item_ids = np.array([por_nome[c[1]] for c in catalogo], dtype=np.int64)
+        progresso(f"itens={len(item_ids)} | {time.perf_counter() - t0:.1f}s")
+
+        n = len(item_ids)
+        popularidade = 1.0 / (rng.permutation(n) + 1.0) ** zipf
+        # preço log-normal (mediana ~US$ 2, cauda de centenas), volatilidade diária 0,5%-10%
+        nivel = np.exp(rng.normal(0.7, 1.4, n)).clip(0.03, 5000)
+        vol_dia = np.exp(rng.normal(np.log(0.02), 0.6, n)).clip(0.005, 0.10)
+        fim = np.round(nivel[:, None] * (1.0 + rng.normal(0, 0.04, (n, len(sites)))), 2).clip(0.01)
+
+        item_idx, site_idx, pontos, passo = _series(rng, popularidade, len(sites), precos, anos, passo_min)
+        total = 0
+        if precos:
+            total = _gerar_precos(rng_precos, item_idx, site_idx, pontos, passo, fim, vol_dia,
+                                  item_ids, site_ids, agora, progresso, t0)
+
+        with transaction.atomic():
+            volume = rng.poisson(5000 * popularidade / popularidade.max())
+            LatestPrice.objects.bulk_create(
+                [
+                    LatestPrice(item_id=int(item_ids[i]), site_id=int(site_ids[s]), price=float(fim[i, s]),
+                                timestamp=agora, volume=int(volume[i]) if s == 0 else None)
+                    for i, s in zip(item_idx.tolist(), site_idx.tolist())
+                ],
+                batch_size=2000,
+                update_conflicts=True,
+                unique_fields=["item", "site"],
+                update_fields=["price", "timestamp", "volume"],
+            )
+            contagens = _gerar_contas(rng_contas, contas, item_ids, popularidade, fim[:, 0], site_ids[0], agora,
+                                      seed=seed, prefixo=prefixo, inventario_mediano=inventario_mediano,
+                                      pareto=pareto, inventario_max=inventario_max, alvos=alvos)
+    finally:
+        restaurar()
+
+    # bulk_create não dispara os sinais que mantêm o índice de alvos
+    try:
+        alerts.reconstruir_indice()
+    except redis.exceptions.RedisError as e:
+        log.warning("[SINTETICO] índice de alvos não reconstruído: %s", e)
+
+    progresso(f"concluído | {time.perf_counter() - t0:.1f}s")
+    return {"itens": n, "sites": len(sites), "series": len(pontos), "precos": total, **contagens}
+
+
+def _gerar_contas(rng, contas: int, item_ids, popularidade, preco_steam, steam_id_site, agora, *, seed, prefixo,
+                  inventario_mediano, pareto, inventario_max, alvos) -> Dict[str, int]:
+    n = len(item_ids)
+    p = popularidade / popularidade.sum()
+    # Pareto clássico (x_m = 1) tem mediana 2^(1/a): escala para a mediana pedida
+    tamanhos = inventario_mediano * (rng.pareto(pareto, contas) + 1.0) / 2 ** (1 / pareto)
+    tamanhos = np.clip(np.round(tamanhos), 1, min(inventario_max, n)).astype(np.int64)
+    taxa = settings.SITE_FEES["Steam Market"]["venda"]
+
+    contas_objs = Inventory.objects.bulk_create([
+        Inventory(name=f"{prefixo}-{seed}-{k}", steam_id=str(76561190000000000 + seed * 100_000 + k))
+        for k in range(contas)
+    ])
+    inv_itens, alvos_objs = [], []
+    asset_id = 30_000_000_000 + seed * 1_000_000_000
+    for conta, tamanho in zip(contas_objs, tamanhos.tolist()):
+        escolhidos = rng.choice(n, size=tamanho, replace=False, p=p)
+        quantidade = rng.geometric(0.7, tamanho)              # maioria 1, pilhas ocasionais
+        negociavel = rng.random(tamanho) < 0.8
+        for i, q, neg in zip(escolhidos.tolist(), quantidade.tolist(), negociavel.tolist()):
+            asset_id += 1
+            preco = float(preco_steam[i])
+            inv_itens.append(InventoryItem(
+                inventory_id=conta.id, item_id=int(item_ids[i]), asset_id=str(asset_id),
+                tradable=neg, quantity=q, price_usd=round(preco * (1 - taxa), 2),
+                preco_atual=preco, preco_atual_at=agora,
+            ))
+        com_alvo = escolhidos[rng.random(tamanho) < alvos]
+        acima = rng.random(len(com_alvo)) < 0.7
+        distancia = rng.uniform(0.02, 0.3, len(com_alvo))
+        so_steam = rng.random(len(com_alvo)) < 0.2
+        for i, ac, d, st in zip(com_alvo.tolist(), acima.tolist(), distancia.tolist(), so_steam.tolist()):
+            alvos_objs.append(PriceAlvo(
+                item_id=int(item_ids[i]), inventory_id=conta.id,
+                preco_alvo=round(float(preco_steam[i]) * (1 + d if ac else 1 - d), 2),
+                direcao=PriceAlvo.ACIMA if ac else PriceAlvo.ABAIXO,
+                site_id=int(steam_id_site) if st else None,
+            ))
+    InventoryItem.objects.bulk_create(inv_itens, batch_size=5000)
+    PriceAlvo.objects.bulk_create(alvos_objs, batch_size=5000)
+    return {"contas": len(contas_objs), "inventory_items": len(inv_itens), "alvos": len(alvos_objs)}
@@ -1,15 +1,25 @@
 # base/tasks.py
 from __future__ import annotations   # <-- primeira linha do arquivo
 
+import hashlib
+import os
 import time
+from collections import Counter
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 
-from base.import_prices import get_steam_price
-from celery import shared_task
-from django.utils import timezone
-from .models import Inventory, Site, Price
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Sum
+from .locks import LeaseLock, contar, limpar_na_fila, marcar_na_fila
+from .ingest import PriceIngestBuffer, POLITICA_MUDOU, POLITICA_SEMPRE
+from . import arbitrage, history, partitions, portfolio, scheduler
+from .models import Inventory, InventoryItem, Item, LatestPrice, RefreshSchedule, Site
+from .price_cache import get_steam_prices, publicar
+from .steam_search import crawl_steam_search
+from .utils import atualizar_precos_csmoney_minimos
+from .inventory_async import importar_inventarios, lock_inventario
 
-STEAM_FEE = Decimal("0.15")
+STEAM_FEE = Decimal(str(settings.SITE_FEES["Steam Market"]["venda"]))
 TWOPLACES = Decimal("0.01")
 
 def _parse_price_to_decimal(raw) -> Decimal | None:
@@ -30,64 +40,503 @@ def _parse_price_to_decimal(raw) -> Decimal | None:
         return None
     return val.quantize(TWOPLACES)
 
+def _lock_conta(conta_id: int) -> LeaseLock:
+    return LeaseLock(f"steam:conta:{conta_id}", ttl=settings.STEAM_TASK_LOCK_TTL)
+
+
+def enfileirar_atualizacao(conta_id: int) -> str:
+    """
+    Enfileira atualizar_precos_steam_task sem duplicar trabalho:
+    - "skipped": a conta já está sendo atualizada;
+    - "coalesced": já existe uma tarefa dessa conta aguardando na fila;
+    - "enqueued": tarefa enviada.
+    """
+    if _lock_conta(conta_id).is_locked():
+        contar("skipped")
+        return "skipped"
+    if not marcar_na_fila(f"steam:conta:{conta_id}", settings.STEAM_TASK_LOCK_TTL):
+        contar("coalesced")
+        return "coalesced"
+    atualizar_precos_steam_task.delay(conta_id)
+    contar("enqueued")
+    return "enqueued"
+
+
 @shared_task
 def atualizar_precos_steam_task(conta_id: int):
+    limpar_na_fila(f"steam:conta:{conta_id}")
+
+    lock = _lock_conta(conta_id)
+    if not lock.acquire():
+        contar("skipped")
+        print(f"[TASK] conta={conta_id} | já em execução, ignorada")
+        return {"conta": conta_id, "status": "skipped"}
+    try:
+        with lock.keepalive():
+            return _atualizar_precos_conta(conta_id)
+    finally:
+        lock.release()
+
+
+def _steam_site() -> Site:
     site, _ = Site.objects.get_or_create(
         name="Steam Market",
         defaults={"url": "https://steamcommunity.com/market/"}
     )
-    
+    return site
+
+
+def _steam_buffer(site: Site) -> PriceIngestBuffer:
+    politica = POLITICA_MUDOU if settings.STEAM_PRICE_ONLY_CHANGES else POLITICA_SEMPRE
+    return PriceIngestBuffer(site, politica=politica)
+
+
+def _bruto_steam(result: dict | None) -> Decimal | None:
+    """Preço bruto (USD) de um resultado do priceoverview; None se inválido."""
+    if not result:
+        return None
+    # suporta tanto o formato novo (steam_*) quanto antigo
+    raw = (
+        result.get("steam_lowest")
+        or result.get("lowest_price")
+        or result.get("steam_median")
+        or result.get("median_price")
+    )
+    bruto = _parse_price_to_decimal(raw)
+    if not bruto or bruto <= 0:
+        return None
+    return bruto
+
+
+def _volume_steam(result: dict | None) -> int | None:
+    """Volume (vendas 24h do priceoverview) como inteiro; None se ausente."""
+    raw = result and (result.get("steam_volume") or result.get("volume"))
+    if not raw:
+        return None
+    try:
+        return int(str(raw).replace(",", "").replace(".", ""))
+    except ValueError:
+        return None
+
+
+def _liquido_steam(bruto: Decimal) -> Decimal:
+    """Aplica a taxa de 15% da Steam."""
+    return (bruto * (Decimal("1.00") - STEAM_FEE)).quantize(TWOPLACES, rounding=ROUND_HALF_UP)
+
+
+def _atualizar_precos_conta(conta_id: int) -> dict:
+    site = _steam_site()
+
     conta = Inventory.objects.get(id=conta_id)
-    inv_items = conta.items.select_related("item").all()
+    inv_items = list(conta.items.select_related("item"))
 
-    # cache por execução (evita consultar a mesma skin várias vezes)
-    cache = {}
+    # uma consulta por nome distinto (cache compartilhado entre contas), em paralelo
+    # dentro do orçamento global; currency=1 = USD
+    resultados = get_steam_prices((inv.item.market_hash_name for inv in inv_items), currency=1)
     updated = 0
     checked = 0
 
+    buf = _steam_buffer(site)
+
     for inv in inv_items:
-        mhn = inv.item.market_hash_name
         checked += 1
 
-        if mhn in cache:
-            result = cache[mhn]
-        else:
-            # sua função já faz backoff/jitter; currency=1 = USD
-            result = get_steam_price(mhn, currency=1)
-            cache[mhn] = result
-
-        if not result:
-            continue
-
-        # suporta tanto o formato novo (steam_*) quanto antigo
-        raw = (
-            result.get("steam_lowest")
-            or result.get("lowest_price")
-            or result.get("steam_median")
-            or result.get("median_price")
-        )
-        bruto = _parse_price_to_decimal(raw)
-        if not bruto or bruto <= 0:
+        result = resultados.get(inv.item.market_hash_name)
+        bruto = _bruto_steam(result)
+        if bruto is None:
             continue
 
-        # salva histórico (preço bruto no Price)
-        Price.objects.create(
-            item=inv.item,
-            site=site,
-            price=float(bruto),  # seu model é FloatField
-            timestamp=timezone.now(),
-        )
+        # histórico (preço bruto no Price) + LatestPrice, gravados em lote
+        buf.add(inv.item_id, float(bruto), _volume_steam(result))  # seu model é FloatField
 
         # aplica taxa de 15% e salva no InventoryItem
-        liquido = (bruto * (Decimal("1.00") - STEAM_FEE)).quantize(TWOPLACES, rounding=ROUND_HALF_UP)
-        inv.price_usd = liquido
-        inv.save(update_fields=["price_usd"])
+        buf.add_inventory_price(inv, _liquido_steam(bruto))
 
         updated += 1
 
-    print(f"[TASK] conta={conta_id} | itens={checked} | atualizados={updated}")
+    buf.flush()
+    print(
+        f"[TASK] conta={conta_id} | itens={checked} | atualizados={updated} "
+        f"| historico_salvos={buf.stats['salvos']} | sem_mudanca={buf.stats['ignorados']}"
+    )
+    return {"conta": conta_id, "status": "ok", "itens": checked, "atualizados": updated}
 
 @shared_task
 def atualizar_precos_todos():
-    for conta in Inventory.objects.all():
-        atualizar_precos_steam_task.delay(conta.id)
+    resumo = Counter(
+        enfileirar_atualizacao(conta_id)
+        for conta_id in Inventory.objects.values_list("id", flat=True)
+    )
+    print(
+        f"[TASK] fan-out | enfileiradas={resumo['enqueued']} | em_execucao={resumo['skipped']} "
+        f"| coalescidas={resumo['coalesced']}"
+    )
+    return dict(resumo)
+
+
+
+# ---- Refresh global em shards (chord) ----
+
+def _hash_nome(name: str) -> int:
+    """Posição estável do nome no anel (não muda entre processos, ao contrário de hash())."""
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _planejar_chunks(itens: list[tuple[int, str]], chunk_size: int) -> list[list[int]]:
+    """
+    Ordena os itens pela posição no anel de hash do market_hash_name e corta
+    em faixas contíguas de tamanho fixo: um item novo só desloca a borda de
+    uma faixa, então os chunks são quase sempre os mesmos entre execuções.
+    """
+    ordenados = sorted(itens, key=lambda t: _hash_nome(t[1]))
+    return [
+        [item_id for item_id, _ in ordenados[i:i + chunk_size]]
+        for i in range(0, len(ordenados), chunk_size)
+    ]
+
+
+@shared_task
+def atualizar_precos_global(chunk_size: int | None = None):
+    """
+    Planeja o refresh de todos os Items distintos de todos os inventários:
+    cada chunk vira uma tarefa independente (qualquer worker pega) e, no fim,
+    recalcular_contas atualiza price_usd e totais de todas as contas.
+    """
+    lock = LeaseLock("steam:global", ttl=settings.STEAM_TASK_LOCK_TTL)
+    if not lock.acquire():
+        contar("skipped")
+        print("[TASK] refresh global já em execução, ignorado")
+        return {"status": "skipped"}
+
+    try:
+        chunk_size = chunk_size or settings.STEAM_CHUNK_SIZE
+        itens = list(
+            Item.objects
+            .filter(inventoryitem__isnull=False)
+            .values_list("id", "market_hash_name")
+            .distinct()
+        )
+        chunks = _planejar_chunks(itens, chunk_size)
+
+        # o lease cobre a duração estimada da varredura inteira no orçamento de req/s
+        lock.ttl = max(lock.ttl, int(len(itens) / settings.STEAM_REQUESTS_PER_SECOND) + 60)
+        lock.renew()
+        if not chunks:
+            lock.release()
+            return {"status": "ok", "itens": 0, "chunks": 0}
+
+        chord(atualizar_precos_chunk.s(ids) for ids in chunks)(recalcular_contas.s(lock_token=lock.token))
+    except Exception:
+        # falha no banco/broker antes do chord sair: quem solta o lock (recalcular_contas)
+        # nunca vai rodar, e o lease acabou de ser esticado para a varredura inteira
+        lock.release()
+        raise
+    contar("enqueued", len(chunks))
+    print(f"[TASK] refresh global | itens={len(itens)} | chunks={len(chunks)}")
+    return {"status": "dispatched", "itens": len(itens), "chunks": len(chunks)}
+
+
+@shared_task
+def atualizar_precos_chunk(item_ids: list[int]) -> dict:
+    """Busca e grava o preço Steam de um chunk de Items (sem olhar contas)."""
+    site = _steam_site()
+    itens = list(Item.objects.filter(id__in=item_ids).only("id", "market_hash_name"))
+    resultados = get_steam_prices((i.market_hash_name for i in itens), currency=1)
+
+    com_preco = 0
+    with _steam_buffer(site) as buf:
+        for item in itens:
+            bruto = _bruto_steam(resultados.get(item.market_hash_name))
+            if bruto is None:
+                continue
+            buf.add(item.id, float(bruto), _volume_steam(resultados.get(item.market_hash_name)))
+            com_preco += 1
+
+    return {"itens": len(itens), "com_preco": com_preco, "salvos": buf.stats["salvos"]}
+
+
+def recalcular_precos_liquidos(item_ids=None) -> int:
+    """
+    Recalcula InventoryItem.price_usd (líquido) a partir do LatestPrice da Steam.
+    Só grava as linhas cujo valor mudou. Retorna quantas foram atualizadas.
+    """
+    site = _steam_site()
+    latest = LatestPrice.objects.filter(site=site)
+    inv_items = InventoryItem.objects.only("id", "item_id", "inventory_id", "price_usd")
+    if item_ids is not None:
+        latest = latest.filter(item_id__in=item_ids)
+        inv_items = inv_items.filter(item_id__in=item_ids)
+    brutos = dict(latest.values_list("item_id", "price"))
+
+    alterados = []
+    for ii in inv_items.iterator(chunk_size=2000):
+        p = brutos.get(ii.item_id)
+        if p is None or p <= 0:
+            continue
+        liquido = _liquido_steam(Decimal(str(p)).quantize(TWOPLACES))
+        if ii.price_usd != liquido:
+            ii.price_usd = liquido
+            alterados.append(ii)
+    InventoryItem.objects.bulk_update(alterados, ["price_usd"], batch_size=settings.PRICE_INGEST_BATCH_SIZE)
+    portfolio.atualizar_snapshots({ii.inventory_id for ii in alterados})
+    return len(alterados)
+
+
+@shared_task
+def recalcular_contas(resultados: list[dict], lock_token: str | None = None, item_ids: list[int] | None = None):
+    """
+    Etapa final do chord: price_usd e totais das contas.
+    Com item_ids, só as linhas desses itens e as contas que os possuem.
+    """
+    try:
+        atualizados = recalcular_precos_liquidos(item_ids)
+        contas = InventoryItem.objects.all()
+        if item_ids is not None:
+            contas = InventoryItem.objects.filter(
+                inventory__in=InventoryItem.objects.filter(item_id__in=item_ids).values("inventory")
+            )
+        totais = {
+            row["inventory"]: float(row["total"] or 0)
+            for row in (
+                contas
+                .values("inventory")
+                .annotate(total=Sum(ExpressionWrapper(F("price_usd") * F("quantity"), output_field=FloatField())))
+            )
+        }
+    finally:
+        if lock_token:
+            lock = LeaseLock("steam:global", ttl=settings.STEAM_TASK_LOCK_TTL)
+            lock.token = lock_token
+            lock.release()
+
+    itens = sum(r.get("itens", 0) for r in resultados)
+    com_preco = sum(r.get("com_preco", 0) for r in resultados)
+    enfileirar_arbitragem()
+    print(
+        f"[TASK] recalcular_contas | chunks={len(resultados)} | itens={itens} "
+        f"| com_preco={com_preco} | price_usd_atualizados={atualizados} | contas={len(totais)}"
+    )
+    return {"chunks": len(resultados), "itens": itens, "com_preco": com_preco,
+            "price_usd_atualizados": atualizados, "totais": totais}
+
+
+
+# ---- Refresh adaptativo (base/scheduler.py) ----
+
+@shared_task
+def recalcular_agenda_task():
+    res = scheduler.recalcular_agenda(_steam_site())
+    print(f"[TASK] agenda | novos={res['novos']} | atualizados={res['atualizados']} | removidos={res['removidos']}")
+    return res
+
+
+@shared_task
+def atualizar_precos_agendados():
+    """
+    Tick do beat: despacha só os itens vencidos de maior prioridade que cabem
+    no orçamento de req/s do tick, em chunks (mesmo caminho do refresh global).
+    """
+    if not RefreshSchedule.objects.exists():
+        scheduler.recalcular_agenda(_steam_site())
+
+    item_ids = scheduler.reservar_vencidos()
+    if not item_ids:
+        return {"status": "ok", "itens": 0}
+
+    nomes = dict(Item.objects.filter(id__in=item_ids).values_list("id", "market_hash_name"))
+    chunks = _planejar_chunks(list(nomes.items()), settings.STEAM_CHUNK_SIZE)
+    chord(atualizar_precos_chunk.s(ids) for ids in chunks)(recalcular_contas.s(item_ids=item_ids))
+    print(f"[TASK] agendados | itens={len(item_ids)} | chunks={len(chunks)}")
+    return {"status": "dispatched", "itens": len(item_ids), "chunks": len(chunks)}
+
+
+
+# ---- Busca do mercado (base/steam_search.py) ----
+
+@shared_task
+def atualizar_precos_steam_search(fallback: bool = True):
+    """
+    Preços da Steam pela listagem de busca (100 itens por requisição), gravados
+    pelo mesmo caminho do atualizar_precos_steam_task; o priceoverview só é
+    usado para itens em carteira que a busca não cobriu.
+    """
+    lock = LeaseLock("steam:search", ttl=settings.STEAM_TASK_LOCK_TTL)
+    if not lock.acquire():
+        contar("skipped")
+        return {"status": "skipped"}
+    try:
+        with lock.keepalive():
+            return _atualizar_precos_steam_search(fallback)
+    finally:
+        lock.release()
+
+
+def _atualizar_precos_steam_search(fallback: bool) -> dict:
+    site = _steam_site()
+    mapa = crawl_steam_search()
+
+    # mesmo formato do priceoverview: vale para o cache e para _bruto_steam. Sem
+    # steam_volume: a busca só traz o nº de ofertas (sell_listings), não as vendas
+    # de 24h que o LatestPrice.volume guarda; o volume gravado fica como está
+    resultados = {
+        name: {"steam_lowest": f"${v['price']}", "steam_median": None, "steam_volume": None}
+        for name, v in mapa.items()
+    }
+    publicar("steam", 1, resultados)
+
+    em_carteira = dict(
+        Item.objects
+        .filter(inventoryitem__isnull=False)
+        .values_list("market_hash_name", "id")
+        .distinct()
+    )
+    faltando = [name for name in em_carteira if name not in resultados]
+    if fallback and faltando:
+        resultados.update(get_steam_prices(faltando, currency=1))
+
+    conhecidos = dict(Item.objects.filter(market_hash_name__in=list(resultados)).values_list("market_hash_name", "id"))
+    cobertos = 0
+    with _steam_buffer(site) as buf:
+        for name, item_id in conhecidos.items():
+            bruto = _bruto_steam(resultados.get(name))
+            if bruto is None:
+                continue
+            buf.add(item_id, float(bruto), _volume_steam(resultados.get(name)))
+            cobertos += 1
+
+    atualizados = recalcular_precos_liquidos(list(em_carteira.values()))
+    enfileirar_arbitragem()
+    print(
+        f"[TASK] steam search | catalogo={len(mapa)} | itens_gravados={cobertos} "
+        f"| fallback_priceoverview={len(faltando) if fallback else 0} | price_usd_atualizados={atualizados}"
+    )
+    return {
+        "catalogo": len(mapa),
+        "gravados": cobertos,
+        "fallback": len(faltando) if fallback else 0,
+        "price_usd_atualizados": atualizados,
+    }
+
+
+# ---- cs.money (base/csmoney_crawler.py) ----
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def atualizar_precos_csmoney(run_id: str = "default", resume: bool = True):
+    """
+    Crawl dos menores preços do cs.money. acks_late: se o worker morrer, a
+    mensagem volta para a fila e a nova execução retoma do checkpoint.
+    """
+    lock = LeaseLock(f"csmoney:{run_id}", ttl=settings.CSMONEY_TASK_LOCK_TTL)
+    if not lock.acquire():
+        contar("skipped")
+        return {"status": "skipped"}
+    arquivo = None
+    if settings.CSMONEY_ARCHIVE_DIR:
+        arquivo = os.path.join(settings.CSMONEY_ARCHIVE_DIR, f"csmoney-{run_id}.ndjson.gz")
+    try:
+        with lock.keepalive():
+            res = atualizar_precos_csmoney_minimos(run_id=run_id, resume=resume, arquivo=arquivo)
+    finally:
+        lock.release()
+    enfileirar_arbitragem()
+    print(
+        f"[TASK] csmoney | paginas={res['pages_ok']} | distintos={res['distintos']} "
+        f"| salvos={res['salvos']} | criados={res['criados']}"
+    )
+    return res
+
+
+# ---- Inventários (base/inventory_async.py) ----
+
+def enfileirar_importacao(conta_id: int) -> str:
+    """Mesma lógica de enfileirar_atualizacao, para a importação do inventário."""
+    if lock_inventario(conta_id).is_locked():
+        contar("skipped")
+        return "skipped"
+    if not marcar_na_fila(f"inventario:conta:{conta_id}", settings.STEAM_TASK_LOCK_TTL):
+        contar("coalesced")
+        return "coalesced"
+    importar_inventarios_task.delay([conta_id])
+    contar("enqueued")
+    return "enqueued"
+
+
+@shared_task(bind=True)
+def importar_inventarios_task(self, conta_ids: list[int] | None = None, force: bool = False):
+    """
+    Importa várias contas em paralelo (sessão HTTP única, orçamento global da
+    Steam). O progresso por conta fica no estado PROGRESS do resultado.
+    """
+    if conta_ids is None:
+        conta_ids = list(Inventory.objects.values_list("id", flat=True))
+    for conta_id in conta_ids:
+        limpar_na_fila(f"inventario:conta:{conta_id}")
+
+    feitas: dict = {}
+
+    def _progresso(conta_id: int, res: dict) -> None:
+        feitas[conta_id] = res
+        print(f"[TASK] inventario conta={conta_id} | {res.get('status')} | itens={res.get('itens_total', 0)}")
+        if self.request.id:
+            self.update_state(state="PROGRESS", meta={"feitas": len(feitas), "total": len(conta_ids), "contas": feitas})
+
+    resultados = importar_inventarios(conta_ids, force=force, ao_concluir=_progresso)
+    status = Counter(r.get("status") for r in resultados.values())
+    print(f"[TASK] inventarios | contas={len(resultados)} | " + " | ".join(f"{k}={v}" for k, v in sorted(status.items())))
+    return resultados
+
+
+# ---- Retenção do histórico (base/history.py) ----
+
+@shared_task
+def compactar_precos_task():
+    """
+    Bruto antigo -> velas de 1h; velas de 1h antigas -> velas de 1d. Com Price
+    particionada, também cria as próximas partições e remove as expiradas.
+    """
+    lock = LeaseLock("historico:compactar", ttl=600)
+    if not lock.acquire():
+        return {"status": "skipped"}
+    try:
+        with lock.keepalive():
+            res = history.compactar_precos()
+            res["particoes_criadas"] = partitions.garantir_particoes()
+            res["particoes_removidas"] = partitions.expirar_particoes()
+    finally:
+        lock.release()
+    print(
+        f"[TASK] historico | velas_1h={res['velas_1h']} | brutos_apagados={res['brutos_apagados']} "
+        f"| velas_1d={res['velas_1d']} | velas_1h_apagadas={res['velas_1h_apagadas']} "
+        f"| particoes_removidas={len(res['particoes_removidas'])}"
+    )
+    return res
+
+
+# ---- Arbitragem entre sites (base/arbitrage.py) ----
+
+def enfileirar_arbitragem() -> str:
+    """Chamado no fim de cada crawl; rodadas pedidas em sequência viram uma só."""
+    if not marcar_na_fila("arbitragem", 300):
+        contar("coalesced")
+        return "coalesced"
+    calcular_arbitragem_task.delay()
+    contar("enqueued")
+    return "enqueued"
+
+
+@shared_task
+def calcular_arbitragem_task():
+    limpar_na_fila("arbitragem")
+    lock = LeaseLock("arbitragem", ttl=120)
+    if not lock.acquire():
+        contar("skipped")
+        return {"status": "skipped"}
+    try:
+        res = arbitrage.calcular_arbitragem()
+    finally:
+        lock.release()
+    print(
+        f"[TASK] arbitragem | itens={res['itens']} | sites={res['sites']} | oportunidades={res['oportunidades']} "
+        f"| carga={res['carga_ms']}ms | calculo={res['calculo_ms']}ms"
+    )
+    return res
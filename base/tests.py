@@ -1,3 +1,738 @@
-from django.test import TestCase
+import asyncio
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import redis
+import requests
+from django.db import transaction
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import alerts, arbitrage, benchmark, history, locks, metrics, price_cache, ratelimit, scheduler, steam_search, tasks, transport, utils
+from .ingest import POLITICA_CAIU, PriceIngestBuffer
+from .models import (
+    Alert, ArbitrageOpportunity, Inventory, InventoryItem, Item, LatestPrice, PortfolioSnapshot, Price, PriceAlvo, PriceCandle,
+    RefreshSchedule, Site,
+)
+
+try:
+    import fakeredis  # só os testes dos scripts Lua precisam; sem ele são pulados
+except ImportError:
+    fakeredis = None
+
+
+def _redis_falso():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+@override_settings(ALERT_HYSTERESIS=0.1)
+class TransicaoAlertaTests(SimpleTestCase):
+    def _entrada(self, direcao, disparado=False, alvo=100.0):
+        return {"inv": 1, "alvo": alvo, "dir": direcao, "site": None, "disp": disparado}
+
+    def test_acima_dispara_ao_alcancar_o_alvo(self):
+        self.assertIsNone(alerts._transicao(self._entrada(PriceAlvo.ACIMA), 99.99))
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ACIMA), 100.0), True)
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ACIMA), 130.0), True)
+
+    def test_acima_disparado_fica_na_faixa_de_histerese(self):
+        entrada = self._entrada(PriceAlvo.ACIMA, disparado=True)
+        for preco in (150.0, 100.0, 95.0, 90.0):
+            self.assertIsNone(alerts._transicao(entrada, preco), preco)
+
+    def test_acima_rearma_abaixo_da_faixa(self):
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ACIMA, disparado=True), 89.99), False)
+
+    def test_abaixo_dispara_ao_alcancar_o_alvo(self):
+        self.assertIsNone(alerts._transicao(self._entrada(PriceAlvo.ABAIXO), 100.01))
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ABAIXO), 100.0), True)
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ABAIXO), 50.0), True)
+
+    def test_abaixo_disparado_fica_na_faixa_de_histerese(self):
+        entrada = self._entrada(PriceAlvo.ABAIXO, disparado=True)
+        for preco in (50.0, 100.0, 105.0, 110.0):
+            self.assertIsNone(alerts._transicao(entrada, preco), preco)
+
+    def test_abaixo_rearma_acima_da_faixa(self):
+        self.assertIs(alerts._transicao(self._entrada(PriceAlvo.ABAIXO, disparado=True), 110.01), False)
+
+
+@override_settings(ALERT_HYSTERESIS=0.1, REDIS_URL="redis://127.0.0.1:1/0")
+class AlertaNaPoliticaCaiuTests(TestCase):
+    """Na política "caiu" só quedas entram no Price, mas os alvos veem toda observação."""
+
+    def setUp(self):
+        self.site = Site.objects.create(name="CS.MONEY", url="https://cs.money")
+        self.item = Item.objects.create(classid="1", market_hash_name="AK-47 | Redline (Field-Tested)")
+        self.conta = Inventory.objects.create(steam_id="1", name="conta")
+
+    def _ingerir(self, preco):
+        with self.captureOnCommitCallbacks(execute=True):
+            with PriceIngestBuffer(self.site, politica=POLITICA_CAIU) as buf:
+                buf.add(self.item.id, preco)
+
+    def test_subida_atualiza_latest_e_dispara_alvo_acima(self):
+        self._ingerir(10.0)
+        alvo = PriceAlvo.objects.create(item=self.item, inventory=self.conta, site=self.site,
+                                        direcao=PriceAlvo.ACIMA, preco_alvo=12)
+        self._ingerir(12.5)
+
+        self.assertEqual(Price.objects.filter(site=self.site).count(), 1)  # subida fora do histórico
+        self.assertEqual(LatestPrice.objects.get(site=self.site, item=self.item).price, 12.5)
+        self.assertEqual(Alert.objects.filter(alvo=alvo).count(), 1)
+
+        self._ingerir(12.5)  # mesmo preço de novo: sem alerta repetido
+        self.assertEqual(Alert.objects.filter(alvo=alvo).count(), 1)
+
+    def test_alvo_abaixo_rearma_na_subida(self):
+        self._ingerir(10.0)
+        alvo = PriceAlvo.objects.create(item=self.item, inventory=self.conta, site=self.site,
+                                        direcao=PriceAlvo.ABAIXO, preco_alvo=9)
+        self._ingerir(8.0)
+        self._ingerir(11.0)  # acima de 9 * 1.1: rearma
+        alvo.refresh_from_db()
+        self.assertFalse(alvo.disparado)
+        self._ingerir(8.5)  # fora do histórico (não caiu abaixo de 8), mas cruza o alvo
+        self.assertEqual(Alert.objects.filter(alvo=alvo).count(), 2)
+
+
+@override_settings(INVENTORY_MIN_RESYNC_SECONDS=0, REDIS_URL="redis://127.0.0.1:1/0")
+class SyncInventarioTests(TestCase):
+    def setUp(self):
+        self.conta = Inventory.objects.create(steam_id="76561198000000000", name="conta")
+
+    def _pagina(self, tradable):
+        return {
+            "assets": [
+                {"appid": 730, "contextid": "2", "assetid": "111", "classid": "10", "amount": "1"},
+                {"appid": 730, "contextid": "2", "assetid": "112", "classid": "10", "amount": "1"},
+            ],
+            "descriptions": [{"classid": "10", "market_hash_name": "Sticker | Teste", "tradable": tradable}],
+            "total_inventory_count": 2,
+        }
+
+    def _importar(self, pagina):
+        def _paginas(*args, **kwargs):
+            yield pagina
+
+        with mock.patch.object(utils, "_iter_inventory_pages", _paginas):
+            return utils.importar_inventario(self.conta.steam_id, self.conta)
+
+    def test_fim_do_trade_hold_e_gravado(self):
+        self.assertEqual(self._importar(self._pagina(0))["status"], "atualizado")
+        self.assertFalse(InventoryItem.objects.get(inventory=self.conta).tradable)
+
+        self.assertEqual(self._importar(self._pagina(0))["status"], "inalterado")
+
+        resumo = self._importar(self._pagina(1))  # mesmos assetids, só o tradable mudou
+        self.assertEqual(resumo["status"], "atualizado")
+        ii = InventoryItem.objects.get(inventory=self.conta)
+        self.assertTrue(ii.tradable)
+        self.assertEqual(ii.quantity, 2)
+
+    def test_metadados_do_item_sao_atualizados(self):
+        self._importar(self._pagina(0))
+        pagina = self._pagina(0)
+        pagina["descriptions"][0].update(market_hash_name="Sticker | Teste (Holo)", icon_url="novo", type="Sticker")
+
+        self.assertEqual(self._importar(pagina)["status"], "atualizado")
+        item = InventoryItem.objects.select_related("item").get(inventory=self.conta).item
+        self.assertEqual((item.market_hash_name, item.type), ("Sticker | Teste (Holo)", "Sticker"))
+        self.assertTrue(item.icon_url.endswith("novo"))
+
+
+@override_settings(PRICE_COMPACT_BATCH=2, PRICE_RAW_RETENTION_HOURS=1, PRICE_HOURLY_RETENTION_DAYS=1)
+class CompactacaoTests(TestCase):
+    agora = datetime(2026, 1, 10, 12, 0)
+
+    def setUp(self):
+        self.site = Site.objects.create(name="Steam Market", url="https://steamcommunity.com/market/")
+        self.item = Item.objects.create(classid="1", market_hash_name="AK-47 | Redline (Field-Tested)")
+
+    def _velas(self, granularidade):
+        return {
+            v.inicio: (v.open, v.high, v.low, v.close, v.amostras)
+            for v in PriceCandle.objects.filter(item=self.item, site=self.site, granularidade=granularidade)
+        }
+
+    def _brutos(self):
+        # lotes de 2 linhas: a hora das 9h e a das 10h ficam divididas entre lotes
+        for hora, minuto, preco in ((9, 0, 10), (9, 20, 12), (9, 40, 9), (10, 10, 11), (10, 50, 8), (11, 30, 20)):
+            Price.objects.create(item=self.item, site=self.site, price=preco,
+                                 timestamp=datetime(2026, 1, 10, hora, minuto))
+
+    def _conferir_bruto(self):
+        self.assertEqual(self._velas(PriceCandle.HORA), {
+            datetime(2026, 1, 10, 9): (10, 12, 9, 9, 3),
+            datetime(2026, 1, 10, 10): (11, 11, 8, 8, 2),
+        })
+        # só a hora ainda aberta (depois do corte das 11h) continua bruta
+        self.assertEqual(list(Price.objects.values_list("price", flat=True)), [20])
+
+    def test_bruto_vira_velas_de_1h_e_e_apagado(self):
+        self._brutos()
+        res = history.compactar_precos(self.agora)
+        self._conferir_bruto()
+        self.assertEqual(res["brutos_apagados"], 5)
+
+    def test_segunda_execucao_depois_de_uma_interrompida(self):
+        self._brutos()
+        gravar = history._gravar_velas
+        chamadas = []
+
+        def _falha_no_segundo_lote(*args, **kwargs):
+            chamadas.append(1)
+            if len(chamadas) == 2:
+                raise RuntimeError("worker caiu")
+            return gravar(*args, **kwargs)
+
+        with mock.patch.object(history, "_gravar_velas", _falha_no_segundo_lote):
+            with self.assertRaises(RuntimeError):
+                history.compactar_precos(self.agora)
+        # o primeiro lote ficou gravado e apagado; o segundo voltou inteiro
+        self.assertEqual(self._velas(PriceCandle.HORA), {datetime(2026, 1, 10, 9): (10, 12, 10, 12, 2)})
+        self.assertEqual(Price.objects.count(), 4)
+
+        history.compactar_precos(self.agora)
+        self._conferir_bruto()
+
+    def test_velas_de_1h_viram_velas_de_1d(self):
+        for hora, ohlc in ((10, (5, 6, 4, 5.5)), (11, (5.5, 9, 5, 8)), (12, (8, 8.5, 3, 7))):
+            PriceCandle.objects.create(item=self.item, site=self.site, granularidade=PriceCandle.HORA,
+                                       inicio=datetime(2026, 1, 7, hora), open=ohlc[0], high=ohlc[1],
+                                       low=ohlc[2], close=ohlc[3], amostras=hora)
+        PriceCandle.objects.create(item=self.item, site=self.site, granularidade=PriceCandle.HORA,
+                                   inicio=datetime(2026, 1, 9, 10), open=1, high=1, low=1, close=1, amostras=1)
+
+        res = history.compactar_precos(self.agora)
+
+        self.assertEqual(self._velas(PriceCandle.DIA), {datetime(2026, 1, 7): (5, 9, 3, 7, 33)})
+        self.assertEqual(list(self._velas(PriceCandle.HORA)), [datetime(2026, 1, 9, 10)])
+        self.assertEqual(res["velas_1h_apagadas"], 3)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                       "LOCATION": "testes-price-cache"}})
+class PriceCacheTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_so_sem_preco_e_cacheado_como_negativo(self):
+        chamadas = []
+
+        def fetcher(nomes):
+            chamadas.append(list(nomes))
+            return {"sem listagem": price_cache.SEM_PRECO, "429": None, "ok": {"steam_lowest": "$1.00"}}
+
+        nomes = ["sem listagem", "429", "ok"]
+        primeiro = price_cache.get_many_cached("steam", nomes, 1, fetcher)
+        self.assertEqual(primeiro, {"sem listagem": None, "429": None, "ok": {"steam_lowest": "$1.00"}})
+
+        segundo = price_cache.get_many_cached("steam", nomes, 1, fetcher)
+        self.assertEqual(segundo, primeiro)
+        self.assertEqual(chamadas, [nomes, ["429"]])  # a falha de transporte é buscada de novo
+
+    def test_falha_num_bloco_solta_os_locks_dos_seguintes(self):
+        from django.core.cache import cache
+
+        def fetcher(nomes):
+            raise RuntimeError("broker caiu")
+
+        nomes = [f"item {i}" for i in range(5)]
+        with override_settings(PRICE_CACHE_FETCH_CHUNK=2), self.assertRaises(RuntimeError):
+            price_cache.get_many_cached("steam", nomes, 1, fetcher)
+        locks = [price_cache._lock_key(price_cache._key("steam", n, 1)) for n in nomes]
+        self.assertEqual(cache.get_many(locks), {})
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def monotonic(self):
+        return self.agora
+
+
+class TokenBucketLocalTests(SimpleTestCase):
+    def setUp(self):
+        self.relogio = _Relogio()
+        patcher = mock.patch.object(ratelimit, "time", self.relogio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_e_depois_espera_de_um_token(self):
+        balde = ratelimit._LocalBucket(rate=2, burst=3, min_factor=0.1, recover=0.01)
+        self.assertEqual([balde.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(balde.reserve(), 0.5)
+        self.assertAlmostEqual(balde.reserve(), 1.0)  # reservas se acumulam na fila
+        self.relogio.agora += 10
+        self.assertEqual(balde.reserve(), 0.0)  # reabastece até o burst
+
+    def test_429_bloqueia_e_corta_a_taxa(self):
+        balde = ratelimit._LocalBucket(rate=2, burst=1, min_factor=0.1, recover=0.01)
+        balde.penalize(5)
+        self.assertEqual(balde.factor, 0.5)
+        self.assertAlmostEqual(balde.reserve(), 6.0)  # 5s de bloqueio + 1 token a 1/s
+        balde.penalize(0)
+        balde.penalize(0)
+        balde.penalize(0)
+        self.assertEqual(balde.factor, 0.1)  # nunca abaixo de min_factor
+
+    def test_sem_redis_cai_para_o_balde_local(self):
+        balde = ratelimit.TokenBucket("teste", rate=1, burst=1)
+        with mock.patch.object(ratelimit, "get_redis", side_effect=redis.exceptions.ConnectionError("fora")):
+            self.assertEqual(balde.reserve(), 0.0)
+            self.assertAlmostEqual(balde.reserve(), 1.0)
+        self.assertIsNotNone(balde._local)
+
+
+@skipUnless(fakeredis, "fakeredis não instalado")
+class TokenBucketRedisTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ratelimit, "get_redis", return_value=_redis_falso())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_e_depois_espera_de_um_token(self):
+        balde = ratelimit.TokenBucket("teste", rate=1, burst=3)
+        self.assertEqual([balde.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertGreater(balde.reserve(), 0.9)
+
+    def test_429_bloqueia_o_balde_para_todos(self):
+        balde = ratelimit.TokenBucket("teste", rate=10, burst=5)
+        balde.penalize(retry_after=3)
+        outro_processo = ratelimit.TokenBucket("teste", rate=10, burst=5)
+        self.assertGreater(outro_processo.reserve(), 2.9)
+
+
+class LimiterForTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(ratelimit._buckets.clear)
+        ratelimit._buckets.clear()
+
+    def test_um_balde_por_host_mesmo_com_threads_concorrentes(self):
+        vistos = []
+        barreira = threading.Barrier(16)
+
+        def _pegar():
+            barreira.wait()
+            vistos.append(ratelimit.limiter_for("steamcommunity.com"))
+
+        threads = [threading.Thread(target=_pegar) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(b) for b in vistos}), 1)
+        self.assertIsNot(ratelimit.limiter_for("steamcommunity.com", proxy="p1"), vistos[0])
+
+
+
+@skipUnless(fakeredis, "fakeredis não instalado")
+class LeaseLockTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = _redis_falso()
+        patcher = mock.patch.object(locks, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_segundo_dono_nao_pega_o_lock(self):
+        a, b = locks.LeaseLock("conta:1", 60), locks.LeaseLock("conta:1", 60)
+        self.assertTrue(a.acquire())
+        self.assertFalse(b.acquire())
+        self.assertTrue(b.is_locked())
+
+    def test_so_o_dono_libera(self):
+        a, b = locks.LeaseLock("conta:1", 60), locks.LeaseLock("conta:1", 60)
+        a.acquire()
+        b.release()
+        self.assertTrue(a.is_locked())
+        a.release()
+        self.assertFalse(a.is_locked())
+        self.assertTrue(b.acquire())
+
+    def test_so_o_dono_renova(self):
+        a, b = locks.LeaseLock("conta:1", 60), locks.LeaseLock("conta:1", 60)
+        a.acquire()
+        self.redis.expire(a.key, 5)
+        self.assertFalse(b.renew())
+        self.assertLessEqual(self.redis.ttl(a.key), 5)
+        self.assertTrue(a.renew())
+        self.assertGreater(self.redis.ttl(a.key), 5)
+
+    def test_lease_expirado_e_de_outro_dono_nao_e_apagado(self):
+        a, b = locks.LeaseLock("conta:1", 60), locks.LeaseLock("conta:1", 60)
+        a.acquire()
+        self.redis.delete(a.key)  # lease expirou
+        b.acquire()
+        a.release()
+        self.assertEqual(self.redis.get(b.key), b.token)
+        self.assertFalse(a.renew())
+
+    def test_sem_redis_fica_aberto(self):
+        with mock.patch.object(locks, "get_redis", side_effect=redis.exceptions.ConnectionError("fora")):
+            self.assertTrue(locks.LeaseLock("conta:1", 60).acquire())
+            self.assertTrue(locks.marcar_na_fila("conta:1", 60))
+
+    def test_marcar_na_fila_coalesce_ate_limpar(self):
+        self.assertTrue(locks.marcar_na_fila("conta:1", 60))
+        self.assertFalse(locks.marcar_na_fila("conta:1", 60))
+        locks.limpar_na_fila("conta:1")
+        self.assertTrue(locks.marcar_na_fila("conta:1", 60))
+
+
+@skipUnless(fakeredis, "fakeredis não instalado")
+class RefreshGlobalTests(TestCase):
+    def setUp(self):
+        self.redis = _redis_falso()
+        patcher = mock.patch.object(locks, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        conta = Inventory.objects.create(steam_id="1", name="conta")
+        item = Item.objects.create(classid="1", market_hash_name="AK-47 | Redline (Field-Tested)")
+        InventoryItem.objects.create(inventory=conta, item=item, quantity=1)
+
+    def test_falha_no_dispatch_solta_o_lock(self):
+        with mock.patch.object(tasks, "chord", side_effect=ConnectionError("broker fora")):
+            with self.assertRaises(ConnectionError):
+                tasks.atualizar_precos_global()
+        self.assertFalse(locks.LeaseLock("steam:global", 60).is_locked())
+
+    def test_dispatch_ok_mantem_o_lock_ate_recalcular_contas(self):
+        with mock.patch.object(tasks, "chord") as chord:
+            self.assertEqual(tasks.atualizar_precos_global()["status"], "dispatched")
+        self.assertEqual(chord.call_count, 1)
+        self.assertTrue(locks.LeaseLock("steam:global", 60).is_locked())
+
+
+@override_settings(REFRESH_MIN_INTERVAL=300, REFRESH_MAX_INTERVAL=3600, REFRESH_VALUE_REF=10, REFRESH_VOL_WEIGHT=50)
+class AgendaUrgenciaTests(SimpleTestCase):
+    def test_urgencia_cresce_com_valor_e_volatilidade(self):
+        self.assertAlmostEqual(scheduler.calcular_urgencia(10, 0), 1.0)
+        self.assertAlmostEqual(scheduler.calcular_urgencia(40, 0), 2.0)  # raiz do valor
+        self.assertAlmostEqual(scheduler.calcular_urgencia(10, 0.02), 2.0)
+        self.assertGreater(scheduler.calcular_urgencia(0, 0), 0)  # nunca zero: o intervalo não divide por 0
+        self.assertEqual(scheduler.calcular_urgencia(-5, 0), scheduler.calcular_urgencia(0, 0))
+
+    def test_intervalo_fica_entre_o_minimo_e_o_maximo(self):
+        self.assertEqual(scheduler.calcular_intervalo(1.0), 3600)
+        self.assertEqual(scheduler.calcular_intervalo(4.0), 900)
+        self.assertEqual(scheduler.calcular_intervalo(1000.0), 300)
+        self.assertEqual(scheduler.calcular_intervalo(1e-6), 3600)
+
+
+class AgendaReservaTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.now()
+        self.itens = [Item.objects.create(classid=str(i), market_hash_name=f"item {i}") for i in range(4)]
+
+    def _agenda(self, item, urgencia, atraso_s, intervalo=3600):
+        return RefreshSchedule.objects.create(
+            item=item, urgency=urgencia, interval_sec=intervalo,
+            next_refresh_at=self.agora - timedelta(seconds=atraso_s),
+        )
+
+    def test_vencidos_mais_prioritarios_saem_e_sao_reagendados(self):
+        self._agenda(self.itens[0], urgencia=1, atraso_s=60)
+        self._agenda(self.itens[1], urgencia=5, atraso_s=60)
+        self._agenda(self.itens[2], urgencia=1, atraso_s=7200)  # atrasado 2 intervalos: prioridade 3
+        self._agenda(self.itens[3], urgencia=9, atraso_s=-60)   # ainda não venceu
+
+        escolhidos = scheduler.reservar_vencidos(limite=2)
+
+        self.assertEqual(escolhidos, [self.itens[1].id, self.itens[2].id])
+        sched = RefreshSchedule.objects.get(item=self.itens[1])
+        self.assertGreater(sched.next_refresh_at, self.agora + timedelta(seconds=3500))
+        self.assertEqual(scheduler.reservar_vencidos(limite=2), [self.itens[0].id])  # tick seguinte
+
+
+class _Resposta:
+    def __init__(self, corpo, status=200):
+        self.status_code, self.corpo, self.headers = status, corpo, {}
+
+    def json(self):
+        if isinstance(self.corpo, str):
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return self.corpo
+
+
+class BuscaSteamTests(SimpleTestCase):
+    def test_pagina_html_com_200_e_tentada_de_novo(self):
+        sessao = mock.Mock()
+        sessao.get.side_effect = [
+            _Resposta("<html>Access Denied</html>"),
+            _Resposta({"success": True, "total_count": 0, "results": []}),
+        ]
+        with mock.patch.object(steam_search, "limiter_for"):
+            data = steam_search._fetch_search_page(sessao, 0, 100)
+        self.assertEqual(data["success"], True)
+        self.assertEqual(sessao.get.call_count, 2)
+
+
+@override_settings(REDIS_URL="redis://127.0.0.1:1/0")
+class IngestaoTests(TestCase):
+    def setUp(self):
+        self.site = Site.objects.create(name="Steam Market", url="https://steamcommunity.com/market/")
+        self.item = Item.objects.create(classid="1", market_hash_name="AK-47 | Redline (Field-Tested)")
+
+    def test_preco_sem_volume_mantem_o_volume_de_24h(self):
+        with PriceIngestBuffer(self.site) as buf:
+            buf.add(self.item.id, 10.0, volume=87)
+        with PriceIngestBuffer(self.site) as buf:
+            buf.add(self.item.id, 11.0)  # busca: só preço
+        latest = LatestPrice.objects.get(item=self.item, site=self.site)
+        self.assertEqual((latest.price, latest.volume), (11.0, 87))
+
+    def test_volume_informado_substitui(self):
+        with PriceIngestBuffer(self.site) as buf:
+            buf.add(self.item.id, 10.0, volume=87)
+        with PriceIngestBuffer(self.site) as buf:
+            buf.add(self.item.id, 10.5, volume=12)
+        self.assertEqual(LatestPrice.objects.get(item=self.item, site=self.site).volume, 12)
+
+    def test_snapshot_da_conta_so_depois_do_commit(self):
+        conta = Inventory.objects.create(steam_id="1", name="conta")
+        InventoryItem.objects.create(inventory=conta, item=self.item, quantity=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():  # como o _persistir_minimos_csmoney
+                with PriceIngestBuffer(self.site) as buf:
+                    buf.add(self.item.id, 10.0)
+                self.assertFalse(PortfolioSnapshot.objects.filter(inventory=conta).exists())
+        self.assertTrue(PortfolioSnapshot.objects.filter(inventory=conta).exists())
+
+    def test_rollback_descarta_o_snapshot(self):
+        conta = Inventory.objects.create(steam_id="1", name="conta")
+        InventoryItem.objects.create(inventory=conta, item=self.item, quantity=2)
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                with PriceIngestBuffer(self.site) as buf:
+                    buf.add(self.item.id, 10.0)
+                raise RuntimeError("falhou depois do flush")
+        self.assertFalse(PortfolioSnapshot.objects.filter(inventory=conta).exists())
+
+
+@override_settings(REDIS_URL="redis://127.0.0.1:1/0")
+class DashboardItensTests(TestCase):
+    def test_conta_inexistente_da_404(self):
+        resp = self.client.get(reverse("dashboard_itens", args=[999]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_conta_sem_itens(self):
+        conta = Inventory.objects.create(steam_id="1", name="conta")
+        resp = self.client.get(reverse("dashboard_itens", args=[conta.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["itens"], [])
+
+
+@override_settings(
+    SITE_FEES={"default": {"compra": 0.0, "venda": 0.0}, "Venda": {"compra": 0.0, "venda": 0.1}},
+    ARBITRAGE_MIN_SPREAD=0.1, ARBITRAGE_MIN_ROI=0.02, ARBITRAGE_VOLUME_REF=10,
+    ARBITRAGE_PESO_SEM_VOLUME=0.3, ARBITRAGE_MAX_AGE_HOURS=24,
+)
+class ArbitragemTests(TestCase):
+    def setUp(self):
+        self.compra = Site.objects.create(name="Compra", url="https://compra.example")
+        self.venda = Site.objects.create(name="Venda", url="https://venda.example")
+        nan = np.nan
+        self.matriz = {
+            "itens": np.array([1, 2, 3, 4]),
+            "sites": np.array([self.compra.id, self.venda.id]),
+            "preco": np.array([[10.0, 20.0], [10.0, 15.0], [10.0, nan], [10.0, 20.0]]),
+            "volume": np.array([[nan, 10.0], [nan, nan], [nan, nan], [nan, 90.0]]),
+        }
+
+    def test_top_n_ordenado_pelo_roi_ponderado_pela_liquidez(self):
+        top = arbitrage.calcular(self.matriz, top_n=10)
+        # mesmo ROI (0.8) nos itens 0 e 3: o de mais volume vem antes; o item 2 só tem um site
+        self.assertEqual(top["i"].tolist(), [3, 0, 1])
+        self.assertEqual(top["compra"].tolist(), [0, 0, 0])
+        self.assertEqual(top["venda"].tolist(), [1, 1, 1])
+        np.testing.assert_allclose(top["liquido"], [18.0, 18.0, 13.5])
+        np.testing.assert_allclose(top["roi"], [0.8, 0.8, 0.35])
+        np.testing.assert_allclose(top["score"], [0.8 * 0.9, 0.8 * 0.5, 0.35 * 0.3])
+
+    def test_top_n_corta(self):
+        top = arbitrage.calcular(self.matriz, top_n=2)
+        self.assertEqual(top["i"].tolist(), [3, 0])
+
+    @override_settings(ARBITRAGE_MIN_ROI=0.5)
+    def test_roi_minimo(self):
+        top = arbitrage.calcular(self.matriz, top_n=10)
+        self.assertEqual(top["i"].tolist(), [3, 0])
+
+    def test_rodada_ignora_preco_velho(self):
+        agora = timezone.now()
+        novo = Item.objects.create(classid="1", market_hash_name="Novo")
+        velho = Item.objects.create(classid="2", market_hash_name="Velho")
+        for item, quando in ((novo, agora), (velho, agora - timedelta(hours=25))):
+            LatestPrice.objects.create(item=item, site=self.compra, price=10.0, timestamp=quando)
+            LatestPrice.objects.create(item=item, site=self.venda, price=20.0, timestamp=quando, volume=5)
+
+        res = arbitrage.calcular_arbitragem(agora)
+
+        self.assertEqual((res["itens"], res["oportunidades"]), (1, 1))
+        op = ArbitrageOpportunity.objects.get()
+        self.assertEqual((op.item, op.site_compra, op.site_venda, op.volume), (novo, self.compra, self.venda, 5))
+        self.assertAlmostEqual(op.liquido, 18.0)
+
+
+class CassetteTests(SimpleTestCase):
+    URL = "https://steamcommunity.com/market/priceoverview/"
+
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta)
+        ajuste = override_settings(HTTP_CASSETTE_DIR=pasta, HTTP_TRANSPORT_MODE=transport.REPLAY)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_chave_ignora_anti_cache_e_ordem(self):
+        a = transport.url_canonica(f"{self.URL}?market_hash_name=AK&appid=730&_=1")
+        b = transport.url_canonica(self.URL, {"appid": 730, "market_hash_name": "AK", "_": "2"})
+        self.assertEqual(a, b)
+        self.assertEqual(transport._arquivo("get", a), transport._arquivo("GET", b))
+
+    def test_chave_distingue_consulta_e_metodo(self):
+        a = transport.url_canonica(self.URL, {"appid": 730, "market_hash_name": "AK"})
+        b = transport.url_canonica(self.URL, {"appid": 730, "market_hash_name": "M4"})
+        self.assertNotEqual(transport._arquivo("GET", a), transport._arquivo("GET", b))
+        self.assertNotEqual(transport._arquivo("GET", a), transport._arquivo("POST", a))
+
+    def test_replay_responde_a_gravacao(self):
+        url = transport.url_canonica(self.URL, {"appid": 730, "market_hash_name": "AK"})
+        transport._gravar("GET", url, 200, "OK", {"Content-Type": "application/json", "Set-Cookie": "x"}, b'{"ok": 1}')
+
+        resp = transport.sessao().get(self.URL, params={"market_hash_name": "AK", "appid": 730, "_": "9"})
+        self.assertEqual((resp.status_code, resp.json()), (200, {"ok": 1}))
+        self.assertNotIn("Set-Cookie", resp.headers)
+
+        async def via_aiohttp():
+            sessao = transport.sessao_async()
+            try:
+                async with sessao.get(self.URL, params={"appid": "730", "market_hash_name": "AK"}) as r:
+                    return r.status, await r.json()
+            finally:
+                await sessao.close()
+
+        self.assertEqual(asyncio.run(via_aiohttp()), (200, {"ok": 1}))
+
+    def test_replay_sem_gravacao_e_erro_de_conexao(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.sessao().get(self.URL, params={"market_hash_name": "nada"})
+
+
+class ComparacaoBenchmarkTests(SimpleTestCase):
+    @staticmethod
+    def _relatorio(wall_ms, queries):
+        return {"cenarios": {"dashboard": {"frio": {"wall_ms": wall_ms, "queries": queries}}}}
+
+    def _linhas(self, atual, baseline, **kwargs):
+        return {d["metrica"]: d for d in benchmark.comparar(atual, baseline, **kwargs)}
+
+    def test_tolerancia_relativa(self):
+        linhas = self._linhas(self._relatorio(115, 4), self._relatorio(100, 4), tolerancia=0.2)
+        self.assertEqual(linhas["wall_ms"]["delta"], 0.15)
+        self.assertFalse(linhas["wall_ms"]["regressao"])
+        self.assertFalse(linhas["queries"]["regressao"])
+
+    def test_qualquer_query_a_mais_e_regressao(self):
+        linhas = self._linhas(self._relatorio(100, 5), self._relatorio(100, 4))
+        self.assertTrue(linhas["queries"]["regressao"])
+
+    def test_baseline_zero(self):
+        linhas = self._linhas(self._relatorio(100, 3), self._relatorio(100, 0))
+        self.assertIsNone(linhas["queries"]["delta"])
+        self.assertTrue(linhas["queries"]["regressao"])
+
+        linhas = self._linhas(self._relatorio(100, 0), self._relatorio(100, 0))
+        self.assertEqual(linhas["queries"]["delta"], 0.0)
+        self.assertFalse(linhas["queries"]["regressao"])
+
+
+@skipUnless(fakeredis, "fakeredis não instalado")
+@override_settings(METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL=0)
+class MetricasFlushTests(SimpleTestCase):
+    def setUp(self):
+        self.r = _redis_falso()
+        ajuste = mock.patch.object(metrics, "get_redis", return_value=self.r)
+        ajuste.start()
+        self.addCleanup(ajuste.stop)
+        metrics.flush(forcar=True)  # sobras de outros testes
+        self.r.delete(metrics._HASH)
+
+    def _total(self, nome):
+        return float(self.r.hget(metrics._HASH, f"{nome}{metrics._SEP}{metrics._SEP}") or 0)
+
+    def test_flush_envia_so_a_diferenca(self):
+        metrics.contar("arb_upstream_429_total", 2)
+        metrics.flush(forcar=True)
+        metrics.flush(forcar=True)
+        metrics.contar("arb_upstream_429_total", 3)
+        metrics.flush(forcar=True)
+        self.assertEqual(self._total("arb_upstream_429_total"), 5)
+
+    def test_flush_concorrente_nao_perde_incrementos(self):
+        threads, vezes = 4, 20000
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # força trocas de thread no meio do _somar
+        self.addCleanup(sys.setswitchinterval, intervalo)
+        parar = threading.Event()
+
+        def escrever():
+            for _ in range(vezes):
+                metrics.contar("arb_upstream_429_total")
+
+        def descarregar():
+            while not parar.is_set():
+                metrics.flush(forcar=True)
+
+        flusher = threading.Thread(target=descarregar)
+        flusher.start()
+        escritores = [threading.Thread(target=escrever) for _ in range(threads)]
+        for t in escritores:
+            t.start()
+        for t in escritores:
+            t.join()
+        parar.set()
+        flusher.join()
+        metrics.flush(forcar=True)
+
+        self.assertEqual(self._total("arb_upstream_429_total"), threads * vezes)
+        self.assertFalse(any(b.thread in escritores for b in metrics._buffers))
+
+
+@override_settings(DEBUG=False, METRICS_TOKEN="")
+class MetricsViewTests(SimpleTestCase):
+    def setUp(self):
+        ajuste = mock.patch.object(metrics, "exposicao", return_value="# ok\n")
+        ajuste.start()
+        self.addCleanup(ajuste.stop)
+
+    def _status(self, user=None, **headers):
+        request = RequestFactory().get("/metrics/", headers=headers)
+        request.user = user or AnonymousUser()
+        return metrics.metrics_view(request).status_code
+
+    def test_sem_token_fechado_para_anonimo(self):
+        self.assertEqual(self._status(), 403)
+        self.assertEqual(self._status(User(username="staff", is_staff=True)), 200)
+
+    @override_settings(DEBUG=True)
+    def test_sem_token_aberto_em_debug(self):
+        self.assertEqual(self._status(), 200)
+
+    @override_settings(METRICS_TOKEN="segredo")
+    def test_com_token_exige_bearer(self):
+        self.assertEqual(self._status(authorization="Bearer segredo"), 200)
+        self.assertEqual(self._status(authorization="Bearer outro"), 403)
+        self.assertEqual(self._status(User(username="staff", is_staff=True)), 403)
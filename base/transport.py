@@ -0,0 +1,225 @@
+# base/transport.py
+"""
+Camada de transporte HTTP dos conectores de mercado.
+
+HTTP_TRANSPORT_MODE:
+- "live"   (padrão): requisições normais;
+- "record": requisições normais, e cada resposta é gravada em HTTP_CASSETTE_DIR;
+- "replay": nada sai para a rede; as respostas vêm das gravações (sem
+  gravação para a requisição = erro de conexão, como uma queda de rede).
+
+A chave de uma gravação é método + URL canônica (parâmetros ordenados, sem os
+de HTTP_REPLAY_IGNORE_PARAMS, ex.: o "_" anti-cache do priceoverview), então a
+mesma consulta feita por requests, cloudscraper ou aiohttp cai no mesmo arquivo.
+
+Uso:
+- requests/cloudscraper: `sessao()` ou `montar(scraper)` (HTTPAdapter próprio);
+- aiohttp: `sessao_async(**kwargs)` no lugar de aiohttp.ClientSession(**kwargs).
+
+Para apontar os conectores para os stubs locais (base/stubs.py) use as URLs
+base STEAM_BASE_URL / CSMONEY_BASE_URL / CSFLOAT_BASE_URL.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+import requests
+from django.conf import settings
+from multidict import CIMultiDict, CIMultiDictProxy
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from yarl import URL
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# cabeçalhos que não fazem sentido num corpo já decodificado
+_HEADERS_DESCARTADOS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+def modo() -> str:
+    return settings.HTTP_TRANSPORT_MODE
+
+
+def url_canonica(url: str, params=None) -> str:
+    partes = urlsplit(url)
+    pares = parse_qsl(partes.query, keep_blank_values=True)
+    if params:
+        pares += [(str(k), str(v)) for k, v in (params.items() if isinstance(params, dict) else params)]
+    ignorar = set(settings.HTTP_REPLAY_IGNORE_PARAMS)
+    query = urlencode(sorted((k, v) for k, v in pares if k not in ignorar))
+    return urlunsplit((partes.scheme, partes.netloc, partes.path, query, ""))
+
+
+def _arquivo(metodo: str, url: str) -> str:
+    chave = hashlib.sha1(f"{metodo.upper()} {url}".encode()).hexdigest()
+    return os.path.join(settings.HTTP_CASSETTE_DIR, chave[:2], f"{chave}.json")
+
+
+def _ler(metodo: str, url: str) -> Optional[dict]:
+    try:
+        with open(_arquivo(metodo, url), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _gravar(metodo: str, url: str, status: int, reason: str, headers, corpo: bytes) -> None:
+    caminho = _arquivo(metodo, url)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    registro = {
+        "method": metodo.upper(),
+        "url": url,
+        "status": status,
+        "reason": reason,
+        "headers": {k: v for k, v in headers.items() if k.lower() not in _HEADERS_DESCARTADOS},
+        "body": corpo.decode("utf-8", errors="replace"),
+    }
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registro, f, ensure_ascii=False)
+    os.replace(tmp, caminho)  # leitor concorrente nunca vê arquivo pela metade
+
+
+# ---- requests / cloudscraper ----
+
+class TransporteAdapter(HTTPAdapter):
+    """HTTPAdapter que grava (record) ou responde das gravações (replay)."""
+
+    def __init__(self, modo_transporte: str, **kwargs):
+        self.modo = modo_transporte
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = url_canonica(request.url)
+        if self.modo == REPLAY:
+            gravado = _ler(request.method, url)
+            if gravado is None:
+                raise requests.exceptions.ConnectionError(f"replay: sem gravação para {request.method} {url}", request=request)
+            return self._resposta(request, gravado)
+
+        resp = super().send(request, **kwargs)
+        if self.modo == RECORD:
+            _gravar(request.method, url, resp.status_code, resp.reason or "", resp.headers, resp.content)
+        return resp
+
+    @staticmethod
+    def _resposta(request, gravado: dict) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = gravado["status"]
+        resp.reason = gravado.get("reason") or ""
+        resp.headers = CaseInsensitiveDict(gravado["headers"])
+        resp._content = gravado["body"].encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+
+def montar(session: requests.Session) -> requests.Session:
+    """
+    Instala o adapter de gravação/replay numa sessão existente (ex.: cloudscraper)
+    e, fora do replay, o hook de métricas de HTTP de saída (base/metrics.py).
+    """
+    if modo() != REPLAY and metrics.hook_requests not in session.hooks["response"]:
+        session.hooks["response"].append(metrics.hook_requests)
+    if modo() != LIVE:
+        adapter = TransporteAdapter(modo())
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+
+def sessao() -> requests.Session:
+    return montar(requests.Session())
+
+
+# ---- aiohttp ----
+
+class _RespostaGravada:
+    """O subconjunto de aiohttp.ClientResponse que os motores assíncronos usam."""
+
+    def __init__(self, url: str, gravado: dict):
+        self.url = URL(url)
+        self.status = gravado["status"]
+        self.reason = gravado.get("reason") or ""
+        self.headers = CIMultiDictProxy(CIMultiDict(gravado["headers"]))
+        self._corpo = gravado["body"]
+
+    async def text(self, *args, **kwargs) -> str:
+        return self._corpo
+
+    async def json(self, *args, **kwargs):
+        return json.loads(self._corpo)
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            info = aiohttp.RequestInfo(self.url, "GET", CIMultiDictProxy(CIMultiDict()), self.url)
+            raise aiohttp.ClientResponseError(info, (), status=self.status, message=self.reason, headers=self.headers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Requisicao:
+    def __init__(self, sessao: "_SessaoAsyncGravada", url: str, params):
+        self.sessao = sessao
+        self.url = url_canonica(str(url), params)
+        self.url_original, self.params = url, params
+
+    async def __aenter__(self) -> _RespostaGravada:
+        if self.sessao.real is None:  # replay
+            gravado = _ler("GET", self.url)
+            if gravado is None:
+                raise aiohttp.ClientConnectionError(f"replay: sem gravação para GET {self.url}")
+            return _RespostaGravada(self.url, gravado)
+        async with self.sessao.real.get(self.url_original, params=self.params) as resp:
+            corpo = await resp.read()
+            _gravar("GET", self.url, resp.status, resp.reason or "", resp.headers, corpo)
+            return _RespostaGravada(self.url, {
+                "status": resp.status, "reason": resp.reason, "headers": dict(resp.headers),
+                "body": corpo.decode("utf-8", errors="replace"),
+            })
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _SessaoAsyncGravada:
+    def __init__(self, real: Optional[aiohttp.ClientSession], connector=None):
+        self.real = real
+        self._connector = connector
+
+    def get(self, url, params=None, **kwargs) -> _Requisicao:
+        return _Requisicao(self, url, params)
+
+    async def close(self) -> None:
+        if self.real is not None:
+            await self.real.close()
+        elif self._connector is not None:
+            await self._connector.close()
+
+
+def sessao_async(**kwargs):
+    """aiohttp.ClientSession no modo live; no record/replay, um envoltório com a mesma interface de GET."""
+    if modo() != REPLAY:
+        kwargs["trace_configs"] = [*kwargs.get("trace_configs", ()), metrics.trace_aiohttp()]
+    if modo() == LIVE:
+        return aiohttp.ClientSession(**kwargs)
+    if modo() == RECORD:
+        return _SessaoAsyncGravada(aiohttp.ClientSession(**kwargs))
+    return _SessaoAsyncGravada(None, kwargs.get("connector"))
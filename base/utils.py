@@ -1,17 +1,22 @@
 import datetime
+import hashlib
 import random
 from typing import Optional, Dict, Any, List, Tuple
 from django.utils import timezone
 import requests
-from .models import Item, Inventory, InventoryItem, Price, Site
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from .models import Item, Inventory, InventoryItem, LatestPrice, Price, Site
 import time
 import logging
 from decimal import Decimal
-from django.db.models import OuterRef, Subquery, Sum, F, FloatField, ExpressionWrapper
+from django.db.models import Count, OuterRef, Subquery, Sum, F, FloatField, ExpressionWrapper
 from .models import Price
 from django.db import transaction
-from collections import Counter, defaultdict, deque
+from django.conf import settings
+from collections import Counter, defaultdict
+from . import portfolio, transport
+from .ingest import PriceIngestBuffer, POLITICA_CAIU, POLITICA_MUDOU, POLITICA_SEMPRE
+from .ratelimit import limiter_for
+from .price_cache import get_steam_prices
 import cloudscraper
 
 
@@ -46,129 +51,282 @@ def _icon_url_from_desc(desc: dict) -> str | None:
     ico = desc.get("icon_url") or desc.get("icon_url_large")
     return f"{IMG_BASE}{ico}" if ico else None
 
-def _fetch_inventory(steam_id: str, count: int = 1000) -> dict:
-    """Busca o inventário paginando se necessário."""
-    base = f"https://steamcommunity.com/inventory/{steam_id}/730/2"
+def _metadados_item(classid: str, desc: dict) -> Tuple[str, str | None, str | None]:
+    """(market_hash_name, type, icon_url) do Item a partir da description da Steam."""
+    return desc.get("market_hash_name") or classid, desc.get("type"), _icon_url_from_desc(desc)
+
+def _iter_inventory_pages(steam_id: str, count: int = 1000):
+    """Gera as páginas cruas do inventário (a Steam devolve os assets mais novos primeiro)."""
+    base = f"{settings.STEAM_BASE_URL}/inventory/{steam_id}/730/2"
     headers = {"User-Agent": "Mozilla/5.0"}
+    bucket = limiter_for("steamcommunity.com")
+
+    params = {"l": "english", "count": str(count)}
+    with transport.sessao() as s:
+        while True:
+            bucket.acquire()
+            r = s.get(base, params=params, headers=headers, timeout=20)
+            r.raise_for_status()
+            data = r.json()
+            yield data
+            if data.get("more_items") and data.get("last_assetid"):
+                params["start_assetid"] = data["last_assetid"]
+            else:
+                break
 
+def _fetch_inventory(steam_id: str, count: int = 1000, pages=None) -> dict:
+    """Busca o inventário paginando se necessário ('pages' reaproveita páginas já baixadas)."""
     all_assets = []
     all_descs  = []
-    params = {"l": "english", "count": str(count)}
-    while True:
-        r = requests.get(base, params=params, headers=headers, timeout=20)
-        r.raise_for_status()
-        data = r.json()
+    for data in (pages if pages is not None else _iter_inventory_pages(steam_id, count)):
         all_assets.extend(data.get("assets") or [])
         all_descs.extend(data.get("descriptions") or [])
-        if data.get("more_items") and data.get("last_assetid"):
-            params["start_assetid"] = data["last_assetid"]
-        else:
-            break
     return {"assets": all_assets, "descriptions": all_descs}
 
-@transaction.atomic
-def importar_inventario(steam_id: str, inventory_obj: Inventory) -> dict:
+def _fingerprint_inventario(assets: List[dict], descriptions: List[dict], *extras) -> str:
     """
-    Importa e AGREGA o inventário da Steam para 'inventory_obj'.
-    - quantity é a contagem de assets por classid
-    - mantém 1 linha de InventoryItem por (inventory,item)
+    Hash dos (assetid, amount) ordenados e, por classid, do tradable e dos
+    metadados do Item (nome, tipo, ícone), mais campos extras da página. A
+    description entra porque o fim de um trade hold ou um ícone novo mudam só
+    ela: os assetids continuam os mesmos.
     """
-    payload = _fetch_inventory(steam_id, count=1000)
+    h = hashlib.sha1()
+    for extra in extras:
+        h.update(f"{extra}|".encode())
+    for assetid, amount in sorted((str(a.get("assetid", "")), str(a.get("amount", "1"))) for a in assets):
+        h.update(f"{assetid}:{amount};".encode())
+    # repr: tipo/ícone podem ser None, o que não ordena junto com str
+    descs = {
+        repr((str(d.get("classid", "")), bool(d.get("tradable", 0)), _metadados_item(str(d.get("classid", "")), d)))
+        for d in descriptions
+    }
+    for desc in sorted(descs):
+        h.update(f"{desc};".encode())
+    return h.hexdigest()
+
+def _agregar_inventario(payload: dict) -> Tuple[Counter, Dict[str, dict]]:
+    """(quantidade por classid, uma description representativa por classid)."""
     assets = payload.get("assets") or []
     descs  = payload.get("descriptions") or []
 
-    # 1) Contar quantas vezes cada classid aparece (cada asset vem com amount "1")
+    # Contar quantas vezes cada classid aparece (cada asset vem com amount "1")
     counts = Counter(
         a["classid"]
         for a in assets
         if a.get("appid") == 730 and a.get("contextid") == "2" and a.get("classid")
     )
 
-    # 2) Uma description representativa por classid
     desc_by_classid: Dict[str, dict] = {}
     for d in descs:
         cid = d.get("classid")
         if cid and cid not in desc_by_classid:
             desc_by_classid[cid] = d
+    return counts, desc_by_classid
 
-    # 3) Indexar InventoryItem existentes (para atualizar/remover)
-    existentes = {
-        ii.item_id: ii
-        for ii in InventoryItem.objects.select_for_update().filter(inventory=inventory_obj)
+
+def _gravar_inventario(inventory_obj: Inventory, counts: Counter, desc_by_classid: Dict[str, dict]) -> Tuple[int, int]:
+    """
+    Grava só a diferença para o que já está no banco, com um upsert por tabela:
+    Items novos ou cujos metadados (nome, tipo, ícone) mudaram na description
+    (por classid) -> 1 SELECT de ids -> InventoryItems cuja quantity/tradable
+    mudou (por conta+item) -> 1 DELETE do que saiu.
+    Devolve (removidos, alterados).
+    """
+    atuais = {}
+    meta_atual = {}
+    for classid, item_id, qty, tradable, *meta in (
+        InventoryItem.objects
+        .filter(inventory=inventory_obj)
+        .values_list("item__classid", "item_id", "quantity", "tradable",
+                     "item__market_hash_name", "item__type", "item__icon_url")
+    ):
+        atuais[classid] = (item_id, qty, tradable)
+        meta_atual[classid] = tuple(meta)
+
+    def _tradable(classid):
+        return bool(desc_by_classid.get(classid, {}).get("tradable", 0))
+
+    meta_mudou = [
+        classid for classid in counts
+        if classid in meta_atual and classid in desc_by_classid
+        and meta_atual[classid] != _metadados_item(classid, desc_by_classid[classid])
+    ]
+
+    mudaram = {
+        classid: qty
+        for classid, qty in counts.items()
+        if classid not in atuais or atuais[classid][1:] != (qty, _tradable(classid))
     }
-    vistos = set()
-
-    # 4) Upsert por classid -> Item -> InventoryItem.quantity
-    for classid, qty in counts.items():
-        d = desc_by_classid.get(classid, {})
-        market_hash_name = d.get("market_hash_name") or classid
-        type_ = d.get("type")
-        icon_url = _icon_url_from_desc(d)
-        tradable = bool(d.get("tradable", 0))
-
-        # Item (UNIQUE por classid)
-        item, _ = Item.objects.update_or_create(
-            classid=classid,
-            defaults={
-                "market_hash_name": market_hash_name,
-                "type": type_,
-                "icon_url": icon_url,
-            },
-        )
+    novos = [classid for classid in mudaram if classid not in atuais]
+    saiu = [item_id for classid, (item_id, _q, _t) in atuais.items() if classid not in counts]
 
-        # InventoryItem (um por conta+item), quantity agregada
-        ii = existentes.get(item.id)
-        if ii:
-            fields = []
-            if ii.quantity != qty:
-                ii.quantity = qty
-                fields.append("quantity")
-            if ii.tradable != tradable:
-                ii.tradable = tradable
-                fields.append("tradable")
-            if fields:
-                ii.save(update_fields=fields)
-        else:
-            # asset_id é irrelevante para empilháveis; pode deixar vazio ou usar qualquer asset como referência
-            InventoryItem.objects.create(
-                inventory=inventory_obj,
-                item=item,
-                asset_id="",
-                tradable=tradable,
-                quantity=qty,
+    itens = []
+    for classid in [*novos, *meta_mudou]:
+        nome, tipo, icone = _metadados_item(classid, desc_by_classid.get(classid, {}))
+        itens.append(Item(classid=classid, market_hash_name=nome, type=tipo, icon_url=icone))
+
+    with transaction.atomic():
+        ids = {classid: item_id for classid, (item_id, _q, _t) in atuais.items()}
+        if itens:
+            # Item (UNIQUE por classid)
+            Item.objects.bulk_create(
+                itens,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["classid"],
+                update_fields=["market_hash_name", "type", "icon_url"],
+            )
+            ids.update(Item.objects.filter(classid__in=novos).values_list("classid", "id"))
+
+        if mudaram:
+            # InventoryItem (um por conta+item), quantity agregada;
+            # asset_id é irrelevante para empilháveis e price_usd é preservado
+            InventoryItem.objects.bulk_create(
+                [
+                    InventoryItem(
+                        inventory=inventory_obj,
+                        item_id=ids[classid],
+                        asset_id="",
+                        tradable=_tradable(classid),
+                        quantity=qty,
+                    )
+                    for classid, qty in mudaram.items()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["inventory", "item"],
+                update_fields=["quantity", "tradable"],
             )
-        vistos.add(item.id)
 
-    # 5) Remover o que saiu do inventário
-    removidos = InventoryItem.objects.filter(inventory=inventory_obj).exclude(item_id__in=vistos).delete()[0]
+        # Remover o que saiu do inventário
+        removidos = 0
+        if saiu:
+            removidos = InventoryItem.objects.filter(inventory=inventory_obj, item_id__in=saiu).delete()[0]
+
+        inventory_obj.updated_at = timezone.now()
+        inventory_obj.save(update_fields=["updated_at"])
+
+    if mudaram or removidos:
+        portfolio.preencher_precos_faltantes(inventory_obj.id)
+        portfolio.calcular_snapshot(inventory_obj.id)
+    return removidos, len(mudaram)
+
+
+def _resumo_inventario(inventory_obj: Inventory, status: str) -> dict:
+    """Resumo do que já está no banco (quando a sincronização não baixou/gravou nada)."""
+    agg = inventory_obj.items.aggregate(total=Sum("quantity"), distintos=Count("id"))
+    return {
+        "itens_total": agg["total"] or 0,
+        "itens_distintos": agg["distintos"],
+        "removidos": 0,
+        "alterados": 0,
+        "status": status,
+    }
+
+
+def _sync_recente(inventory_obj: Inventory, force: bool = False) -> bool:
+    """Sincronizou há menos de INVENTORY_MIN_RESYNC_SECONDS (não precisa nem consultar a Steam)."""
+    return (
+        not force
+        and inventory_obj.synced_at is not None
+        and (timezone.now() - inventory_obj.synced_at).total_seconds() < settings.INVENTORY_MIN_RESYNC_SECONDS
+    )
+
+
+def _fingerprint_primeira_pagina(primeira: dict) -> str:
+    return _fingerprint_inventario(
+        primeira.get("assets") or [],
+        primeira.get("descriptions") or [],
+        primeira.get("total_inventory_count"),
+        primeira.get("last_assetid"),
+    )
+
+
+def _primeira_pagina_inalterada(inventory_obj: Inventory, primeira: dict, force: bool = False) -> bool:
+    """Atalho: a 1ª página (mais novos primeiro) e o total batem com o último import."""
+    return not force and _fingerprint_primeira_pagina(primeira) == inventory_obj.first_page_fingerprint
 
-    # 6) Atualizar timestamp da conta
-    inventory_obj.updated_at = timezone.now()
-    inventory_obj.save(update_fields=["updated_at"])
+
+def _marcar_inalterado(inventory_obj: Inventory) -> dict:
+    inventory_obj.synced_at = timezone.now()
+    inventory_obj.save(update_fields=["synced_at"])
+    return _resumo_inventario(inventory_obj, "inalterado")
+
+
+def _aplicar_inventario(inventory_obj: Inventory, paginas: List[dict], force: bool = False) -> dict:
+    """Agrega as páginas baixadas e grava só o que mudou (ou nada, se o fingerprint bater)."""
+    agora = timezone.now()
+    primeira = paginas[0]
+    payload = _fetch_inventory(inventory_obj.steam_id, pages=paginas)
+    fingerprint = _fingerprint_inventario(payload["assets"], payload["descriptions"])
+    counts, desc_by_classid = _agregar_inventario(payload)
+
+    if not force and fingerprint == inventory_obj.inventory_fingerprint:
+        removidos, alterados, status = 0, 0, "inalterado"
+    else:
+        removidos, alterados = _gravar_inventario(inventory_obj, counts, desc_by_classid)
+        status = "atualizado"
+
+    # fingerprints só depois dos dados: se a gravação falhar, o próximo sync refaz
+    inventory_obj.inventory_fingerprint = fingerprint
+    inventory_obj.first_page_fingerprint = _fingerprint_primeira_pagina(primeira)
+    inventory_obj.last_assetid = primeira.get("last_assetid") or ""
+    inventory_obj.synced_at = agora
+    inventory_obj.save(update_fields=["inventory_fingerprint", "first_page_fingerprint", "last_assetid", "synced_at"])
 
     return {
         "itens_total": sum(counts.values()),
         "itens_distintos": len(counts),
         "removidos": removidos,
+        "alterados": alterados,
+        "status": status,
     }
 
 
-def atualizar_precos_batch(item_names, max_workers=1):
+def importar_inventario(steam_id: str, inventory_obj: Inventory, force: bool = False) -> dict:
+    """
+    Importa e AGREGA o inventário da Steam para 'inventory_obj'.
+    - quantity é a contagem de assets por classid
+    - mantém 1 linha de InventoryItem por (inventory,item)
+    O download fica fora da transação; a gravação é uma query por tabela.
+
+    Sincronização incremental (force=True ignora os três atalhos):
+    - "recente": sincronizou há menos de INVENTORY_MIN_RESYNC_SECONDS, nem consulta a Steam;
+    - "inalterado": a 1ª página (mais novos primeiro) e o total batem com o último
+      import, ou o fingerprint completo bate; nada é gravado;
+    - senão grava só os classids cuja contagem mudou.
+    Para várias contas em paralelo, ver base/inventory_async.py.
+    """
+    if _sync_recente(inventory_obj, force):
+        return _resumo_inventario(inventory_obj, "recente")
+
+    paginas = _iter_inventory_pages(steam_id, count=1000)
+    primeira = next(paginas)
+    if _primeira_pagina_inalterada(inventory_obj, primeira, force):
+        paginas.close()
+        return _marcar_inalterado(inventory_obj)
+
+    return _aplicar_inventario(inventory_obj, [primeira, *paginas], force)
+
+
+def latest_price_subquery(campo: str = "price") -> Subquery:
+    """Subquery do preço atual (qualquer site) para anotar querysets com FK 'item'."""
+    return Subquery(
+        LatestPrice.objects
+        .filter(item=OuterRef("item"))
+        .order_by("-timestamp")
+        .values(campo)[:1]
+    )
+
+
+def atualizar_precos_batch(item_names, max_workers=None):
     """
-    Processa em série (1 worker), respeitando o delay de cada request.
-    Pode aumentar max_workers se quiser um pouco de concorrência.
+    Busca os preços de todos os nomes pelo motor assíncrono (steam_async):
+    conexões reaproveitadas e um único orçamento de req/s para o lote inteiro.
+    Nomes ainda frescos no cache compartilhado não geram requisição.
+    max_workers limita as requisições simultâneas (default: STEAM_MAX_IN_FLIGHT).
     """
-    results = {}
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_item = {executor.submit(get_steam_price, name): name for name in item_names}
-        for future in as_completed(future_to_item):
-            item_name = future_to_item[future]
-            try:
-                results[item_name] = future.result()
-            except Exception as e:
-                logger.error(f"[ERRO] Batch falhou em {item_name}: {e}")
-                results[item_name] = None
-    return results
+    return get_steam_prices(item_names, max_in_flight=max_workers)
 
 
 def atualizar_precos_steam(inventory_obj):
@@ -177,28 +335,25 @@ def atualizar_precos_steam(inventory_obj):
         defaults={"url": "https://steamcommunity.com/market/"}
     )
 
-    item_names = [inv_item.item.market_hash_name for inv_item in inventory_obj.items.all()]
+    inv_items = list(inventory_obj.items.select_related("item"))
+    item_names = [inv_item.item.market_hash_name for inv_item in inv_items]
     resultados = atualizar_precos_batch(item_names, max_workers=10)
 
-    for inv_item in inventory_obj.items.all():
-        result = resultados.get(inv_item.item.market_hash_name)
+    politica = POLITICA_MUDOU if settings.STEAM_PRICE_ONLY_CHANGES else POLITICA_SEMPRE
+    with PriceIngestBuffer(site, politica=politica) as buf:
+        for inv_item in inv_items:
+            result = resultados.get(inv_item.item.market_hash_name)
+            log.debug("[STEAM] %s → %s", inv_item.item.market_hash_name, result)
 
-        # Debug pra ver exatamente o que voltou
-        print(f"[DEBUG] {inv_item.item.market_hash_name} → {result}")
-
-        if result and result.get("lowest_price"):
-            try:
-                preco = to_float(result.get("lowest_price"))
-                if preco:
-                    Price.objects.create(
-                        item=inv_item.item,
-                        site=site,
-                        price=preco,
-                        timestamp=timezone.now()
-                    )
-            except Exception as e:
-                print(f"[ERRO] {inv_item.item.market_hash_name} falhou: {e}")
-                continue
+            raw = result and (result.get("steam_lowest") or result.get("lowest_price"))
+            if raw:
+                try:
+                    preco = to_float(raw)
+                    if preco:
+                        buf.add(inv_item.item_id, preco)
+                except Exception as e:
+                    log.warning("[ERRO] %s falhou: %s", inv_item.item.market_hash_name, e)
+                    continue
 
 def to_float(price_str):
     if not price_str:
@@ -245,13 +400,14 @@ def get_steam_price(
     - delay: atraso base (aplica backoff exponencial com jitter)
     Retorna dict com chaves: steam_lowest, steam_median, steam_volume; ou None.
     """
-    url = "https://steamcommunity.com/market/priceoverview/"
+    url = f"{settings.STEAM_BASE_URL}/market/priceoverview/"
 
-    # Jitter inicial antes da 1ª requisição
-    time.sleep(random.uniform(0.8, 2.4))
+    # orçamento compartilhado entre todos os workers (substitui o jitter por processo)
+    bucket = limiter_for("steamcommunity.com")
 
-    with requests.Session() as s:
+    with transport.sessao() as s:
         for attempt in range(retries):
+            bucket.acquire()
             params = {
                 "currency": currency,
                 "appid": 730,
@@ -275,11 +431,11 @@ def get_steam_price(
                             wait = delay * (2 ** attempt)
                     else:
                         wait = delay * (2 ** attempt)
-                    wait += random.uniform(0.5, 2.0)
                     wait = min(wait, 60)  # cap
                     logger.warning("[RATE] 429 para %s (tentativa %s/%s). Aguardando %.1fs",
                                    market_hash_name, attempt + 1, retries, wait)
-                    time.sleep(wait)
+                    # bloqueia o balde para todos os processos; o próximo acquire() espera
+                    bucket.penalize(wait)
                     continue
 
                 resp.raise_for_status()
@@ -309,11 +465,7 @@ def get_steam_price(
     return None
 
 def calcular_valor_total_bruto(conta) -> Decimal:
-    latest_price_sq = (
-        Price.objects.filter(item=OuterRef("item"))
-        .order_by("-timestamp").values("price")[:1]
-    )
-    qs = conta.items.annotate(preco=Subquery(latest_price_sq))
+    qs = conta.items.annotate(preco=latest_price_subquery("price"))
     total = qs.aggregate(
         total=Sum(ExpressionWrapper(F("preco") * F("quantity"), output_field=FloatField()))
     )["total"] or 0.0
@@ -325,7 +477,7 @@ def calcular_valor_total_liquido(conta) -> Decimal:
     )["total"] or 0.0
     return Decimal(str(total))
 
-SCRAPER = cloudscraper.create_scraper(browser={"custom": "firefox"})
+SCRAPER = transport.montar(cloudscraper.create_scraper(browser={"custom": "firefox"}))
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
 def _get(d: Dict[str, Any], path: str, default=None):
@@ -359,14 +511,22 @@ def _extract_fields(it: Dict[str, Any]):
 
     return classid, name, type_, icon_url, price
 
-def _fetch_page_raw(offset: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+def _fetch_page_raw(offset: int, limit: int, scraper=None) -> Tuple[int, List[Dict[str, Any]]]:
     """
     Retorna (status_code, items_list). NÃO lança exceção.
+    'scraper' permite uma sessão por thread (o crawler concorrente usa isso).
     """
-    url = f"https://cs.money/1.0/market/sell-orders?limit={limit}&offset={offset}"
+    url = f"{settings.CSMONEY_BASE_URL}/1.0/market/sell-orders?limit={limit}&offset={offset}"
+    bucket = limiter_for("cs.money")
     try:
-        resp = SCRAPER.get(url, headers=HEADERS, timeout=60)
+        bucket.acquire()
+        resp = (scraper or SCRAPER).get(url, headers=HEADERS, timeout=60)
         code = resp.status_code
+        if code == 429:
+            try:
+                bucket.penalize(float(resp.headers.get("Retry-After", "")))
+            except ValueError:
+                bucket.penalize()
         if code == 200:
             data = resp.json()
             items = data.get("items", []) if isinstance(data, dict) else data
@@ -379,175 +539,149 @@ def _fetch_page_raw(offset: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]
         log.warning(f"[CSMONEY] Exceção no offset={offset}: {e}")
         return -1, []
 
+def _persistir_minimos_csmoney(
+    site: Site,
+    best_by_classid: Dict[str, Tuple[float, str, Any, Any]],
+    *,
+    create_missing_items: bool = True,
+    epsilon: float = 1e-9,
+) -> Dict[str, int]:
+    """
+    Grava em lote os menores preços agregados por classid:
+    1 SELECT para os Items existentes, bulk_create/bulk_update para metadados
+    e PriceIngestBuffer (política "caiu": quedas no Price; LatestPrice sempre atualizado).
+    """
+    criados = 0
+    atualizados_meta = 0
+
+    with transaction.atomic():
+        existentes = Item.objects.in_bulk(list(best_by_classid), field_name="classid")
+
+        novos = []
+        alterados = []
+        for classid, (pmin, name, type_, icon_url) in best_by_classid.items():
+            item = existentes.get(classid)
+            if item is None:
+                if create_missing_items and name:
+                    novos.append(Item(
+                        classid=classid,
+                        market_hash_name=name,
+                        type=str(type_) if type_ else None,
+                        icon_url=icon_url,
+                    ))
+                continue
+            changed = False
+            if not item.market_hash_name and name:
+                item.market_hash_name = name
+                changed = True
+            if not item.type and type_:
+                item.type = str(type_)
+                changed = True
+            if not item.icon_url and icon_url:
+                item.icon_url = icon_url
+                changed = True
+            if changed:
+                alterados.append(item)
+
+        if alterados:
+            Item.objects.bulk_update(alterados, ["market_hash_name", "type", "icon_url"])
+            atualizados_meta = len(alterados)
+        if novos:
+            Item.objects.bulk_create(novos)
+            criados = len(novos)
+            existentes.update(
+                Item.objects.in_bulk([i.classid for i in novos], field_name="classid")
+            )
+
+        with PriceIngestBuffer(site, politica=POLITICA_CAIU, epsilon=epsilon) as buf:
+            for classid, (pmin, *_rest) in best_by_classid.items():
+                item = existentes.get(classid)
+                if item is not None:
+                    buf.add(item.id, pmin)
+
+    return {
+        "salvos": buf.stats["salvos"],
+        "criados": criados,
+        "atualizados_meta": atualizados_meta,
+        "ignorados_maior_ou_igual": buf.stats["ignorados"],
+    }
+
 def atualizar_precos_csmoney_minimos(
     limit: int = 60,
     max_pages: int = 200,
-    pause: float = 1.0,
+    pause: float = 1.0,            # ignorado: o ritmo vem do rate limit "cs.money"
     retries: int = 3,
     create_missing_items: bool = True,
     epsilon: float = 1e-9,
     cooldown_retries: int = 3,     # quantas vezes re-tentar offsets com 400
     cooldown_wait_sec: int = 120,  # espera longa (2 min) antes de re-enfileirar 400
+    run_id: str = "default",
+    concurrency: Optional[int] = None,
+    resume: bool = True,
+    flush_every: Optional[int] = None,
+    arquivo: Optional[str] = None,
 ) -> Dict[str, int]:
+    """
+    Varre os sell-orders com o CsmoneyCrawler (concorrente, com checkpoint no
+    Redis) e grava o menor preço de cada classid a cada 'flush_every' páginas,
+    sem esperar o fim do crawl. Com resume=True, continua o crawl interrompido
+    do mesmo run_id em vez de recomeçar. 'arquivo': NDJSON.gz opcional com os
+    sell-orders brutos.
+    """
+    from .csmoney_crawler import CsmoneyCrawler
 
     site, _ = Site.objects.get_or_create(
         name="CS.MONEY",
         defaults={"url": "https://cs.money/market/"},
     )
 
-    # Agregador de menores preços por classid
-    best_by_classid: Dict[str, Tuple[float, str, Any, Any]] = {}
-
-    # Fila de offsets a explorar (0, 60, 120, ...)
-    pending = deque([i * limit for i in range(max_pages)])
-
-    # Tentativas curtas e de cooldown por offset
-    short_attempts: Dict[int, int] = {}
-    cool_attempts: Dict[int, int] = {}
-    cool_queue: List[Tuple[float, int]] = []  # (timestamp_para_reinserir, offset)
-
-    itens_lidos = 0
-    pages_ok = 0
-
-    def _pop_ready_cooldowns(now_ts: float):
-        # Reinsere offsets da cool_queue cujo tempo já venceu
-        still = []
-        for when, off in cool_queue:
-            if when <= now_ts:
-                pending.append(off)
-            else:
-                still.append((when, off))
-        cool_queue[:] = still
-
-    while pending:
-        now_ts = time.time()
-        _pop_ready_cooldowns(now_ts)
-
-        offset = pending.popleft()
-
-        code, items = _fetch_page_raw(offset, limit)
-
-        # Sucesso
-        if code == 200:
-            pages_ok += 1
-            for it in items:
-                classid, name, type_, icon_url, price = _extract_fields(it)
-                if classid is None or price is None:
-                    continue
-                try:
-                    p = float(price)
-                except Exception:
-                    continue
-                if p <= 0:
-                    continue
-
-                atual = best_by_classid.get(classid)
-                if (atual is None) or (p < atual[0] - epsilon):
-                    best_by_classid[classid] = (p, name, type_, icon_url)
-                itens_lidos += 1
-
-            log.warning(f"[CSMONEY] offset={offset}: itens={len(items)} | agregados={len(best_by_classid)}")
-            # pausa curta entre páginas boas
-            time.sleep(pause + random.uniform(0, 0.4))
-            continue
-
-        # 429/5xx: re-tentativa curta com backoff linear
-        if code in (429, 500, 502, 503, 504, -1):
-            n = short_attempts.get(offset, 0) + 1
-            short_attempts[offset] = n
-            if n <= retries:
-                wait = 1.5 * n
-                log.warning(f"[CSMONEY] {code} em offset={offset} (tentativa {n}/{retries}) – retry em {wait:.1f}s")
-                time.sleep(wait)
-                pending.appendleft(offset)  # tenta de novo cedo
-            else:
-                log.warning(f"[CSMONEY] DROP offset={offset} após {retries} tentativas curtas")
-            continue
-
-        # 400: pode ser fim de dados OU bloqueio; entra em cooldown
-        if code == 400:
-            c = cool_attempts.get(offset, 0) + 1
-            cool_attempts[offset] = c
-            if c <= cooldown_retries:
-                when = time.time() + cooldown_wait_sec
-                cool_queue.append((when, offset))
-                log.warning(f"[CSMONEY] 400 em offset={offset} → cooldown {c}/{cooldown_retries} (+{cooldown_wait_sec}s)")
-            else:
-                log.warning(f"[CSMONEY] DROP offset={offset} após {cooldown_retries} cooldowns")
-            # pequena pausa pra não martelar
-            time.sleep(0.5)
-            continue
-
-        # Outros códigos: desiste desse offset
-        log.warning(f"[CSMONEY] Código {code} inesperado em offset={offset} – descartando")
-        time.sleep(0.2)
-
-        # Loop continua até fila e cooldowns esvaziarem
-        if not pending and cool_queue:
-            # Se nada pronto agora, espera até o próximo cooldown vencer
-            next_when = min(when for when, _ in cool_queue)
-            sleep_sec = max(0, next_when - time.time())
-            if sleep_sec > 0:
-                time.sleep(sleep_sec + 0.1)
-
-    # Persistência (um registro por item se preço caiu)
-    salvos = 0
-    criados = 0
-    atualizados_meta = 0
-    ignorados_maior_ou_igual = 0
-    now = timezone.now()
-
-    with transaction.atomic():
-        for classid, (pmin, name, type_, icon_url) in best_by_classid.items():
-            try:
-                item = Item.objects.get(classid=classid)
-                changed = False
-                if not item.market_hash_name and name:
-                    item.market_hash_name = name
-                    changed = True
-                if not item.type and type_:
-                    item.type = str(type_)
-                    changed = True
-                if not item.icon_url and icon_url:
-                    item.icon_url = icon_url
-                    changed = True
-                if changed:
-                    item.save(update_fields=["market_hash_name", "type", "icon_url"])
-                    atualizados_meta += 1
-            except Item.DoesNotExist:
-                if not (create_missing_items and name):
-                    continue
-                item = Item.objects.create(
-                    classid=classid,
-                    market_hash_name=name,
-                    type=str(type_) if type_ else None,
-                    icon_url=icon_url,
-                )
-                criados += 1
-
-            last = (
-                Price.objects
-                .filter(item=item, site=site)
-                .order_by("-timestamp")
-                .only("price")
-                .first()
-            )
-            if last is None or (pmin < float(last.price) - epsilon):
-                Price.objects.create(item=item, site=site, price=pmin, timestamp=now)
-                salvos += 1
-            else:
-                ignorados_maior_ou_igual += 1
+    crawler = CsmoneyCrawler(
+        run_id,
+        limit=limit,
+        max_pages=max_pages,
+        concurrency=concurrency,
+        retries=retries,
+        cooldown_retries=cooldown_retries,
+        cooldown_wait_sec=cooldown_wait_sec,
+        epsilon=epsilon,
+    )
+    if resume:
+        crawler.carregar()
+    else:
+        crawler.descartar()
+
+    # Persistência em lotes durante o crawl (um registro por item se preço caiu)
+    totais: Counter = Counter()
+
+    def _flush(minimos: Dict[str, Tuple[float, str, Any, Any]]) -> None:
+        totais.update(_persistir_minimos_csmoney(
+            site, minimos,
+            create_missing_items=create_missing_items,
+            epsilon=epsilon,
+        ))
+
+    lidos = crawler.executar(_flush, flush_every=flush_every, arquivo=arquivo)
+    itens_lidos = lidos["itens_lidos"]
+    distintos = lidos["distintos"]
+    pages_ok = lidos["pages_ok"]
+    salvos = totais["salvos"]
+    criados = totais["criados"]
+    atualizados_meta = totais["atualizados_meta"]
+    ignorados_maior_ou_igual = totais["ignorados_maior_ou_igual"]
+
+    # só descarta o checkpoint no fim: se cair no meio, a retomada regrava o que faltou
+    crawler.descartar()
 
     log.warning(
         "[CSMONEY] FIM | itens_lidos=%d, distintos=%d, salvos=%d, criados=%d, "
         "atualizados_meta=%d, ignorados(>=último)=%d, pages_ok=%d",
-        itens_lidos, len(best_by_classid), salvos, criados, atualizados_meta,
+        itens_lidos, distintos, salvos, criados, atualizados_meta,
         ignorados_maior_ou_igual, pages_ok
     )
 
     return {
         "itens_lidos": itens_lidos,
-        "distintos": len(best_by_classid),
+        "distintos": distintos,
         "salvos": salvos,
         "criados": criados,
         "atualizados_meta": atualizados_meta,
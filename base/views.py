@@ -2,55 +2,37 @@ import os
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db.models import Max
 from base.forms import InventoryForm
-from base.tasks import atualizar_precos_steam_task
-from .models import Inventory, InventoryItem, Item, Price, PriceAlvo, Site
-import requests
+from base.tasks import enfileirar_atualizacao, enfileirar_importacao
+from .models import ArbitrageOpportunity, Inventory, InventoryItem, Item, Price, PriceAlvo, Site
 from django.contrib import messages
 from celery import shared_task
-from .utils import calcular_valor_total_bruto, calcular_valor_total_liquido, get_steam_price
+from . import portfolio
+from .utils import get_steam_price, latest_price_subquery
 from django.utils import timezone   
 from django.core.paginator import Paginator
 from django.shortcuts import render
 from decimal import Decimal, InvalidOperation
 from django.core.paginator import Paginator
-from django.db.models import OuterRef, Subquery, F
+from django.db.models import OuterRef, Subquery, F, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.views.decorators.http import require_POST
 from kombu.exceptions import OperationalError  # para capturar erro de publish
-from .utils import importar_inventario
 
 
 
 def atualizar_inventario(request, conta_id):
     conta = get_object_or_404(Inventory, id=conta_id)
-    try:
-        importar_inventario(conta.steam_id, conta)
-        messages.success(request, "Inventário atualizado com sucesso!")
-    except Exception as e:
-        messages.error(request, f"Erro ao atualizar inventário: {e}")
+    status = enfileirar_importacao(conta.id)  # importa no worker, não segura a requisição
+    if status == "enqueued":
+        messages.success(request, "Importação do inventário iniciada! Confira o dashboard em alguns instantes.")
+    else:
+        messages.info(request, "A importação do inventário desta conta já está em andamento.")
     return redirect("dashboard")
 
-def dashboard(request):
-    url = "https://steamcommunity.com/market/priceoverview/"
-    params = {
-        "currency": 1,
-        "appid": 730,
-        "market_hash_name": "Danger Zone Case"
-    }
-
-    resp = requests.get(url, params=params).json()
-    data = {}
-    if resp.get("success"):
-        data = {
-            "name": "Danger Zone Case",
-            "lowest": resp.get("lowest_price"),
-            "median": resp.get("median_price"),
-            "volume": resp.get("volume"),
-        }
-
-    return render(request, "dashboard.html", {"data": data})
-
-
 def cadastrar_inventory(request):
     if request.method == "POST":
         form = InventoryForm(request.POST)
@@ -66,59 +48,130 @@ def cadastrar_inventory(request):
     return render(request, "cadastrar_inventario.html", {"form": form})
 
 
+def _resumo_dashboard(conta: Inventory) -> dict:
+    """Cards + série do gráfico, a partir do snapshot pré-calculado (base/portfolio.py)."""
+    snapshot = portfolio.snapshot_da_conta(conta)
+    item_mais_caro = None
+    if snapshot.top_item_id:
+        item_mais_caro = {"nome": snapshot.top_item.market_hash_name, "preco": snapshot.top_item_preco}
+    return {
+        "itens_distintos": snapshot.itens_distintos,
+        "valor_total": snapshot.valor_bruto,
+        "valor_total_liquido": snapshot.valor_liquido,
+        "item_mais_caro": item_mais_caro,
+        "last_update": snapshot.ultimo_preco_em,
+        "historico": [
+            {"t": p["as_of"].isoformat(), "bruto": round(p["valor_bruto"], 2), "liquido": round(p["valor_liquido"], 2)}
+            for p in portfolio.serie_historica(conta)
+        ],
+    }
+
+
 def dashboard(request):
     contas = Inventory.objects.all()
     conta_id = request.GET.get("conta")
     conta = contas.filter(id=conta_id).first() if conta_id else None
 
-    itens = None
-    valor_total = 0
-    item_mais_caro = None
-    last_updates = {"last_update": None}
-
+    resumo = {}
     if conta:
-        # anota preço/timestamp atuais para listar os cards
-        latest_price_sq = Price.objects.filter(item=OuterRef("item")).order_by("-timestamp").values("price")[:1]
-        latest_ts_sq    = Price.objects.filter(item=OuterRef("item")).order_by("-timestamp").values("timestamp")[:1]
-
-        itens = (
-            conta.items.select_related("item")
-            .annotate(
-                nome=F("item__market_hash_name"),
-                imagem=F("item__icon_url"),
-                preco=Subquery(latest_price_sq),
-                timestamp=Subquery(latest_ts_sq),
+        # fragmento cacheado por versão da conta: a ingestão incrementa a versão
+        versao = portfolio.versao_conta(conta.id)
+        if versao is None:
+            resumo = _resumo_dashboard(conta)
+        else:
+            resumo = cache.get_or_set(
+                f"dash:resumo:{conta.id}:{versao}",
+                lambda: _resumo_dashboard(conta),
+                timeout=settings.DASHBOARD_CACHE_TTL,
             )
-            .order_by("-preco")
-        )
-
-        # total BRUTO (para o card que você mostrou)
-        valor_total = calcular_valor_total_bruto(conta)
-
-        # se quiser ter o total líquido também (opcional):
-        valor_total_liquido = calcular_valor_total_liquido(conta)
-
-        # item mais caro (pelo preço atual bruto)
-        item_mais_caro = itens.first()
-
-        # última atualização (maior timestamp entre itens)
-        last_updates["last_update"] = itens.aggregate(mx=Max("timestamp"))["mx"]
 
     ctx = {
         "contas": contas,
         "conta_selecionada": conta,
-        "itens": itens,
-        "valor_total": valor_total,                 # usado no template
-        "valor_total_liquido": locals().get("valor_total_liquido"),
-        "item_mais_caro": item_mais_caro,
-        "last_updates": last_updates,
+        "resumo": resumo,
+        "valor_total": resumo.get("valor_total", 0),                 # usado no template
+        "valor_total_liquido": resumo.get("valor_total_liquido"),
+        "item_mais_caro": resumo.get("item_mais_caro"),
+        "last_updates": {"last_update": resumo.get("last_update")},
+        "historico": resumo.get("historico", []),
+        "page_size": settings.DASHBOARD_PAGE_SIZE,
     }
     return render(request, "dashboard.html", ctx)
 
+
+def _filtro_cursor(cursor: str) -> Q:
+    """
+    Cursor de keyset na ordem (preco_atual DESC NULLS LAST, id DESC):
+    "<preço>:<id>" dentro dos itens com preço, "-:<id>" já entre os sem preço.
+    """
+    if not cursor:
+        return Q()
+    preco, _, pk = cursor.partition(":")
+    pk = int(pk)
+    if preco == "-":
+        return Q(preco_atual__isnull=True, id__lt=pk)
+    preco = float(preco)
+    return Q(preco_atual__lt=preco) | Q(preco_atual=preco, id__lt=pk) | Q(preco_atual__isnull=True)
+
+
+def _pagina_itens(conta_id: int, cursor: str, limite: int) -> dict:
+    rows = list(
+        InventoryItem.objects
+        .filter(inventory_id=conta_id)
+        .filter(_filtro_cursor(cursor))
+        .order_by(F("preco_atual").desc(nulls_last=True), "-id")
+        .values("id", "quantity", "tradable", "preco_atual", "preco_atual_at",
+                "item__market_hash_name", "item__icon_url")[:limite + 1]
+    )
+    proximo = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        ultimo = rows[-1]
+        proximo = f"{'-' if ultimo['preco_atual'] is None else repr(ultimo['preco_atual'])}:{ultimo['id']}"
+    return {
+        "itens": [
+            {
+                "id": r["id"],
+                "nome": r["item__market_hash_name"],
+                "imagem": r["item__icon_url"],
+                "quantidade": r["quantity"],
+                "negociavel": r["tradable"],
+                "preco": r["preco_atual"],
+                "timestamp": r["preco_atual_at"].isoformat() if r["preco_atual_at"] else None,
+            }
+            for r in rows
+        ],
+        "proximo": proximo,
+    }
+
+
+def dashboard_itens(request, conta_id):
+    """Lote de cards do dashboard em JSON (scroll infinito), paginado por keyset."""
+    conta = get_object_or_404(Inventory, id=conta_id)
+    cursor = request.GET.get("cursor", "")
+    try:
+        limite = max(1, min(int(request.GET.get("limite") or settings.DASHBOARD_PAGE_SIZE), 200))
+        _filtro_cursor(cursor)
+    except ValueError:
+        return JsonResponse({"erro": "cursor ou limite inválido"}, status=400)
+
+    versao = portfolio.versao_conta(conta.id)
+    if versao is None:
+        return JsonResponse(_pagina_itens(conta.id, cursor, limite))
+    payload = cache.get_or_set(
+        f"dash:itens:{conta.id}:{versao}:{limite}:{cursor}",
+        lambda: _pagina_itens(conta.id, cursor, limite),
+        timeout=settings.DASHBOARD_CACHE_TTL,
+    )
+    return JsonResponse(payload)
+
 def atualizar_precos_view(request, conta_id):
     conta = get_object_or_404(Inventory, id=conta_id)
-    atualizar_precos_steam_task.delay(conta.id)  # async
-    messages.success(request, "Atualização de preços iniciada! Confira o dashboard em alguns minutos.")
+    status = enfileirar_atualizacao(conta.id)  # async, sem duplicar tarefas da mesma conta
+    if status == "enqueued":
+        messages.success(request, "Atualização de preços iniciada! Confira o dashboard em alguns minutos.")
+    else:
+        messages.info(request, "A atualização de preços desta conta já está em andamento.")
     return redirect("dashboard")
 
 def preco_alvo_view(request):
@@ -128,20 +181,6 @@ def preco_alvo_view(request):
 
     itens_page = None
     if conta:
-        # último preço/timestamp do Item
-        latest_price_sq = (
-            Price.objects
-            .filter(item=OuterRef("item"))
-            .order_by("-timestamp")
-            .values("price")[:1]
-        )
-        latest_ts_sq = (
-            Price.objects
-            .filter(item=OuterRef("item"))
-            .order_by("-timestamp")
-            .values("timestamp")[:1]
-        )
-
         # preço alvo para a conta selecionada
         alvo_sq = (
             PriceAlvo.objects
@@ -156,8 +195,8 @@ def preco_alvo_view(request):
                 item_pk=F("item__id"),
                 nome=F("item__market_hash_name"),
                 imagem=F("item__icon_url"),   # <- seu Item tem 'icon_url'
-                preco=Subquery(latest_price_sq),
-                timestamp=Subquery(latest_ts_sq),
+                preco=latest_price_subquery("price"),
+                timestamp=latest_price_subquery("timestamp"),
                 preco_alvo=Subquery(alvo_sq)
             )
             .order_by("item__market_hash_name")   # evita warning na paginação
@@ -198,7 +237,36 @@ def definir_preco_alvo_view(request):
     PriceAlvo.objects.update_or_create(
         item=item,
         inventory=conta,
-        defaults={"preco_alvo": preco_alvo},
+        defaults={"preco_alvo": preco_alvo, "disparado": False},  # alvo novo rearma o alerta
     )
     messages.success(request, "Preço alvo salvo com sucesso.")
     return redirect(reverse("preco_alvo") + f"?conta={conta.id}")
+
+
+def arbitragem_view(request):
+    """Top oportunidades da última rodada do motor (base/arbitrage.py), com filtro por site."""
+    sites = Site.objects.order_by("name")
+    qs = (
+        ArbitrageOpportunity.objects
+        .select_related("item", "site_compra", "site_venda")
+        .order_by("-score", "id")
+    )
+    filtros = {}
+    for campo in ("site_compra", "site_venda"):
+        valor = request.GET.get(campo)
+        if valor and valor.isdigit():
+            qs = qs.filter(**{f"{campo}_id": int(valor)})
+            filtros[campo] = int(valor)
+
+    paginator = Paginator(qs, 50)
+    oportunidades = paginator.get_page(request.GET.get("page"))
+    calculado_em = ArbitrageOpportunity.objects.values_list("calculado_em", flat=True).first()
+
+    ctx = {
+        "sites": sites,
+        "filtros": filtros,
+        "query": urlencode(filtros),  # mantém os filtros na paginação
+        "oportunidades": oportunidades,
+        "calculado_em": calculado_em,
+    }
+    return render(request, "arbitragem.html", ctx)